@@ -1,63 +1,986 @@
-import pandas as pd
+import argparse
+import hashlib
+import os
+import re
 import sqlite3
+import uuid
+from contextlib import contextmanager
+from datetime import date, datetime, time
 from pathlib import Path
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
 
-def convert_excel_to_sqlite():
-    """將 database.xlsx 轉換為 database.db"""
+from openpyxl import load_workbook
 
-    # 讀取 Excel 檔案
-    excel_file = Path("database.xlsx")
-    db_file = Path("database.db")
+from identifiers import cas_numbers, is_valid_cas, normalize_identifier
+from field_registry import DISPLAY_SECTIONS, FieldRegistry, clean_column_name, operator_column, property_unit
+from import_translation import import_translation_to_db
+import queries
+from smiles_fingerprint import SmilesError, fingerprint
+
+
+def build_search_index(conn: sqlite3.Connection):
+    """建立 FTS5 trigram 全文檢索索引 Search_Index
+
+    每筆資料為 (物質 ID, 欄位類型, 內容)，欄位類型包括：
+    name、cas、smiles、inchi、alias、chinese。
+    trigram 斷詞讓任意子字串查詢都能走索引，不需掃描整張表。
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+    tables = {row[0] for row in cursor.fetchall()}
+
+    cursor.execute("DROP TABLE IF EXISTS Search_Index")
+    cursor.execute("""
+        CREATE VIRTUAL TABLE Search_Index USING fts5(
+            substance_id UNINDEXED,
+            field UNINDEXED,
+            content,
+            tokenize = 'trigram'
+        )
+    """)
+
+    sources = [
+        ("name", "SELECT ID, Active FROM Identification"),
+        ("cas", "SELECT ID, CAS_RN FROM Identification"),
+        ("smiles", "SELECT ID, Canonical_SMILES FROM Identification"),
+        ("smiles", "SELECT ID, Isomeric_SMILES FROM Identification"),
+        ("inchi", "SELECT ID, International_Chemical_Identifier_InChI FROM Identification"),
+    ]
+    if "Aliases" in tables:
+        sources += [
+            ("alias", "SELECT ID, Alias FROM Aliases"),
+            ("alias", "SELECT ID, Abbreviation FROM Aliases"),
+        ]
+    if "Translation" in tables:
+        # 中文名稱透過英文名稱對應到物質 ID
+        sources.append((
+            "chinese",
+            """
+            SELECT i.ID, t.chinese_name
+            FROM Translation t
+            JOIN Identification i ON i.Active = t.english_name COLLATE NOCASE
+            """,
+        ))
+
+    for field, sql in sources:
+        rows = [
+            (substance_id, field, str(value).strip())
+            for substance_id, value in cursor.execute(sql).fetchall()
+            if substance_id is not None and value is not None and str(value).strip() not in ("", "nan")
+        ]
+        cursor.executemany(
+            "INSERT INTO Search_Index (substance_id, field, content) VALUES (?, ?, ?)",
+            list(dict.fromkeys(rows)),
+        )
+
+    cursor.execute("INSERT INTO Search_Index (Search_Index) VALUES ('optimize')")
+    conn.commit()
+
+    cursor.execute("SELECT COUNT(*) FROM Search_Index")
+    print(f"  • Search_Index: {cursor.fetchone()[0]} 筆索引資料")
+
+
+# Identifier_Index 的識別碼類型與來源（順序即比對優先順序）
+IDENTIFIER_SOURCES = [
+    ("cas", "Identification", "SELECT ID, CAS_RN FROM Identification"),
+    ("inchikey", "Identification", "SELECT ID, International_Chemical_Identifier_key_InChIKey FROM Identification"),
+    ("inchi", "Identification", "SELECT ID, International_Chemical_Identifier_InChI FROM Identification"),
+    ("name", "Identification", "SELECT ID, Active FROM Identification"),
+    (
+        "chinese",
+        "Translation",
+        """
+        SELECT i.ID, t.chinese_name
+        FROM Translation t
+        JOIN Identification i ON i.Active = t.english_name COLLATE NOCASE
+        """,
+    ),
+    ("alias", "Aliases", "SELECT ID, Alias FROM Aliases"),
+    ("abbreviation", "Aliases", "SELECT ID, Abbreviation FROM Aliases"),
+]
+
+
+def build_identifier_index(conn: sqlite3.Connection):
+    """建立 Identifier_Index：正規化識別碼 -> 物質 ID 的完全比對索引
+
+    涵蓋 CAS RN、InChIKey、InChI、英文名稱、中文名稱、別名與縮寫，鍵以 identifiers.normalize_identifier 正規化
+    （大小寫、空白與連字號不影響比對）。CAS RN 欄位中的每個 CAS 號碼分別建立索引，檢查碼不符者照樣收錄並列出警告。
+    主鍵 (key, kind, ID)，查詢時一次索引定位即可取得完全相符的物質。
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+    tables = {row[0] for row in cursor.fetchall()}
+
+    cursor.execute("DROP TABLE IF EXISTS Identifier_Index")
+    cursor.execute("""
+        CREATE TABLE Identifier_Index (
+            key TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            ID INTEGER NOT NULL,
+            PRIMARY KEY (key, kind, ID)
+        ) WITHOUT ROWID
+    """)
+
+    invalid_cas = []
+    records = []
+    for kind, table_name, sql in IDENTIFIER_SOURCES:
+        if table_name not in tables:
+            continue
+        for substance_id, value in cursor.execute(sql).fetchall():
+            if substance_id is None or value is None or str(value).strip() in ("", "nan"):
+                continue
+            values = [value]
+            if kind == "cas":
+                values = cas_numbers(value) or [value]
+                invalid_cas.extend(cas for cas in values if not is_valid_cas(cas))
+            for identifier in values:
+                key = normalize_identifier(identifier)
+                if key:
+                    records.append((key, kind, substance_id))
+
+    cursor.executemany("INSERT OR IGNORE INTO Identifier_Index VALUES (?, ?, ?)", records)
+    conn.commit()
+
+    cursor.execute("SELECT COUNT(*) FROM Identifier_Index")
+    print(f"  • Identifier_Index: {cursor.fetchone()[0]} 筆識別碼")
+    if invalid_cas:
+        print(f"    警告：{len(invalid_cas)} 個 CAS RN 檢查碼不符，例如 {', '.join(invalid_cas[:5])}")
+
+
+# 可解析為數值的屬性所在工作表
+PROPERTY_TABLES = ["Fate", "Terrestrial_Ecotox", "Aquatic_Ecotox", "Human"]
+
+# 原始資料中的比較運算符 -> 正規化後的運算符
+OPERATOR_ALIASES = {
+    None: '=', '': '=', '=': '=', '==': '=',
+    '>': '>', '<': '<', '>=': '>=', '<=': '<=', '≥': '>=', '≤': '<=', '=>': '>=', '=<': '<=',
+    '~': '~', '≈': '~', 'ca': '~', 'ca.': '~', 'c.': '~',
+}
+
+_NUMBER_PATTERN = re.compile(
+    r"^\s*(?P<op>>=|<=|=>|=<|≥|≤|>|<|==|=|~|≈|ca\.?|c\.)?\s*"
+    r"(?P<mantissa>[-+−]?(?:\d[\d,]*\.?\d*|\.\d+))"
+    r"(?:\s*(?:[eE](?P<exp>[-+−]?\d+)|\s*[xX×]\s*10\s*\^?\s*(?P<exp10>[-+−]?\d+)))?"
+    r"\s*$"
+)
+# 逗號的兩種寫法：千分位（"1,500"、"12,345.6"）與小數逗號（"1,5"、"0,500"）
+_THOUSANDS_PATTERN = re.compile(r"^[-+−]?[1-9]\d{0,2}(?:,\d{3})+(?:\.\d*)?$")
+_DECIMAL_COMMA_PATTERN = re.compile(r"^[-+−]?\d+,\d+$")
+
+
+def parse_numeric(value: Any) -> Optional[Tuple[str, float]]:
+    """將儲存格值解析為 (運算符, 數值)；無法解析（例如 "Stable"）時回傳 None
+
+    支援 "> 1000"、"<0.1"、"1.2E-03"、"2.1 x 10-3"、"1,500" 等寫法。
+    逗號後恰為三位數一組時視為千分位（"1,500" -> 1500），否則視為小數逗號（"1,5" -> 1.5）；
+    其他含逗號的寫法（"1,5,6"）無法判斷，回傳 None。
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return None if value != value else ('=', float(value))
+
+    match = _NUMBER_PATTERN.match(str(value))
+    if not match:
+        return None
+    operator = OPERATOR_ALIASES.get(match.group('op'), '=')
+    mantissa = match.group('mantissa')
+    if ',' in mantissa:
+        if _THOUSANDS_PATTERN.match(mantissa):
+            mantissa = mantissa.replace(',', '')
+        elif _DECIMAL_COMMA_PATTERN.match(mantissa):
+            mantissa = mantissa.replace(',', '.')
+        else:
+            return None
+    number = float(mantissa.replace('−', '-'))
+    exponent = match.group('exp') or match.group('exp10')
+    if exponent:
+        number *= 10 ** int(exponent.replace('−', '-'))
+    return operator, number
+
+
+def build_property_values(conn: sqlite3.Connection):
+    """建立型別化的數值屬性表 Property_Values
+
+    將 Fate、Terrestrial_Ecotox、Aquatic_Ecotox、Human 中可解析為數值的欄位，
+    拆成 (ID, 屬性, 運算符, 數值, 單位) 存放，並以 (屬性, 數值, ID) 建立索引，
+    讓「Soil DT50 > 100 且 Koc < 50」這類範圍篩選與依屬性排序（同值再依 ID）可直接走索引。
+    運算符優先取自對應的 __ 比較運算符欄位，其次取自數值文字本身（例如 "> 1000"）。
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+    tables = {row[0] for row in cursor.fetchall()}
+
+    cursor.execute("DROP TABLE IF EXISTS Property_Values")
+    cursor.execute("""
+        CREATE TABLE Property_Values (
+            property TEXT NOT NULL,
+            ID INTEGER NOT NULL,
+            operator TEXT NOT NULL,
+            value REAL NOT NULL,
+            unit TEXT NOT NULL,
+            PRIMARY KEY (property, ID)
+        )
+    """)
+
+    total = 0
+    for table_name in PROPERTY_TABLES:
+        if table_name not in tables:
+            continue
+        columns = [column[1] for column in _table_columns(cursor, table_name)]
+        value_columns = [c for c in columns if c != "ID" and not c.startswith("__")]
+        operators = {c: operator_column(c, columns) for c in value_columns}
+
+        cursor.execute(f'SELECT * FROM "{table_name}"')
+        records = []
+        for row in cursor.fetchall():
+            data = dict(zip(columns, row))
+            if data.get("ID") is None:
+                continue
+            for column in value_columns:
+                parsed = parse_numeric(data[column])
+                if parsed is None:
+                    continue
+                operator, number = parsed
+                if operators[column]:
+                    raw_operator = data.get(operators[column])
+                    raw_operator = str(raw_operator).strip() if raw_operator is not None else None
+                    operator = OPERATOR_ALIASES.get(raw_operator, operator)
+                records.append((column, data["ID"], operator, number, property_unit(column)))
+
+        cursor.executemany("INSERT OR REPLACE INTO Property_Values VALUES (?, ?, ?, ?, ?)", records)
+        total += len(records)
+
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_property_values_value ON Property_Values(property, value, ID)")
+    conn.commit()
+    print(f"  • Property_Values: {total} 筆數值屬性")
+
+
+def build_structure_fingerprints(conn: sqlite3.Connection):
+    """建立 Structure_Fingerprints：每個物質 SMILES 的路徑指紋（FINGERPRINT_BYTES 位元組的 BLOB）
+
+    main.py 載入後組成 NumPy 位元矩陣，以一次向量化 popcount 完成 Tanimoto 相似度排序與子結構預篩。
+    優先使用 Canonical_SMILES，沒有時改用 Isomeric_SMILES；無法解析的 SMILES 略過。
+    """
+    cursor = conn.cursor()
+    columns = {column[1] for column in _table_columns(cursor, "Identification")}
+    smiles_columns = [c for c in ("Canonical_SMILES", "Isomeric_SMILES") if c in columns]
+
+    cursor.execute("DROP TABLE IF EXISTS Structure_Fingerprints")
+    cursor.execute("""
+        CREATE TABLE Structure_Fingerprints (
+            ID INTEGER PRIMARY KEY,
+            smiles TEXT NOT NULL,
+            fingerprint BLOB NOT NULL
+        )
+    """)
+    if not smiles_columns:
+        conn.commit()
+        return
 
-    # 如果資料庫已存在，先刪除
-    if db_file.exists():
-        db_file.unlink()
+    smiles_expr = "COALESCE(" + ", ".join(f"NULLIF(TRIM({c}), '')" for c in smiles_columns) + ", NULL)"
+    cursor.execute(f"SELECT ID, {smiles_expr} FROM Identification WHERE ID IS NOT NULL")
+    records, skipped = [], 0
+    for substance_id, smiles in cursor.fetchall():
+        if not smiles:
+            continue
+        try:
+            records.append((substance_id, smiles, fingerprint(smiles)))
+        except SmilesError:
+            skipped += 1
 
-    # 建立 SQLite 連線
-    conn = sqlite3.connect(str(db_file))
+    cursor.executemany("INSERT OR REPLACE INTO Structure_Fingerprints VALUES (?, ?, ?)", records)
+    conn.commit()
+    print(f"  • Structure_Fingerprints: {len(records)} 筆結構指紋（略過 {skipped} 筆無法解析的 SMILES）")
 
+
+def build_display_values(conn: sqlite3.Connection):
+    """建立 Display_Values：每個物質每個顯示欄位格式化完成的字串（例如 "> 150 mg/kg BW/day"）
+
+    欄位清單與格式化規則來自 field_registry（與 main.py 共用），
+    詳細頁、比對表格與匯出直接讀取，每個資料庫版本只格式化一次；沒有值（N/A）的欄位不儲存。
+    """
+    cursor = conn.cursor()
+    table_columns = {
+        section.table: [column[1] for column in _table_columns(cursor, section.table)]
+        for section in DISPLAY_SECTIONS
+    }
+    registry = FieldRegistry(table_columns)
+
+    cursor.execute("DROP TABLE IF EXISTS Display_Values")
+    cursor.execute("""
+        CREATE TABLE Display_Values (
+            ID INTEGER NOT NULL,
+            field TEXT NOT NULL,
+            display TEXT NOT NULL,
+            PRIMARY KEY (ID, field)
+        ) WITHOUT ROWID
+    """)
+
+    total = 0
+    for table, columns in registry.projection().items():
+        fields = [f for f in registry.fields if f.section.table == table and f.column]
+        selected = ", ".join(f'"{column}"' for column in columns)
+        cursor.execute(f'SELECT ID, {selected} FROM "{table}" WHERE ID IS NOT NULL')
+        records = []
+        for row in cursor.fetchall():
+            data = dict(zip(["ID", *columns], row))
+            for display_field in fields:
+                operator = data[display_field.operator_column] if display_field.operator_column else None
+                display = display_field.format(data[display_field.column], operator)
+                if display != "N/A":
+                    records.append((data["ID"], display_field.key, display))
+        cursor.executemany("INSERT OR REPLACE INTO Display_Values VALUES (?, ?, ?)", records)
+        total += len(records)
+
+    conn.commit()
+    print(f"  • Display_Values: {total} 筆顯示值")
+
+
+# 光學異構物與鹽基形式對照表（英文名稱、PPDB 報告網址）
+ISOMER_WORKBOOK = Path("農藥光學異構物與鹽基形式查詢.xlsx")
+
+# 名稱開頭的立體化學標記，例如 (R)-hexaconazole、S-metolachlor
+_STEREO_PREFIX = re.compile(r"^(\((?:R|S|RS|R,S)\)-|[RS]-)", re.IGNORECASE)
+
+# 只表示異構物的名稱片段，例如 Benalaxyl-M、Dichlorprop-P、Demeton-O、Furconazole-cis
+ISOMER_MARKERS = {"m", "p", "r", "s", "o", "cis", "trans"}
+
+
+def variant_parent(name: str, roots: dict) -> Optional[Tuple[str, str]]:
+    """找出變體名稱的母體（roots 為 {小寫名稱: 名稱}），回傳 (母體名稱, 關係)
+
+    先去除立體化學字首，再於 "-" 或空白分隔處取最短的已知名稱作為母體：
+    Dichlorprop-P-potassium -> Dichlorprop。剩餘片段都是 ISOMER_MARKERS（或有立體化學字首）時關係為
+    "isomer"，否則為 "salt_ester"（鹽類或酯類）；找不到母體時回傳 None。
+    """
+    name = name.strip()
+    base = _STEREO_PREFIX.sub("", name)
+    stereo = base != name
+    parts = re.split(r"([- ])", base)
+    for end in range(1, len(parts) + 1, 2):
+        prefix = "".join(parts[:end]).lower()
+        if prefix in roots and prefix != name.lower():
+            remainder = [part.lower() for part in parts[end + 1::2]]
+            relation = "isomer" if all(part in ISOMER_MARKERS for part in remainder) and (stereo or remainder) else "salt_ester"
+            return roots[prefix], relation
+    return None
+
+
+def build_substance_families(conn: sqlite3.Connection, workbook_file: Path = ISOMER_WORKBOOK):
+    """由異構物對照表建立 Substance_Families：每個物質所屬的家族（母體物質 ID）與關係
+
+    對照表只列出名稱，母體由名稱推得（見 variant_parent），母體可以是對照表或 Identification 中的任何名稱。
+    只保留資料庫中至少有兩個成員的家族；母體不在資料庫時以最小的成員 ID 作為家族代號。
+    以 (family_id, ID) 索引，一次 self-join 即可取得整個家族。
+    """
+    cursor = conn.cursor()
+    cursor.execute("DROP TABLE IF EXISTS Substance_Families")
+    cursor.execute("""
+        CREATE TABLE Substance_Families (
+            ID INTEGER PRIMARY KEY,
+            family_id INTEGER NOT NULL,
+            relation TEXT NOT NULL
+        )
+    """)
+    cursor.execute("CREATE INDEX idx_substance_families_family ON Substance_Families(family_id, ID)")
+
+    if not workbook_file.exists():
+        print(f"  • 找不到 {workbook_file}，略過 Substance_Families")
+        conn.commit()
+        return
+
+    workbook = load_workbook(workbook_file, read_only=True, data_only=True)
     try:
-        # 讀取 Excel 所有工作表
-        xls = pd.ExcelFile(excel_file)
-        print(f"找到 {len(xls.sheet_names)} 個工作表:")
+        rows = workbook.worksheets[0].iter_rows(min_row=2, max_col=1, values_only=True)
+        names = list(dict.fromkeys(str(row[0]).strip() for row in rows if row[0] and str(row[0]).strip()))
+    finally:
+        workbook.close()
 
-        for sheet_name in xls.sheet_names:
-            print(f"  處理工作表: {sheet_name}")
+    substance_ids = {}
+    cursor.execute("SELECT Active, MIN(ID) FROM Identification WHERE Active IS NOT NULL GROUP BY Active COLLATE NOCASE")
+    for active, substance_id in cursor.fetchall():
+        substance_ids[str(active).strip().lower()] = substance_id
 
-            # 讀取工作表資料
-            df = pd.read_excel(xls, sheet_name=sheet_name)
+    roots = {name.lower(): name for name in names}
+    for key in substance_ids:
+        roots.setdefault(key, key)
 
-            # 清理欄位名稱（移除特殊字元，替換空格為底線）
-            df.columns = df.columns.str.strip().str.replace(' ', '_').str.replace('[^\w]', '', regex=True)
+    families = {}
+    for name in names:
+        parent = variant_parent(name, roots)
+        root, relation = (name, "parent") if parent is None else parent
+        members = families.setdefault(root.lower(), {})
+        members[name.lower()] = relation
+        members.setdefault(root.lower(), "parent")
 
-            # 將資料寫入 SQLite
-            # 將工作表名稱轉換為合法的表格名稱
-            table_name = sheet_name.strip().replace(' ', '_').replace('-', '_')
-            df.to_sql(table_name, conn, if_exists='replace', index=False)
+    records = []
+    for root, members in families.items():
+        found = {substance_ids[member]: relation for member, relation in members.items() if member in substance_ids}
+        if len(found) < 2:
+            continue
+        family_id = substance_ids.get(root, min(found))
+        records.extend((substance_id, family_id, relation) for substance_id, relation in found.items())
 
-            print(f"    → 已建立表格 '{table_name}'，共 {len(df)} 筆資料，{len(df.columns)} 個欄位")
+    cursor.executemany("INSERT OR REPLACE INTO Substance_Families VALUES (?, ?, ?)", records)
+    conn.commit()
+    family_count = len({record[1] for record in records})
+    print(f"  • Substance_Families: {family_count} 個家族，{len(records)} 個物質")
 
-        print(f"\n✓ 成功將資料轉換為 {db_file}")
 
-        # 顯示資料庫結構
-        cursor = conn.cursor()
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-        tables = cursor.fetchall()
-
-        print(f"\n資料庫包含 {len(tables)} 個表格:")
-        for table in tables:
-            table_name = table[0]
-            cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
-            count = cursor.fetchone()[0]
-            cursor.execute(f"PRAGMA table_info({table_name})")
-            columns = cursor.fetchall()
-            print(f"  • {table_name}: {count} 筆資料, {len(columns)} 個欄位")
-
-    except Exception as e:
-        print(f"錯誤: {e}")
+def write_build_info(conn: sqlite3.Connection, inputs_hash: str):
+    """寫入建置版本 Build_Info，執行中的 main.py 以此判斷資料庫是否已更新
+
+    inputs_hash 為衍生資料其他輸入檔的雜湊（見 derived_inputs_hash），供下次增量建置比對。
+    """
+    build_version = f"{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    cursor = conn.cursor()
+    cursor.execute("DROP TABLE IF EXISTS Build_Info")
+    cursor.execute("CREATE TABLE Build_Info (key TEXT PRIMARY KEY, value TEXT)")
+    cursor.executemany(
+        "INSERT INTO Build_Info (key, value) VALUES (?, ?)",
+        [
+            ("build_version", build_version),
+            ("built_at", datetime.now().isoformat(timespec="seconds")),
+            ("inputs_hash", inputs_hash),
+        ],
+    )
+    conn.commit()
+    print(f"  • Build_Info: 建置版本 {build_version}")
+
+
+# 每批寫入的資料列數
+BATCH_SIZE = 1000
+
+
+def clean_column_names(headers: Iterable[Any]) -> List[str]:
+    """清理欄位名稱，結果與原本 pandas 流程（read_excel + to_sql）相同
+
+    空白標題命名為 Unnamed: {位置}，重複標題依序加上 .1、.2 後綴，
+    接著去除前後空白、空格轉底線、移除非 \\w 字元。
+    """
+    seen = {}
+    columns = []
+    for position, header in enumerate(headers):
+        name = f"Unnamed: {position}" if header is None or str(header).strip() == "" else str(header)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        columns.append(clean_column_name(name))
+
+    # 清理後仍然重複的名稱加上序號，避免建表失敗
+    result = []
+    used = set()
+    for column in columns:
+        candidate = column
+        suffix = 1
+        while candidate in used:
+            candidate = f"{column}_{suffix}"
+            suffix += 1
+        used.add(candidate)
+        result.append(candidate)
+    return result
+
+
+def sheet_table_name(sheet_name: str) -> str:
+    """將工作表名稱轉換為合法的表格名稱"""
+    return sheet_name.strip().replace(' ', '_').replace('-', '_')
+
+
+def _normalize_cell(value: Any) -> Any:
+    """將儲存格值轉成 SQLite 可直接儲存的型別"""
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, float) and value != value:
+        return None
+    return value
+
+
+def iter_sheet_rows(worksheet) -> Tuple[List[str], Iterator[tuple]]:
+    """以串流方式讀取工作表，回傳（欄位名稱, 資料列迭代器）；整列空白的資料會略過"""
+    rows = worksheet.iter_rows(values_only=True)
+    header = next(rows, None)
+    if header is None:
+        return [], iter(())
+
+    # 去除尾端沒有標題的空白欄
+    width = len(header)
+    while width and (header[width - 1] is None or str(header[width - 1]).strip() == ""):
+        width -= 1
+    columns = clean_column_names(header[:width])
+
+    def generate():
+        for row in rows:
+            values = tuple(_normalize_cell(v) for v in row[:width])
+            if all(v is None for v in values):
+                continue
+            if len(values) < width:
+                values += (None,) * (width - len(values))
+            yield values
+
+    return columns, generate()
+
+
+def sheet_content_hash(worksheet) -> Tuple[str, int]:
+    """只讀取工作表、不寫入資料庫，計算內容雜湊（與 load_sheet 寫入時算出的相同）
+
+    Returns:
+        (內容雜湊, 資料筆數)
+    """
+    columns, rows = iter_sheet_rows(worksheet)
+    hasher = hashlib.sha256(repr(columns).encode("utf-8"))
+    row_count = 0
+    for values in rows:
+        hasher.update(repr(values).encode("utf-8"))
+        row_count += 1
+    return hasher.hexdigest(), row_count
+
+
+def load_sheet(conn: sqlite3.Connection, worksheet, table_name: str) -> Tuple[str, int, int]:
+    """將一個工作表串流寫入資料表
+
+    資料先以 executemany 分批寫入暫存表，同時計算內容雜湊，完成後才取代原表。
+
+    Returns:
+        (內容雜湊, 資料筆數, 欄位數)
+    """
+    columns, rows = iter_sheet_rows(worksheet)
+    staging = f"{table_name}__staging"
+    column_sql = ", ".join(f'"{c}"' for c in columns)
+    placeholders = ", ".join("?" * len(columns))
+
+    hasher = hashlib.sha256(repr(columns).encode("utf-8"))
+    cursor = conn.cursor()
+    cursor.execute(f'DROP TABLE IF EXISTS "{staging}"')
+    cursor.execute(f'CREATE TABLE "{staging}" ({column_sql})')
+
+    row_count = 0
+    batch = []
+    for values in rows:
+        hasher.update(repr(values).encode("utf-8"))
+        batch.append(values)
+        if len(batch) >= BATCH_SIZE:
+            cursor.executemany(f'INSERT INTO "{staging}" VALUES ({placeholders})', batch)
+            row_count += len(batch)
+            batch.clear()
+    if batch:
+        cursor.executemany(f'INSERT INTO "{staging}" VALUES ({placeholders})', batch)
+        row_count += len(batch)
+
+    content_hash = hasher.hexdigest()
+    cursor.execute(f'DROP TABLE IF EXISTS "{table_name}"')
+    cursor.execute(f'ALTER TABLE "{staging}" RENAME TO "{table_name}"')
+    conn.commit()
+    return content_hash, row_count, len(columns)
+
+
+# 工作表表格的次要索引：(索引名稱, 表格, 欄位定義)
+SECONDARY_INDEXES = [
+    ("idx_identification_active", "Identification", '"Active" COLLATE NOCASE, "ID"'),
+    ("idx_identification_cas_rn", "Identification", '"CAS_RN"'),
+    ("idx_identification_inchikey", "Identification", '"International_Chemical_Identifier_key_InChIKey"'),
+    ("idx_aliases_id", "Aliases", '"ID"'),
+]
+
+def known_queries(conn: sqlite3.Connection) -> List[Tuple[str, str, tuple, Optional[str]]]:
+    """main.py 每個請求執行的查詢（取自 queries.py，與 main.py 使用同一份 SQL），用於建置後的查詢計畫報告
+
+    每筆為 (說明, SQL, 參數, 預期會掃描的原因)。有註明原因的查詢（例如每個資料庫版本只執行一次）
+    報告中列出但不算入警告。翻譯對照表、輸入提示索引與相似度矩陣等整表載入每個版本只執行一次，不列入報告。
+    """
+    cursor = conn.cursor()
+    table_columns = {}
+    for section in DISPLAY_SECTIONS:
+        table_columns[section.table] = [column[1] for column in _table_columns(cursor, section.table)]
+    projection = FieldRegistry(table_columns).projection()
+
+    ids = (1, 2)
+    name_kinds = ("name", "chinese")
+    return [
+        ("物質是否存在", queries.existing_ids(len(ids)), ids, None),
+        ("預先格式化的顯示字串", queries.display_values(len(ids)), ids, None),
+        *(
+            (f"顯示欄位（{table}）", queries.field_values(table, columns, len(ids)), ids, None)
+            for table, columns in projection.items()
+        ),
+        ("別名", queries.aliases(len(ids)), ids, None),
+        ("異構物與鹽基形式家族", queries.families(len(ids)), ids, None),
+        ("所有物質列表（keyset 分頁）", queries.KEYSET_PAGE, ("A", "A", 0, 50), None),
+        ("每頁第一筆的排序鍵", queries.PAGE_ANCHORS, (), "每個資料庫版本一次"),
+        ("依名稱開頭跳頁", queries.PREFIX_LOOKUP, ("A",), None),
+        ("跳頁前的筆數", queries.PREFIX_COUNT, ("A", "A", 0), None),
+        ("識別碼完全比對", queries.identifier_lookup(len(name_kinds)), ("x", *name_kinds), None),
+        ("全文檢索", queries.search_index(len(name_kinds), True), ("abc", "abc%", '"abc"', *name_kinds), None),
+        ("全文檢索（少於 3 個字元）", queries.search_index(len(name_kinds), None), ("ab", "ab%", "%ab%", *name_kinds), None),
+        ("數值屬性範圍篩選", queries.property_range(">"), ("Koc_mlg", 100, 100), None),
+        ("數值屬性篩選", queries.property_filter([">"]), ("Koc_mlg", 100, 100, 100), None),
+        ("數值屬性排序", queries.property_sort([]), ("Koc_mlg", 100), None),
+        ("數值屬性排序（遞減）", queries.property_sort([], descending=True), ("Koc_mlg", 100), None),
+        ("數值屬性篩選並排序", queries.property_sort([">"]), ("Koc_mlg", "Koc_mlg", 100, 100, 100), None),
+        (
+            "沒有排序屬性值的物質",
+            queries.property_sort_missing([]),
+            ("Koc_mlg", 100),
+            "依名稱索引讀到 LIMIT 筆即停止，且只在有值的物質不足一頁時執行",
+        ),
+    ]
+
+
+def _table_columns(cursor: sqlite3.Cursor, table_name: str) -> List[tuple]:
+    """回傳 PRAGMA table_info 結果"""
+    cursor.execute(f'PRAGMA table_info("{table_name}")')
+    return cursor.fetchall()
+
+
+def _rebuild_with_primary_key(cursor: sqlite3.Cursor, table_name: str) -> bool:
+    """ID 欄位唯一且皆為整數時，將表格重建為以 ID 為 INTEGER PRIMARY KEY
+
+    Returns:
+        是否有重建
+    """
+    columns = _table_columns(cursor, table_name)
+    names = [column[1] for column in columns]
+    if "ID" not in names or any(column[5] for column in columns):
+        return False
+
+    cursor.execute(f"""
+        SELECT COUNT(*), COUNT(DISTINCT ID), SUM(typeof(ID) = 'integer')
+        FROM "{table_name}"
+    """)
+    total, distinct, integers = cursor.fetchone()
+    if total != distinct or total != (integers or 0):
+        return False
+
+    rebuilt = f"{table_name}__pk"
+    column_sql = ", ".join('"ID" INTEGER PRIMARY KEY' if name == "ID" else f'"{name}"' for name in names)
+    cursor.execute(f'DROP TABLE IF EXISTS "{rebuilt}"')
+    cursor.execute(f'CREATE TABLE "{rebuilt}" ({column_sql})')
+    cursor.execute(f'INSERT INTO "{rebuilt}" SELECT * FROM "{table_name}"')
+    cursor.execute(f'DROP TABLE "{table_name}"')
+    cursor.execute(f'ALTER TABLE "{rebuilt}" RENAME TO "{table_name}"')
+    return True
+
+
+def optimize_schema(conn: sqlite3.Connection):
+    """為工作表表格宣告主鍵並建立次要索引
+
+    每張 ID 唯一的工作表表格改以 ID 為 INTEGER PRIMARY KEY（rowid），
+    其餘查詢欄位建立 SECONDARY_INDEXES 中的索引。
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT table_name FROM Build_Sheets")
+    sheet_tables = [row[0] for row in cursor.fetchall()]
+
+    for table_name in sheet_tables:
+        if _rebuild_with_primary_key(cursor, table_name):
+            print(f"  • {table_name}: ID 設為 INTEGER PRIMARY KEY")
+
+    for index_name, table_name, column_sql in SECONDARY_INDEXES:
+        names = [column[1] for column in _table_columns(cursor, table_name)]
+        indexed = [part.split('"')[1] for part in column_sql.split(",")]
+        if not names or not all(name in names for name in indexed):
+            continue
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS "{index_name}" ON "{table_name}" ({column_sql})')
+        print(f"  • 索引 {index_name} ON {table_name}({column_sql})")
+
+    conn.commit()
+
+
+def analyze_and_vacuum(conn: sqlite3.Connection, vacuum: bool = True):
+    """更新查詢規劃器統計資料，vacuum 為 True 時並重整資料庫檔案"""
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.commit()
+    if vacuum:
+        conn.execute("VACUUM")
+
+
+def query_plan_warnings(details: List[str]) -> Tuple[List[str], List[str]]:
+    """由 EXPLAIN QUERY PLAN 的各列判斷查詢計畫的問題
+
+    - SCAN 一般表格：全表掃描
+    - SCAN ... USING (COVERING) INDEX：依索引順序讀完整個索引，仍與資料量成正比
+    - USE TEMP B-TREE：結果需另外排序、分組或去重
+    FTS5 虛擬表的 SCAN（MATCH 由全文索引處理）與子查詢結果（CO-ROUTINE / MATERIALIZE）的 SCAN 不算掃描。
+
+    Returns:
+        (掃描, 暫存 B-tree)
+    """
+    subqueries = {
+        detail.split()[-1] for detail in details
+        if detail.startswith(("CO-ROUTINE ", "MATERIALIZE "))
+    }
+    scans = []
+    sorts = []
+    for detail in details:
+        if detail.startswith("SCAN ") and "VIRTUAL TABLE" not in detail:
+            if detail.split()[1] not in subqueries:
+                scans.append("索引全掃描" if "USING" in detail else "全表掃描")
+        elif detail.startswith("USE TEMP B-TREE"):
+            sorts.append("暫存 B-tree")
+    return list(dict.fromkeys(scans)), list(dict.fromkeys(sorts))
+
+
+def print_query_plan_report(conn: sqlite3.Connection) -> Tuple[int, int]:
+    """列出 main.py 查詢（known_queries）的查詢計畫
+
+    掃描整個表格或索引的查詢標示 ⚠，需要暫存 B-tree 排序的查詢標示 △
+    （通常是已由索引定位的少量結果再排序，但若結果集很大同樣會變慢）。
+
+    Returns:
+        (有掃描的每請求查詢數, 其餘需要暫存 B-tree 的每請求查詢數)
+    """
+    cursor = conn.cursor()
+    scan_count = 0
+    sort_count = 0
+    for description, sql, params, expected in known_queries(conn):
+        try:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        except sqlite3.OperationalError as e:
+            print(f"  - {description}: 略過（{e}）")
+            continue
+
+        details = [row[3] for row in cursor.fetchall()]
+        scans, sorts = query_plan_warnings(details)
+        warnings = "、".join(scans + sorts)
+        if warnings and expected:
+            marker = f"· {warnings}（{expected}）"
+        elif scans:
+            marker = f"⚠ {warnings}"
+            scan_count += 1
+        elif sorts:
+            marker = f"△ {warnings}"
+            sort_count += 1
+        else:
+            marker = "✓"
+        print(f"  {marker} {description}: {' | '.join(' '.join(d.split()) for d in details)}")
+
+    return scan_count, sort_count
+
+
+@contextmanager
+def building_copy(db_file: Path, copy_existing: bool = False) -> Iterator[Path]:
+    """提供建置用的暫存資料庫檔，區塊正常結束後以 os.replace 原子替換 db_file
+
+    區塊內發生例外時刪除暫存檔，db_file 保持不變。
+    呼叫端必須在區塊結束前關閉暫存檔上的連線。
+    """
+    build_file = db_file.with_name(f"{db_file.name}.building")
+    build_file.unlink(missing_ok=True)
+
+    if copy_existing and db_file.exists():
+        # 以 SQLite backup API 複製，避免複製到寫入中途的檔案
+        source = sqlite3.connect(str(db_file))
+        target = sqlite3.connect(str(build_file))
+        try:
+            source.backup(target)
+        finally:
+            source.close()
+            target.close()
+
+    try:
+        yield build_file
+    except BaseException:
+        build_file.unlink(missing_ok=True)
         raise
+
+    os.replace(build_file, db_file)
+
+
+# 工作表以外、衍生資料也會用到的輸入檔；內容變動時增量建置仍需重建衍生資料
+DERIVED_INPUTS = [Path("translation.csv"), ISOMER_WORKBOOK]
+
+
+def derived_inputs_hash() -> str:
+    """DERIVED_INPUTS 各檔案內容的雜湊（不存在的檔案也計入）"""
+    hasher = hashlib.sha256()
+    for path in DERIVED_INPUTS:
+        hasher.update(f"{path.name}\n".encode("utf-8"))
+        hasher.update(path.read_bytes() if path.exists() else b"<missing>")
+    return hasher.hexdigest()
+
+
+def read_previous_build(db_file: Path) -> Tuple[dict, Optional[str]]:
+    """以唯讀方式讀取現有資料庫的建置紀錄
+
+    Returns:
+        ({工作表名稱: (表格名稱, 內容雜湊)}, 衍生資料輸入檔雜湊)；沒有紀錄時為 ({}, None)
+    """
+    if not db_file.exists():
+        return {}, None
+    conn = sqlite3.connect(f"{db_file.resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT sheet_name, table_name, content_hash FROM Build_Sheets")
+        previous = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+        cursor.execute("SELECT value FROM Build_Info WHERE key = 'inputs_hash'")
+        row = cursor.fetchone()
+        return previous, row[0] if row else None
+    except sqlite3.OperationalError:
+        return {}, None
     finally:
         conn.close()
 
+
+def convert_excel_to_sqlite(incremental: bool = False):
+    """將 database.xlsx 轉換為 database.db
+
+    以 openpyxl read_only 模式逐列讀取，分批寫入 SQLite，記憶體用量不隨工作表大小成長。
+    建置在暫存檔上進行，成功後才替換 database.db，執行中的 main.py 會自動切換到新資料庫。
+
+    增量模式先以唯讀方式讀過每個工作表計算雜湊，與上次建置的紀錄比對：
+    工作表與衍生資料輸入檔都沒有變動時不寫入任何檔案；有變動時只重新寫入變動的工作表，
+    沒有工作表表格變動時也略過 VACUUM。
+
+    Args:
+        incremental: 保留現有資料庫，只重建內容雜湊有變動的工作表
+    """
+
+    # 讀取 Excel 檔案
+    excel_file = Path("database.xlsx")
+    db_file = Path("database.db")
+    inputs_hash = derived_inputs_hash()
+
+    previous_hashes = {}
+    if incremental:
+        previous, previous_inputs_hash = read_previous_build(db_file)
+        workbook = load_workbook(excel_file, read_only=True, data_only=True)
+        try:
+            print(f"比對 {len(workbook.sheetnames)} 個工作表的內容雜湊:")
+            for sheet_name in workbook.sheetnames:
+                content_hash, row_count = sheet_content_hash(workbook[sheet_name])
+                unchanged = previous.get(sheet_name, (None, None))[1] == content_hash
+                previous_hashes[sheet_name] = content_hash if unchanged else None
+                print(f"  • {sheet_name}: {row_count} 筆資料，{'未變更' if unchanged else '有變更'}")
+            sheet_names = workbook.sheetnames
+        finally:
+            workbook.close()
+
+        if (
+            previous
+            and set(previous) == set(sheet_names)
+            and all(previous_hashes.values())
+            and previous_inputs_hash == inputs_hash
+        ):
+            print(f"\n✓ 內容沒有變更，保留現有的 {db_file}")
+            return
+
+    # 在暫存檔上建置，完成後才以原子方式替換 database.db；
+    # 非增量模式從空白資料庫開始，增量模式先複製現有資料庫
+    with building_copy(db_file, copy_existing=incremental) as build_file:
+        # 建立 SQLite 連線
+        conn = sqlite3.connect(str(build_file))
+
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS Build_Sheets (
+                    sheet_name TEXT PRIMARY KEY,
+                    table_name TEXT NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    row_count INTEGER NOT NULL,
+                    built_at TEXT NOT NULL
+                )
+            """)
+            cursor.execute("SELECT sheet_name, table_name, content_hash FROM Build_Sheets")
+            previous = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+
+            # 讀取 Excel 所有工作表
+            workbook = load_workbook(excel_file, read_only=True, data_only=True)
+            print(f"找到 {len(workbook.sheetnames)} 個工作表:")
+
+            changed = 0
+            for sheet_name in workbook.sheetnames:
+                print(f"  處理工作表: {sheet_name}")
+                table_name = sheet_table_name(sheet_name)
+                if previous_hashes.get(sheet_name):
+                    print(f"    → 內容未變更，保留表格 '{table_name}'")
+                    continue
+
+                content_hash, row_count, column_count = load_sheet(conn, workbook[sheet_name], table_name)
+                changed += 1
+                cursor.execute(
+                    "INSERT OR REPLACE INTO Build_Sheets VALUES (?, ?, ?, ?, ?)",
+                    (sheet_name, table_name, content_hash, row_count, datetime.now().isoformat(timespec="seconds")),
+                )
+                conn.commit()
+                print(f"    → 已建立表格 '{table_name}'，共 {row_count} 筆資料，{column_count} 個欄位")
+
+            workbook.close()
+
+            # 移除已不存在於 Excel 中的工作表
+            for sheet_name, (table_name, _) in previous.items():
+                if sheet_name not in workbook.sheetnames:
+                    cursor.execute(f'DROP TABLE IF EXISTS "{table_name}"')
+                    cursor.execute("DELETE FROM Build_Sheets WHERE sheet_name = ?", (sheet_name,))
+                    conn.commit()
+                    changed += 1
+                    print(f"  移除工作表表格: {table_name}")
+
+            print(f"\n✓ 成功將資料轉換為 {db_file}（{changed} 個工作表有變更）")
+
+            # 顯示資料庫結構
+            cursor.execute("SELECT table_name, row_count FROM Build_Sheets ORDER BY rowid")
+            tables = cursor.fetchall()
+
+            print(f"\n資料庫包含 {len(tables)} 個工作表表格:")
+            for table_name, count in tables:
+                cursor.execute(f'PRAGMA table_info("{table_name}")')
+                columns = cursor.fetchall()
+                print(f"  • {table_name}: {count} 筆資料, {len(columns)} 個欄位")
+
+            # 主鍵與次要索引
+            print("\n最佳化資料表結構:")
+            optimize_schema(conn)
+
+            # 匯入中文翻譯（搜尋索引需要 Translation 表）
+            print("\n匯入中文翻譯:")
+            import_translation_to_db(str(build_file))
+
+            # 建立衍生資料
+            print("\n建立搜尋索引與預先合併資料:")
+            # 舊版建置的 Substance_Details 已不再使用（增量建置會沿用上次的資料庫）
+            conn.execute("DROP TABLE IF EXISTS Substance_Details")
+            build_search_index(conn)
+            build_identifier_index(conn)
+            build_property_values(conn)
+            build_structure_fingerprints(conn)
+            build_display_values(conn)
+            build_substance_families(conn)
+            write_build_info(conn, inputs_hash)
+
+            if changed:
+                print("\n更新統計資料並重整資料庫 (ANALYZE, VACUUM)")
+            else:
+                print("\n更新統計資料 (ANALYZE；工作表表格沒有變更，略過 VACUUM)")
+            analyze_and_vacuum(conn, vacuum=bool(changed))
+
+            print("\n查詢計畫報告:")
+            scan_count, sort_count = print_query_plan_report(conn)
+            if scan_count:
+                print(f"  警告：{scan_count} 個查詢掃描整個表格或索引")
+            if sort_count:
+                print(f"  注意：{sort_count} 個查詢以暫存 B-tree 排序結果")
+
+        except Exception as e:
+            print(f"錯誤: {e}")
+            raise
+        finally:
+            conn.close()
+
+    print(f"\n✓ 已替換 {db_file}")
+
+
 if __name__ == "__main__":
-    convert_excel_to_sqlite()
+    parser = argparse.ArgumentParser(description="將 database.xlsx 轉換為 database.db")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="保留現有資料庫，只重建內容有變動的工作表",
+    )
+    args = parser.parse_args()
+    convert_excel_to_sqlite(incremental=args.incremental)
@@ -0,0 +1,281 @@
+"""顯示欄位登錄表
+
+物質詳細頁、比對表格與 Excel 匯出共用同一份欄位清單（DISPLAY_SECTIONS）。
+FieldRegistry 在啟動時（每個資料庫版本一次）以 field_mapping.csv 與 PRAGMA table_info
+把每個欄位解析成確切的資料表欄位、比較運算符欄位、單位與中英文標籤，
+之後顯示時直接使用，不必再逐次嘗試各種名稱變體；查詢也只需選取要顯示的欄位。
+"""
+
+import csv
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+# 欄位名稱中的單位字尾 -> 標準單位（順序即比對優先順序）
+UNIT_PATTERNS = {
+    'mgkg_BWday': 'mg/kg BW/day',
+    'mgkg': 'mg/kg',
+    'mgl': 'mg/l',
+    'ug_per_bee': 'μg/bee',
+    'days': 'days',
+    'mlg': 'mL/g',
+    'degC': '°C',
+    'Pam3mol': 'Pa m³/mol',
+    'mPa': 'mPa',
+}
+
+
+def clean_column_name(name: str) -> str:
+    """Excel 標題 -> 資料表欄位名稱（去除前後空白、空格轉底線、移除非 \\w 字元）"""
+    return re.sub(r'[^\w]', '', name.strip().replace(' ', '_'))
+
+
+def normalized_field_name(name: str) -> str:
+    """比對用的寬鬆名稱：小寫並合併連續底線"""
+    return re.sub(r'_+', '_', name.lower()).strip('_')
+
+
+def property_unit(column: str) -> str:
+    """由欄位名稱推得標準單位
+
+    優先比對欄位結尾（忽略 __TEMPERATE 這類後綴），避免 Henrys_law_constant_at_25_degC_Pam3mol 被判成 °C。
+    """
+    base = re.sub(r'__[A-Z]+$', '', column)
+    for pattern, unit in UNIT_PATTERNS.items():
+        if base.endswith(pattern):
+            return unit
+    for pattern, unit in UNIT_PATTERNS.items():
+        if pattern in column:
+            return unit
+    return ""
+
+
+def operator_column(column: str, columns: List[str]) -> Optional[str]:
+    """找出數值欄位對應的比較運算符欄位
+
+    - Terrestrial: Mammals__Acute_oral_LD50_mgkg_BWday -> __Mammals__Acute_oral_LD50
+    - Aquatic: Fish__Acute_96hr_LC50_mgl__TEMPERATE -> __Fish__Acute_96hr_LC50__TEMPERATE
+    """
+    suffixes = "mgkg_BWday|mgkg|mgl|ug_per_bee|days|mlg|degC"
+    for base in (
+        re.sub(rf'_({suffixes})$', '', column),
+        re.sub(rf'_({suffixes})(__?[A-Z]+)?$', r'\2', column),
+    ):
+        if f"__{base}" in columns and f"__{base}" != column:
+            return f"__{base}"
+    return None
+
+
+def format_display_value(value: Any, operator: Any = None, unit: str = "") -> str:
+    """組合顯示字串：{比較運算符} {數值} {單位}，例如 "> 150 mg/kg BW/day"；沒有值時為 N/A"""
+    if value in [None, "", "nan"]:
+        return "N/A"
+    parts = []
+    if operator not in [None, "", "nan"]:
+        parts.append(str(operator))
+    parts.append(str(value))
+    if unit:
+        parts.append(unit)
+    return " ".join(parts).strip()
+
+
+@dataclass(frozen=True)
+class DisplaySection:
+    """顯示區塊：對應一個工作表"""
+
+    key: str
+    table: str
+    title: str
+    category: str
+    fields: Tuple[str, ...]
+    ecotox: bool = False
+
+
+# 顯示欄位（詳細頁、比對表格、Excel 匯出共用，依此順序顯示）
+DISPLAY_SECTIONS = (
+    DisplaySection(
+        "identification", "Identification", "General Information / 一般資料", "一般資料",
+        (
+            "Active",
+            "CAS_RN",
+            "Availability_status",
+            "Isomerism",
+            "Chemical_formula",
+            "Canonical_SMILES",
+            "Isomeric_SMILES",
+            "International_Chemical_Identifier_InChI",
+            "International_Chemical_Identifier_key_InChIKey",
+            "Molecular_mass",
+            "Pesticide_type",
+            "Substance_group",
+            "Mode_of_action",
+        ),
+    ),
+    DisplaySection(
+        "fate", "Fate", "Environmental Fate / 環境命運", "環境命運",
+        (
+            "Solubility__In_water_at_20_degC_mgl",
+            "Melting_point_degC",
+            "Boiling_point_deg_C_1atm",
+            "LogP",
+            "Dissociation_constant_pKa_at_25_degC",
+            "Vapour_pressure_at_20_degC_mPa",
+            "Henrys_law_constant_at_25_degC_Pam3mol",
+            "Soil_DT50__Typical_days",
+            "Soil_DT50__Lab_days",
+            "Soil_DT50__Field_days",
+            "Watersediment_DT50_days",
+            "Koc_mlg",
+            "Kfoc_mlg",
+            "Bioconcentration_factor",
+        ),
+    ),
+    DisplaySection(
+        "terrestrial_ecotox", "Terrestrial_Ecotox", "Terrestrial Ecotoxicology / 陸生生態毒理", "陸生生態毒理",
+        (
+            "Mammals__Acute_oral_LD50_mgkg_BWday",
+            "Birds__Acute_LD50_mgkg",
+            "Earthworms__Acute_14d_LC50_mgkg",
+            "Honeybees__Contact_acute_48hr_LD50_ug_per_bee",
+        ),
+        ecotox=True,
+    ),
+    DisplaySection(
+        "aquatic_ecotox", "Aquatic_Ecotox", "Aquatic Ecotoxicology / 水生生態毒理", "水生生態毒理",
+        (
+            "Fish__Acute_96hr_LC50_mgl__TEMPERATE",
+            "Algae__Acute_72hr_EC50_growth_mgl",
+        ),
+        ecotox=True,
+    ),
+    DisplaySection(
+        "human", "Human", "Human Health / 人體健康", "人體健康",
+        (
+            "Mammals__Dermal_LD50_mgkg",
+            "Mammals__Inhalation_LC50_mgl",
+            "Acceptable_Daily_Intake_ADI_mgkg_bw",
+            "Acute_Reference_Dose_ARfD_mgkg_BWday",
+            "Acceptable_Operator_Exposure_Level_AOEL_systemic",
+            "Percutaneous_penetration_studies_",
+            "Carcinogen",
+            "Genotoxic",
+            "Endocrine_distrupter",
+            "Reproductiondevelopment_effects",
+            "Acetyl_cholinesterase_inhibitor",
+            "Neurotoxicant",
+            "Respiratory_tract_irritant",
+            "Skin_irritant",
+            "Skin_sensitiser",
+            "Eye_irritant",
+            "Phototoxicant",
+            "General_human_health_issues",
+            "Handling_issues",
+        ),
+    ),
+)
+
+
+@dataclass
+class DisplayField:
+    """解析完成的顯示欄位"""
+
+    key: str
+    section: DisplaySection
+    column: Optional[str]
+    operator_column: Optional[str]
+    unit: str
+    info: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def label(self) -> str:
+        """中英文標籤"""
+        if self.info['zh']:
+            return f"{self.info['en']} / {self.info['zh']}"
+        return self.info['en']
+
+    def format(self, value: Any, operator: Any = None) -> str:
+        """格式化欄位值；Ecotox 欄位加上比較運算符與單位"""
+        if self.section.ecotox:
+            return format_display_value(value, operator, self.unit)
+        return format_display_value(value)
+
+
+def load_field_labels(mapping_file: str = "field_mapping.csv") -> Dict[str, Dict[str, str]]:
+    """讀取 field_mapping.csv，回傳 {寬鬆欄位名稱: 標籤資訊}"""
+    labels: Dict[str, Dict[str, str]] = {}
+    try:
+        with open(mapping_file, encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f):
+                cell_name = (row.get("cell name") or "").strip()
+                if not cell_name:
+                    continue
+                labels.setdefault(normalized_field_name(clean_column_name(cell_name)), {
+                    'en': (row.get("Title") or "").strip() or cell_name,
+                    'zh': (row.get("農藥名稱") or "").strip(),
+                    'class': (row.get("類別") or "").strip(),
+                    'sheet': (row.get("Sheet") or "").strip(),
+                    'column': (row.get("Column") or "").strip(),
+                    'cell_name': cell_name,
+                })
+    except OSError as e:
+        print(f"Warning: Could not load field mapping: {e}")
+    return labels
+
+
+class FieldRegistry:
+    """以實際資料表結構解析 DISPLAY_SECTIONS 的欄位登錄表
+
+    table_columns 為 {資料表: PRAGMA table_info 的欄位名稱列表}。欄位名稱先找完全相同者，
+    找不到再以寬鬆名稱（不分大小寫、合併底線）比對；資料庫中不存在的欄位 column 為 None，顯示為 N/A。
+    """
+
+    def __init__(
+        self,
+        table_columns: Dict[str, List[str]],
+        mapping_file: str = "field_mapping.csv",
+        sections: Tuple[DisplaySection, ...] = DISPLAY_SECTIONS,
+    ):
+        labels = load_field_labels(mapping_file)
+        self.sections = sections
+        self.fields: List[DisplayField] = []
+        self.missing: List[str] = []
+
+        for section in sections:
+            columns = table_columns.get(section.table, [])
+            loose = {normalized_field_name(column): column for column in columns}
+            for key in section.fields:
+                column = key if key in columns else loose.get(normalized_field_name(key))
+                if column is None:
+                    self.missing.append(f"{section.table}.{key}")
+                name = column or key
+                info = labels.get(normalized_field_name(name)) or {
+                    'en': key.replace('_', ' ').strip(),
+                    'zh': '',
+                    'class': '',
+                    'sheet': '',
+                    'column': '',
+                    'cell_name': key,
+                }
+                self.fields.append(DisplayField(
+                    key=key,
+                    section=section,
+                    column=column,
+                    operator_column=operator_column(column, columns) if column and section.ecotox else None,
+                    unit=property_unit(name) if section.ecotox else "",
+                    info=info,
+                ))
+
+        self.by_key = {display_field.key: display_field for display_field in self.fields}
+
+    def section_fields(self, section_key: str) -> List[DisplayField]:
+        """指定區塊的欄位（依顯示順序）"""
+        return [display_field for display_field in self.fields if display_field.section.key == section_key]
+
+    def projection(self) -> Dict[str, List[str]]:
+        """每個資料表需要選取的欄位（顯示欄位加上比較運算符欄位）"""
+        columns: Dict[str, List[str]] = {}
+        for display_field in self.fields:
+            for column in (display_field.column, display_field.operator_column):
+                if column and column not in columns.setdefault(display_field.section.table, []):
+                    columns[display_field.section.table].append(column)
+        return columns
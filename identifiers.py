@@ -0,0 +1,46 @@
+"""識別碼正規化（建置 Identifier_Index 與查詢時共用）
+
+CAS RN、InChIKey、名稱、別名與中文名稱都以同一規則正規化後作為索引鍵：
+全形轉半形（NFKC）、轉大寫、移除所有空白與各種連字號。
+因此 "33089-61-1"、"33089611"、" ３３０８９－６１－１ " 與 "benalaxyl m"、"Benalaxyl-M" 各自對應到同一個鍵。
+"""
+
+import re
+import unicodedata
+from typing import List
+
+# 空白與各種連字號／破折號（含減號 U+2212）
+_SEPARATORS = re.compile(r"[\s\-‐-―−﹣－]+")
+_CAS_PATTERN = re.compile(r"^(\d{2,7})-?(\d{2})-?(\d)$")
+_CAS_IN_TEXT = re.compile(r"\b\d{2,7}-\d{2}-\d\b")
+
+
+def normalize_identifier(value) -> str:
+    """識別碼索引鍵：NFKC、大寫、移除空白與連字號；空值回傳空字串"""
+    if value is None:
+        return ""
+    text = unicodedata.normalize("NFKC", str(value))
+    return _SEPARATORS.sub("", text).upper()
+
+
+def is_cas_number(value) -> bool:
+    """是否為 CAS RN 格式（2-7 位數字、2 位數字、1 位檢查碼，連字號可省略）"""
+    return _CAS_PATTERN.match(unicodedata.normalize("NFKC", str(value or "")).strip()) is not None
+
+
+def is_valid_cas(value) -> bool:
+    """CAS RN 格式正確且檢查碼相符
+
+    檢查碼 = 由右至左（不含檢查碼）各位數字乘以 1, 2, 3 ... 的總和除以 10 的餘數。
+    """
+    match = _CAS_PATTERN.match(unicodedata.normalize("NFKC", str(value or "")).strip())
+    if not match:
+        return False
+    digits = match.group(1) + match.group(2)
+    total = sum(int(digit) * weight for weight, digit in enumerate(reversed(digits), start=1))
+    return total % 10 == int(match.group(3))
+
+
+def cas_numbers(value) -> List[str]:
+    """取出欄位中所有 CAS RN（例如 "1071-83-6 (acid); 38641-94-0"）"""
+    return _CAS_IN_TEXT.findall(unicodedata.normalize("NFKC", str(value or "")))
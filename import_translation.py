@@ -2,11 +2,11 @@ import pandas as pd
 import sqlite3
 from pathlib import Path
 
-def import_translation_to_db():
-    """將 translation.csv 匯入到 database.db"""
+def import_translation_to_db(db_path: str = "database.db"):
+    """將 translation.csv 匯入到 database.db（或 db_path 指定的資料庫）"""
 
     translation_file = Path("translation.csv")
-    db_file = Path("database.db")
+    db_file = Path(db_path)
 
     if not translation_file.exists():
         print(f"錯誤：找不到 {translation_file}")
@@ -96,4 +96,16 @@ def import_translation_to_db():
         conn.close()
 
 if __name__ == "__main__":
-    import_translation_to_db()
+    from convert_to_db import build_identifier_index, build_search_index, building_copy, write_build_info
+
+    # 在資料庫複本上匯入並重建搜尋索引與識別碼索引，完成後原子替換，執行中的 main.py 不會讀到一半的資料
+    with building_copy(Path("database.db"), copy_existing=True) as build_file:
+        import_translation_to_db(str(build_file))
+
+        conn = sqlite3.connect(str(build_file))
+        try:
+            build_search_index(conn)
+            build_identifier_index(conn)
+            write_build_info(conn)
+        finally:
+            conn.close()
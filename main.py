@@ -1,71 +1,43 @@
 import sqlite3
-import pandas as pd
-from nicegui import ui
-from typing import List, Dict, Any, Optional
+import numpy as np
+from fastapi import File, Form, HTTPException, Query, Request, UploadFile
+from fastapi.responses import JSONResponse, Response
+from nicegui import app, run, ui
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Set, Tuple
 from io import BytesIO
+from abc import ABC, abstractmethod
 from datetime import datetime
-import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+import asyncio
+import bisect
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+
+from field_registry import DISPLAY_SECTIONS, DisplayField, FieldRegistry, load_field_labels, normalized_field_name
+from identifiers import is_cas_number, is_valid_cas, normalize_identifier
+import queries
+from smiles_fingerprint import FINGERPRINT_BYTES, SmilesError, fingerprint
 
 
 class FieldMapper:
     """欄位對應類別，載入中英文對照表"""
 
     def __init__(self, mapping_file: str = "field_mapping.csv"):
-        try:
-            self.mapping = pd.read_csv(mapping_file, encoding='utf-8')
-            # 建立快速查找字典
-            self.field_info = {}
-            for _, row in self.mapping.iterrows():
-                cell_name = str(row['cell name']).strip() if pd.notna(row['cell name']) else ""
-                if cell_name:
-                    info = {
-                        'en': str(row['Title']) if pd.notna(row['Title']) else cell_name,
-                        'zh': str(row['農藥名稱']) if pd.notna(row['農藥名稱']) else "",
-                        'class': str(row['類別']) if pd.notna(row['類別']) else "",
-                        'sheet': str(row['Sheet']) if pd.notna(row['Sheet']) else "",
-                        'column': str(row['Column']) if pd.notna(row['Column']) else "",
-                        'cell_name': cell_name
-                    }
-
-                    # 生成多種可能的資料庫欄位名稱變體
-                    variants = [
-                        # 原始名稱
-                        cell_name,
-                        # 空格轉底線
-                        cell_name.replace(' ', '_'),
-                        # 空格和破折號轉雙底線
-                        cell_name.replace(' - ', '__').replace(' ', '_'),
-                        # 移除括號和單位
-                        cell_name.replace(' (', '').replace(')', '').replace('/', '').replace(' ', '_'),
-                        # 完整轉換（破折號變雙底線，空格變底線）
-                        cell_name.replace(' - ', '__').replace('-', '_').replace(' ', '_').replace('(', '').replace(')', '').replace('/', ''),
-                    ]
-
-                    # 為每個變體建立映射
-                    for variant in variants:
-                        if variant:
-                            self.field_info[variant] = info
-                            # 也嘗試清理連續的底線
-                            cleaned = variant.replace('___', '__').replace('__', '_')
-                            if cleaned != variant:
-                                self.field_info[cleaned] = info
-
-        except Exception as e:
-            print(f"Warning: Could not load field mapping: {e}")
-            self.field_info = {}
+        # 以寬鬆名稱（不分大小寫、合併底線）為鍵，查詢時只需一次字典查找
+        self.field_info = load_field_labels(mapping_file)
 
     def get_field_info(self, db_field: str) -> Dict[str, str]:
         """根據資料庫欄位名稱取得欄位資訊"""
-        # 嘗試多種匹配方式
-        field_variants = [
-            db_field,
-            db_field.replace('__', '_').replace('___', '_'),
-            db_field.replace('_', ' '),
-        ]
-
-        for variant in field_variants:
-            if variant in self.field_info:
-                return self.field_info[variant]
+        info = self.field_info.get(normalized_field_name(db_field))
+        if info:
+            return info
 
         # 如果找不到，返回預設值
         return {
@@ -85,21 +57,530 @@ class FieldMapper:
         return info['en']
 
 
+class QueryTimeoutError(TimeoutError):
+    """資料庫查詢超過時限"""
+
+
+class QueryCancelledError(Exception):
+    """資料庫查詢已取消（使用者離開頁面或送出新的查詢）"""
+
+
+class DatabaseBusyError(QueryTimeoutError):
+    """等待執行的查詢已達上限，暫時不接受新的查詢"""
+
+
+# SQLite 每執行多少個虛擬機指令呼叫一次 progress handler（約數十微秒）
+PROGRESS_HANDLER_STEPS = 1000
+
+_current_budget = threading.local()
+
+
+class QueryBudget:
+    """單一請求的查詢時限與取消旗標
+
+    執行查詢的執行緒以 query_budget() 設定目前的 QueryBudget；ConnectionPool 借出連線時安裝
+    SQLite progress handler，超過期限或被取消時中止執行中的查詢。
+    cancel() 另對借出中的連線呼叫 interrupt()，不必等到下一次 progress handler 檢查。
+    """
+
+    def __init__(self, timeout: Optional[float] = None):
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.cancelled = False
+        self._connections: Set[sqlite3.Connection] = set()
+        self._lock = threading.Lock()
+
+    def remaining(self) -> Optional[float]:
+        """距離期限的秒數；沒有期限時為 None"""
+        return None if self.deadline is None else max(0.0, self.deadline - time.monotonic())
+
+    def exhausted(self) -> bool:
+        """已取消或超過期限（progress handler 回傳 True 時 SQLite 中止查詢）"""
+        return self.cancelled or (self.deadline is not None and time.monotonic() >= self.deadline)
+
+    def check(self):
+        """已取消時拋出 QueryCancelledError，超過期限時拋出 QueryTimeoutError"""
+        if self.cancelled:
+            raise QueryCancelledError("Database query cancelled")
+        if self.exhausted():
+            raise QueryTimeoutError("Database query timed out")
+
+    def cancel(self):
+        """取消查詢並中止借出中連線上執行中的語句"""
+        with self._lock:
+            self.cancelled = True
+            for conn in self._connections:
+                conn.interrupt()
+
+    def attach(self, conn: sqlite3.Connection):
+        with self._lock:
+            self._connections.add(conn)
+        conn.set_progress_handler(self.exhausted, PROGRESS_HANDLER_STEPS)
+
+    def detach(self, conn: sqlite3.Connection):
+        conn.set_progress_handler(None, 0)
+        with self._lock:
+            self._connections.discard(conn)
+
+
+@contextmanager
+def query_budget(budget: Optional[QueryBudget]) -> Iterator[Optional[QueryBudget]]:
+    """在 with 區塊內，本執行緒借出的連線都受 budget 的時限與取消旗標約束"""
+    previous = getattr(_current_budget, "budget", None)
+    _current_budget.budget = budget
+    try:
+        yield budget
+    finally:
+        _current_budget.budget = previous
+
+
+class ConnectionPool:
+    """SQLite 唯讀連線池
+
+    連線在第一次需要時建立，之後重複使用，最多 max_size 條。
+    每條連線只在建立時設定一次 PRAGMA（query_only、mmap、cache），
+    避免每次查詢都重新開檔與解析 schema。
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        max_size: int = 8,
+        timeout: float = 10.0,
+        mmap_size: int = 256 * 1024 * 1024,
+        cache_size_kib: int = 16 * 1024,
+    ):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.timeout = timeout
+        self.mmap_size = mmap_size
+        self.cache_size_kib = cache_size_kib
+        self._idle: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._retired = False
+
+    def _connect(self) -> sqlite3.Connection:
+        """建立一條新的唯讀連線並套用調校參數"""
+        uri = f"{Path(self.db_path).resolve().as_uri()}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA query_only = ON")
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        # 負值代表以 KiB 為單位
+        conn.execute(f"PRAGMA cache_size = -{int(self.cache_size_kib)}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        return conn
+
+    def acquire(self) -> sqlite3.Connection:
+        """取得一條連線；池已滿時等待其他請求歸還"""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._created < self.max_size:
+                self._created += 1
+                try:
+                    return self._connect()
+                except Exception:
+                    self._created -= 1
+                    raise
+
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No database connection available within {self.timeout}s")
+
+    def release(self, conn: sqlite3.Connection):
+        """歸還連線；連線池已停用時直接關閉
+
+        停用旗標的檢查與放回閒置佇列在同一把鎖內完成，retire() 清空佇列時不會有連線被放回已停用的連線池。
+        """
+        with self._lock:
+            if not self._retired:
+                self._idle.put(conn)
+                return
+            self._created -= 1
+        conn.close()
+
+    def discard(self, conn: sqlite3.Connection):
+        """關閉連線而不放回連線池（查詢被中止，連線狀態可能未還原）"""
+        conn.close()
+        with self._lock:
+            self._created -= 1
+
+    @contextmanager
+    def connection(self, interruptible: bool = True) -> Iterator[sqlite3.Connection]:
+        """以 with 區塊借用連線，結束後自動歸還
+
+        本執行緒設定了 QueryBudget（見 query_budget()）且 interruptible 為 True 時，
+        查詢超過時限或被取消會拋出 QueryTimeoutError / QueryCancelledError，被中止的連線直接關閉。
+        """
+        budget = getattr(_current_budget, "budget", None) if interruptible else None
+        if budget is not None:
+            budget.check()
+        conn = self.acquire()
+        interrupted = False
+        try:
+            if budget is not None:
+                budget.attach(conn)
+            yield conn
+        except sqlite3.OperationalError:
+            if budget is not None and budget.exhausted():
+                interrupted = True
+                budget.check()
+            raise
+        finally:
+            if budget is not None:
+                budget.detach(conn)
+            if interrupted:
+                self.discard(conn)
+            else:
+                self.release(conn)
+
+    def _close_idle(self):
+        """關閉所有閒置連線（呼叫端須持有 self._lock）"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            self._created -= 1
+
+    def close_all(self):
+        """關閉所有閒置連線"""
+        with self._lock:
+            self._close_idle()
+
+    def retire(self):
+        """停用連線池：閒置連線立即關閉，借出中的連線在查詢完成、歸還時關閉"""
+        with self._lock:
+            self._retired = True
+            self._close_idle()
+
+
+class LRUCache:
+    """有容量上限的 LRU 快取（可選 TTL），可跨執行緒共用"""
+
+    _MISSING = object()
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Any, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        """取得快取值；不存在或已過期時回傳 default"""
+        with self._lock:
+            entry = self._data.get(key, self._MISSING)
+            if entry is not self._MISSING:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key: Any, value: Any):
+        """寫入快取，超過容量時淘汰最久未使用的項目"""
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        """清空快取（命中統計保留）"""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """回傳命中/未命中次數與目前項目數"""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._data)}
+
+
+class SingleFlight:
+    """合併同時進行的相同計算，可跨執行緒共用
+
+    同一個鍵同時只有第一個呼叫者執行 func，其他呼叫者等待並共用同一個結果或例外。
+    執行者的查詢被取消（QueryCancelledError，例如其客戶端斷線）時，等待者不沿用取消，而是重新執行。
+    等待者以自己的 QueryBudget 限制等待時間。
+    """
+
+    def __init__(self):
+        self.shared = 0
+        self._calls: Dict[Any, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Any, func) -> Any:
+        """執行 func() 或等待同一個鍵進行中的計算，回傳其結果"""
+        budget = getattr(_current_budget, "budget", None)
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                if call is None:
+                    call = self._calls[key] = {"done": threading.Event(), "value": None, "error": None}
+                    break
+                self.shared += 1
+
+            while not call["done"].wait(0.05 if budget is not None else None):
+                budget.check()
+            if isinstance(call["error"], QueryCancelledError):
+                continue
+            if call["error"] is not None:
+                raise call["error"]
+            return call["value"]
+
+        try:
+            call["value"] = func()
+            return call["value"]
+        except BaseException as e:
+            call["error"] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call["done"].set()
+
+
 class PPDBDatabase:
     """PPDB 資料庫存取類別"""
 
-    def __init__(self, db_path: str = "database.db"):
+    def __init__(
+        self,
+        db_path: str = "database.db",
+        pool_size: int = 8,
+        cache_size: int = 1024,
+        cache_ttl: Optional[float] = None,
+    ):
         self.db_path = db_path
+        self.pool_size = pool_size
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        # 所有頁面共用同一個連線池
+        self.pool = ConnectionPool(db_path, max_size=pool_size)
+        # 每個資料庫版本只計算一次的結果（翻譯對照表、表格是否存在、總數等）
+        self._version_store: Dict[Any, Any] = {}
+        self._version_store_lock = threading.RLock()
+        # 執行期間資料庫為唯讀，物質詳細資料與搜尋結果可安全快取
+        self.details_cache = LRUCache(cache_size, cache_ttl)
+        self.search_cache = LRUCache(cache_size, cache_ttl)
+        # 快取尚未有結果時，同時進行的相同搜尋與顯示欄位查詢只執行一次
+        self.inflight = SingleFlight()
+        self._version_lock = threading.Lock()
+        # (inode, mtime)：偵測資料庫檔案被修改或被新檔案替換
+        self._db_file_id: Optional[tuple] = None
+        self.build_version: Optional[str] = None
+        self._watcher_stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+
+    def _read_build_version(self) -> Optional[str]:
+        """讀取 convert_to_db.py 寫入 Build_Info 的建置版本"""
+        try:
+            # 建置版本決定 ETag 與快取，不受個別請求的時限影響
+            with self.pool.connection(interruptible=False) as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT value FROM Build_Info WHERE key = 'build_version'")
+                row = cursor.fetchone()
+                return row[0] if row else None
+        except sqlite3.OperationalError:
+            return None
+
+    def _ensure_current(self) -> bool:
+        """資料庫檔案被修改或替換時，切換到新的連線池並清除所有快取
+
+        舊連線池中進行中的查詢會在原本的檔案上完成，歸還時才關閉連線，
+        因此替換資料庫不會中斷使用者的請求。
+
+        Returns:
+            是否偵測到新的資料庫
+        """
+        try:
+            stat = os.stat(self.db_path)
+            file_id = (stat.st_ino, stat.st_mtime_ns)
+        except FileNotFoundError:
+            file_id = None
+        if file_id == self._db_file_id:
+            return False
+
+        with self._version_lock:
+            if file_id == self._db_file_id:
+                return False
+            if self._db_file_id is not None:
+                old_pool = self.pool
+                self.pool = ConnectionPool(self.db_path, max_size=self.pool_size)
+                old_pool.retire()
+                print(f"Database file changed, switched to new connection pool: {self.db_path}")
+            self.invalidate_caches()
+            self.build_version = self._read_build_version()
+            self._db_file_id = file_id
+            return True
+
+    def invalidate_caches(self):
+        """清除所有依資料庫內容建立的快取
+
+        以新的快取物件取代舊的，進行中的查詢即使稍後寫入，也只會寫到已捨棄的舊快取。
+        """
+        self.details_cache = LRUCache(self.cache_size, self.cache_ttl)
+        self.search_cache = LRUCache(self.cache_size, self.cache_ttl)
+        self.inflight = SingleFlight()
+        self._version_store = {}
+
+    def _per_version(self, key: Any, factory):
+        """取得每個資料庫版本只計算一次的結果；資料庫替換後會重新計算"""
+        self._ensure_current()
+        store = self._version_store
+        if key in store:
+            return store[key]
+        with self._version_store_lock:
+            if key in store:
+                return store[key]
+            value = factory()
+            # 寫入取得時的 store；若期間資料庫已被替換，結果只會留在已捨棄的舊 store
+            store[key] = value
+            return value
+
+    def start_watcher(self, interval: float = 5.0):
+        """啟動背景執行緒，定期檢查 database.db 是否被替換，並預先載入新版本的翻譯對照表與輸入提示索引"""
+        if self._watcher and self._watcher.is_alive():
+            return
+
+        def watch():
+            # 啟動時立即檢查一次，content_version() 從一開始就有版本可讀
+            while True:
+                try:
+                    if self._ensure_current():
+                        self._get_translation_map()
+                        self.get_prefix_index()
+                except Exception as e:
+                    print(f"Warning: database watcher error: {e}")
+                if self._watcher_stop.wait(interval):
+                    break
+
+        self._watcher_stop.clear()
+        self._watcher = threading.Thread(target=watch, name="ppdb-db-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self):
+        """停止背景檢查執行緒"""
+        self._watcher_stop.set()
+
+    def content_version(self) -> str:
+        """目前資料庫內容的版本字串（Build_Info 的建置版本；舊資料庫沒有時以檔案 inode 與修改時間代替）
+
+        只讀取最近一次檢查（背景執行緒或任一查詢）記下的版本，不存取檔案或資料庫，可在事件迴圈中呼叫。
+        """
+        if self.build_version:
+            return self.build_version
+        return ":".join(str(part) for part in self._db_file_id or ())
+
+    def current_version(self) -> str:
+        """先確認資料庫檔案是否已被替換，再回傳內容版本（會存取檔案，需在執行緒中呼叫）"""
+        self._ensure_current()
+        return self.content_version()
+
+    def cache_stats(self) -> Dict[str, Dict[str, int]]:
+        """回傳各快取的命中統計"""
+        return {
+            "details": self.details_cache.stats(),
+            "search": self.search_cache.stats(),
+        }
+
+    # 各搜尋類型對應到 Search_Index 的欄位類型
+    SEARCH_FIELDS = {
+        "name": ("name", "chinese"),
+        "cas": ("cas",),
+        "smiles": ("smiles",),
+        "inchi": ("inchi",),
+        "alias": ("alias",),
+    }
+
+    # 支援的搜尋類型
+    SEARCH_TYPES = ("name", "cas", "smiles", "inchi", "alias", "similar_structure", "substructure")
+
+    def has_table(self, table_name: str) -> bool:
+        """檢查資料庫中是否存在指定表格（結果會快取）"""
+        def lookup() -> bool:
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type IN ('table', 'view') AND name = ?",
+                    (table_name,)
+                )
+                return cursor.fetchone() is not None
+
+        return self._per_version(("has_table", table_name), lookup)
 
     def search_substances(
         self, query: str, search_type: str = "name"
     ) -> List[Dict[str, Any]]:
-        """搜尋物質"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+        """搜尋物質
+
+        查詢為完整的識別碼（CAS RN、名稱、中文名稱、別名、InChIKey 等）時直接回傳 Identifier_Index 的完全比對結果；
+        否則資料庫有 Search_Index（由 convert_to_db.py 建立）時使用全文檢索索引並依相關程度排序，
+        沒有 Search_Index 時退回以 LIKE 掃描資料表。search_type 為 "similar_structure" / "substructure" 時以結構指紋比對 SMILES，
+        結果另附 similarity（Tanimoto 係數）；SMILES 無法解析時拋出 SmilesError。
+        文字搜尋的結果會在每個物質之後接著列出同一家族的異構物與鹽基形式（Substance_Families）。
+        同時進行的相同搜尋只查詢一次（SingleFlight）。
+        """
+        self._ensure_current()
+        cache = self.search_cache
+        key = (search_type, query)
+
+        def load() -> List[Dict[str, Any]]:
+            if search_type == "similar_structure":
+                results = self.search_similar_structures(query)
+            elif search_type == "substructure":
+                results = self.search_substructure_candidates(query)
+            else:
+                # 完整的識別碼先以 Identifier_Index 完全比對（一次索引定位），沒有相符時才做子字串搜尋
+                results = self.lookup_identifier(query, self.EXACT_LOOKUP_KINDS.get(search_type))
+                if not results and search_type in self.SEARCH_FIELDS and self.has_table("Search_Index"):
+                    results = self._search_indexed(query, search_type)
+                elif not results:
+                    results = self._search_like(query, search_type)
+                results = self._with_families(results)
+            cache.put(key, results)
+            return results
+
+        results = cache.get(key)
+        if results is None:
+            results = self.inflight.do(("search", key), load)
+        # 回傳複本，避免呼叫端修改快取內容
+        return [dict(row) for row in results]
+
+    def _search_indexed(self, query: str, search_type: str) -> List[Dict[str, Any]]:
+        """透過 FTS5 trigram 索引搜尋
+
+        排序：完全相符 > 開頭相符 > 其他子字串相符，同級再依 bm25 分數與名稱排序。
+        """
+        query = query.strip()
+        fields = self.SEARCH_FIELDS[search_type]
+
+        trigram = len(query) >= 3
+        # trigram 無法處理少於 3 個字元的查詢，改用 LIKE（只掃描索引表）
+        match_param = '"' + query.replace('"', '""') + '"' if trigram else f"%{query}%"
+        sql = queries.search_index(len(fields), trigram)
+
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(sql, (query, f"{query}%", match_param, *fields))
+            return [dict(row) for row in cursor.fetchall()]
+
+    def _search_like(self, query: str, search_type: str) -> List[Dict[str, Any]]:
+        """以 LIKE 搜尋（資料庫沒有 Search_Index 時使用）"""
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
 
-        try:
             if search_type == "name":
                 # 先檢查是否為中文查詢
                 cursor.execute(
@@ -200,114 +681,1345 @@ class PPDBDatabase:
 
             results = [dict(row) for row in cursor.fetchall()]
             return results
-        finally:
-            conn.close()
 
-    def get_substance_details(self, substance_id: int) -> Optional[Dict[str, Any]]:
-        """取得物質詳細資料"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+    def get_field_registry(self) -> FieldRegistry:
+        """顯示欄位登錄表：以 PRAGMA table_info 解析每個顯示欄位的確切欄位名稱，每個資料庫版本只建立一次"""
+        def load() -> FieldRegistry:
+            table_columns = {}
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+                for section in DISPLAY_SECTIONS:
+                    cursor.execute(f'PRAGMA table_info("{section.table}")')
+                    table_columns[section.table] = [row[1] for row in cursor.fetchall()]
+            registry = FieldRegistry(table_columns)
+            if registry.missing:
+                print(f"Warning: display fields not found in database: {', '.join(registry.missing)}")
+            return registry
+
+        return self._per_version("field_registry", load)
+
+    def get_field_values_many(self, substance_ids: List[int]) -> Dict[int, Dict[str, Tuple[Any, Any]]]:
+        """批次取得顯示欄位的值，回傳 {物質 ID: {欄位: (值, 比較運算符)}}
+
+        只選取登錄表中要顯示的欄位（與其比較運算符欄位），每個資料表一次 IN 查詢；找不到的物質不會出現在結果中。
+        同時進行、快取未命中物質相同的查詢只執行一次（SingleFlight）。
+        """
+        self._ensure_current()
+        cache = self.details_cache
+        registry = self.get_field_registry()
+        ids = list(dict.fromkeys(int(i) for i in substance_ids))
+        found: Dict[int, Dict[str, Tuple[Any, Any]]] = {}
+        missing = []
+        for substance_id in ids:
+            values = cache.get(("fields", substance_id))
+            if values is not None:
+                found[substance_id] = values
+            else:
+                missing.append(substance_id)
+        if not missing:
+            return found
+
+        def load() -> Dict[int, Dict[str, Tuple[Any, Any]]]:
+            rows: Dict[str, Dict[int, sqlite3.Row]] = {}
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+                for table, columns in registry.projection().items():
+                    cursor.execute(queries.field_values(table, columns, len(missing)), missing)
+                    rows[table] = {row["ID"]: row for row in cursor.fetchall()}
+
+            loaded = {}
+            for substance_id in missing:
+                if substance_id not in rows.get("Identification", {}):
+                    continue
+                values = {}
+                for display_field in registry.fields:
+                    row = rows.get(display_field.section.table, {}).get(substance_id)
+                    value = row[display_field.column] if row is not None and display_field.column else None
+                    operator = row[display_field.operator_column] if row is not None and display_field.operator_column else None
+                    values[display_field.key] = (value, operator)
+                loaded[substance_id] = values
+                cache.put(("fields", substance_id), values)
+            return loaded
+
+        found.update(self.inflight.do(("fields", tuple(sorted(missing))), load))
+        return found
+
+    def get_display_values_many(self, substance_ids: List[int]) -> Dict[int, Dict[str, str]]:
+        """批次取得顯示字串，回傳 {物質 ID: {欄位: 顯示字串}}（沒有值的欄位為 N/A）
+
+        資料庫有 Display_Values（由 convert_to_db.py 預先格式化）時直接讀取，
+        否則退回以 get_field_values_many 的值即時格式化；找不到的物質不會出現在結果中。
+        同時進行、快取未命中物質相同的查詢只執行一次（SingleFlight）。
+        """
+        self._ensure_current()
+        registry = self.get_field_registry()
+        if not self.has_table("Display_Values"):
+            return {
+                substance_id: {
+                    display_field.key: display_field.format(*values[display_field.key])
+                    for display_field in registry.fields
+                }
+                for substance_id, values in self.get_field_values_many(substance_ids).items()
+            }
 
-        try:
-            cursor.execute("SELECT * FROM Identification WHERE ID = ?", (substance_id,))
-            identification = cursor.fetchone()
+        cache = self.details_cache
+        ids = list(dict.fromkeys(int(i) for i in substance_ids))
+        found: Dict[int, Dict[str, str]] = {}
+        missing = []
+        for substance_id in ids:
+            display = cache.get(("display", substance_id))
+            if display is not None:
+                found[substance_id] = display
+            else:
+                missing.append(substance_id)
+        if not missing:
+            return found
+
+        def load() -> Dict[int, Dict[str, str]]:
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(queries.existing_ids(len(missing)), missing)
+                existing = {row[0] for row in cursor.fetchall()}
+                cursor.execute(queries.display_values(len(missing)), missing)
+                stored: Dict[int, Dict[str, str]] = {}
+                for row in cursor.fetchall():
+                    stored.setdefault(row[0], {})[row[1]] = row[2]
+
+            loaded = {}
+            for substance_id in missing:
+                if substance_id not in existing:
+                    continue
+                values = stored.get(substance_id, {})
+                display = {display_field.key: values.get(display_field.key, "N/A") for display_field in registry.fields}
+                loaded[substance_id] = display
+                cache.put(("display", substance_id), display)
+            return loaded
+
+        found.update(self.inflight.do(("display", tuple(sorted(missing))), load))
+        return found
 
-            if not identification:
-                return None
+    def get_substance_details(self, substance_id: int) -> Optional[Dict[str, Any]]:
+        """取得物質詳細資料（格式見 get_substance_details_many）；找不到時回傳 None"""
+        details = self.get_substance_details_many([substance_id])
+        return details[0] if details else None
+
+    def get_substance_details_many(self, substance_ids: List[int]) -> List[Dict[str, Any]]:
+        """批次取得多個物質的詳細資料，依傳入順序回傳（找不到的物質會略過）
+
+        每筆為 {"id", "display": {欄位: 顯示字串}, "aliases": [別名]}。顯示字串以一次 IN 查詢讀取預先格式化的
+        Display_Values（主鍵 (ID, field) 上的範圍讀取），別名也只查詢一次，不再逐一查詢各工作表。
+        結果會快取，呼叫端不應修改回傳的字典；同時進行、快取未命中物質相同的查詢只執行一次（SingleFlight）。
+        """
+        self._ensure_current()
+        cache = self.details_cache
+        ids = list(dict.fromkeys(int(i) for i in substance_ids))
+        found: Dict[int, Dict[str, Any]] = {}
+        missing = []
+        for substance_id in ids:
+            details = cache.get(("details", substance_id))
+            if details is not None:
+                found[substance_id] = details
+            else:
+                missing.append(substance_id)
+
+        def load() -> Dict[int, Dict[str, Any]]:
+            display_by_id = self.get_display_values_many(missing)
+            aliases = self.get_aliases_many(list(display_by_id))
+            loaded = {}
+            for substance_id, display in display_by_id.items():
+                details = {"id": substance_id, "display": display, "aliases": aliases.get(substance_id, [])}
+                loaded[substance_id] = details
+                cache.put(("details", substance_id), details)
+            return loaded
+
+        if missing:
+            found.update(self.inflight.do(("details", tuple(sorted(missing))), load))
+        return [found[i] for i in ids if i in found]
+
+    def get_families_many(self, substance_ids: List[int]) -> Dict[int, List[Dict[str, Any]]]:
+        """批次取得物質所屬家族（光學異構物與鹽基形式）的所有成員，回傳 {物質 ID: [成員（含自己）]}
+
+        以 Substance_Families 的 (family_id, ID) 索引一次 self-join 取得；母體排在最前面，成員附 relation。
+        不屬於任何家族的物質不會出現在結果中。
+        """
+        ids = list(dict.fromkeys(int(i) for i in substance_ids))
+        if not ids or not self.has_table("Substance_Families"):
+            return {}
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(queries.families(len(ids)), ids)
+            families: Dict[int, List[Dict[str, Any]]] = {}
+            for row in cursor.fetchall():
+                member = dict(row)
+                families.setdefault(member.pop("member_of"), []).append(member)
+        return families
+
+    def get_family(self, substance_id: int) -> List[Dict[str, Any]]:
+        """取得物質所屬家族的所有成員（含自己）；不屬於任何家族時回傳空列表"""
+        return self.get_families_many([substance_id]).get(int(substance_id), [])
+
+    def _with_families(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """在每個搜尋結果之後插入同一家族、尚未出現在結果中的成員"""
+        families = self.get_families_many([row["id"] for row in results])
+        if not families:
+            return results
+        expanded = []
+        seen = set()
+        for row in results:
+            for member in [row, *families.get(row["id"], [])]:
+                if member["id"] not in seen:
+                    seen.add(member["id"])
+                    expanded.append({key: member[key] for key in row})
+        return expanded
+
+    def get_aliases(self, substance_id: int) -> List[str]:
+        """取得物質的別名"""
+        return self.get_aliases_many([substance_id]).get(int(substance_id), [])
+
+    def get_aliases_many(self, substance_ids: List[int]) -> Dict[int, List[str]]:
+        """批次取得別名，回傳 {物質 ID: [別名]}（沒有別名的物質不會出現在結果中）"""
+        ids = list(dict.fromkeys(int(i) for i in substance_ids))
+        if not ids or not self.has_table("Aliases"):
+            return {}
+        aliases: Dict[int, List[str]] = {}
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(queries.aliases(len(ids)), ids)
+            for substance_id, alias in cursor.fetchall():
+                if alias:
+                    aliases.setdefault(substance_id, []).append(alias)
+        return aliases
+
+    def get_all_substances(
+        self,
+        limit: int = 50,
+        offset: int = 0,
+        start_key: Optional[Tuple[str, int]] = None,
+    ) -> List[Dict[str, Any]]:
+        """取得所有物質列表（依名稱不分大小寫排序，同名再依 ID）
+
+        傳入 start_key=(名稱, ID) 時使用 keyset 分頁：從該鍵（含）開始取 limit 筆，
+        直接在 idx_identification_active 索引上定位，不論第幾頁成本都相同；
+        否則使用 OFFSET。
+        """
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+
+            if start_key is not None:
+                name, substance_id = start_key
+                cursor.execute(queries.KEYSET_PAGE, (name, name, substance_id, limit))
+            else:
+                cursor.execute(
+                    """
+                    SELECT
+                        ID as id,
+                        Active as name,
+                        CAS_RN as cas_rn,
+                        Availability_status as status
+                    FROM Identification
+                    WHERE Active IS NOT NULL AND Active != ''
+                    ORDER BY Active COLLATE NOCASE, ID
+                    LIMIT ? OFFSET ?
+                """,
+                    (limit, offset),
+                )
 
-            cursor.execute("SELECT * FROM Fate WHERE ID = ?", (substance_id,))
-            fate = cursor.fetchone()
+            results = [dict(row) for row in cursor.fetchall()]
+            return results
 
-            cursor.execute("SELECT * FROM Aquatic_Ecotox WHERE ID = ?", (substance_id,))
-            aquatic = cursor.fetchone()
+    def get_page_anchors(self, page_size: int = 50) -> List[Tuple[str, int]]:
+        """每一頁第一筆的排序鍵 (名稱, ID)，每個資料庫版本只以一次索引掃描計算"""
+        def load() -> List[Tuple[str, int]]:
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(queries.PAGE_ANCHORS)
+                keys = cursor.fetchall()
+            return [(row[0], row[1]) for row in keys[::page_size]]
+
+        return self._per_version(("page_anchors", page_size), load)
+
+    def get_substances_page(self, page: int, page_size: int = 50) -> List[Dict[str, Any]]:
+        """以 keyset 分頁取得第 page 頁（從 1 開始）"""
+        anchors = self.get_page_anchors(page_size)
+        if not 1 <= page <= len(anchors):
+            return []
+        return self.get_all_substances(limit=page_size, start_key=anchors[page - 1])
+
+    def find_page_for_prefix(self, prefix: str, page_size: int = 50) -> int:
+        """回傳第一個名稱不小於 prefix（不分大小寫）的物質所在頁碼，用於依字母或名稱開頭跳頁"""
+        # 先取得頁首鍵：get_page_anchors 需要自己的連線與版本鎖，不可在持有連線時呼叫
+        page_count = max(1, len(self.get_page_anchors(page_size)))
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(queries.PREFIX_LOOKUP, (prefix.strip(),))
+            key = cursor.fetchone()
+            if key is None:
+                return page_count
+
+            # 計算排在該物質之前的筆數（只掃描覆蓋索引）
+            cursor.execute(queries.PREFIX_COUNT, (key[0], key[0], key[1]))
+            position = cursor.fetchone()[0]
+        return position // page_size + 1
 
-            cursor.execute("SELECT * FROM Terrestrial_Ecotox WHERE ID = ?", (substance_id,))
-            terrestrial = cursor.fetchone()
+    def get_total_count(self) -> int:
+        """取得總物質數量（每個資料庫版本只計算一次）"""
+        def count() -> int:
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
 
-            cursor.execute("SELECT * FROM Human WHERE ID = ?", (substance_id,))
-            human = cursor.fetchone()
+                cursor.execute(
+                    """
+                    SELECT COUNT(*) as count
+                    FROM Identification
+                    WHERE Active IS NOT NULL AND Active != ''
+                """
+                )
+                result = cursor.fetchone()
+                return result[0] if result else 0
+
+        return self._per_version("total_count", count)
+
+    # 屬性篩選的比較運算符 -> 條件（見 queries.PROPERTY_FILTER_CONDITIONS）
+    PROPERTY_FILTER_CONDITIONS = queries.PROPERTY_FILTER_CONDITIONS
+
+    def get_numeric_properties(self) -> Dict[str, str]:
+        """可篩選、排序的數值屬性 {屬性欄位: 單位}（來自建置時產生的 Property_Values，每個資料庫版本只查詢一次）"""
+        def load() -> Dict[str, str]:
+            if not self.has_table("Property_Values"):
+                return {}
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT property, MAX(unit) FROM Property_Values GROUP BY property ORDER BY property")
+                return {row[0]: row[1] for row in cursor.fetchall()}
+
+        return self._per_version("numeric_properties", load)
+
+    def filter_by_properties(
+        self,
+        filters: List[Tuple[str, str, float]],
+        sort_by: Optional[str] = None,
+        descending: bool = False,
+        limit: int = 100,
+    ) -> List[Dict[str, Any]]:
+        """依數值屬性範圍篩選並排序物質
+
+        filters 為 (屬性欄位, 運算符, 數值) 的列表，多個條件以 AND 結合，
+        例如 [("Soil_DT50__Typical_days", ">", 100), ("Koc_mlg", "<", 50)]。
+        sort_by 指定排序用的屬性，沒有該屬性值的物質排在最後；結果另附 sort_operator / sort_value / sort_unit。
+        """
+        self._ensure_current()
+        properties = self.get_numeric_properties()
+        for prop, operator, _ in filters:
+            if prop not in properties:
+                raise ValueError(f"Unknown numeric property: {prop}")
+            if operator not in self.PROPERTY_FILTER_CONDITIONS:
+                raise ValueError(f"Unsupported operator: {operator}")
+        if sort_by is not None and sort_by not in properties:
+            raise ValueError(f"Unknown numeric property: {sort_by}")
+        if not filters and sort_by is None:
+            return []
+
+        normalized = tuple((prop, operator, float(value)) for prop, operator, value in filters)
+        cache_key = ("properties", normalized, sort_by, descending, limit)
+        cache = self.search_cache
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return [dict(row) for row in cached]
+
+        # 每個條件各走一次 (property, value) 索引範圍掃描，再取交集
+        operators = [operator for _, operator, _ in normalized]
+        filter_params: List[Any] = []
+        for prop, _, value in normalized:
+            filter_params.extend([prop, value, value])
+
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            if sort_by is None:
+                cursor.execute(queries.property_filter(operators), [*filter_params, limit])
+                results = [dict(row) for row in cursor.fetchall()]
+            else:
+                # 依 (property, value, ID) 索引順序取有值的物質；不足 limit 筆時再依名稱補上沒有該屬性值的物質
+                cursor.execute(queries.property_sort(operators, descending), [sort_by, *filter_params, limit])
+                results = [dict(row) for row in cursor.fetchall()]
+                if len(results) < limit:
+                    cursor.execute(
+                        queries.property_sort_missing(operators),
+                        [*filter_params, sort_by, limit - len(results)],
+                    )
+                    results.extend(dict(row) for row in cursor.fetchall())
+
+        cache.put(cache_key, results)
+        return [dict(row) for row in results]
+
+    # 相似物質比對使用的物化性質與生態毒理終點（LogP 本身已是對數，其餘取 log10 後再標準化）
+    SIMILARITY_PROPERTIES = (
+        "LogP",
+        "Solubility__In_water_at_20_degC_mgl",
+        "Vapour_pressure_at_20_degC_mPa",
+        "Henrys_law_constant_at_25_degC_Pam3mol",
+        "Koc_mlg",
+        "Kfoc_mlg",
+        "Soil_DT50__Typical_days",
+        "Soil_DT50__Lab_days",
+        "Soil_DT50__Field_days",
+        "Watersediment_DT50_days",
+        "Bioconcentration_factor",
+        "Mammals__Acute_oral_LD50_mgkg_BWday",
+        "Birds__Acute_LD50_mgkg",
+        "Earthworms__Acute_14d_LC50_mgkg",
+        "Honeybees__Contact_acute_48hr_LD50_ug_per_bee",
+        "Fish__Acute_96hr_LC50_mgl__TEMPERATE",
+        "Algae__Acute_72hr_EC50_growth_mgl",
+    )
+    LINEAR_SIMILARITY_PROPERTIES = {"LogP"}
+
+    def get_property_matrix(self) -> Optional[Dict[str, Any]]:
+        """相似度比對用的標準化性質矩陣，每個資料庫版本只建立一次
+
+        回傳 {"ids", "row_of", "properties", "values", "mask"}：values 為 n×p 的 z-score（缺值處為 0），
+        mask 為同形狀的 0/1 矩陣，標記哪些值存在。沒有 Property_Values 表時回傳 None。
+        """
+        def load() -> Optional[Dict[str, Any]]:
+            available = self.get_numeric_properties()
+            properties = [prop for prop in self.SIMILARITY_PROPERTIES if prop in available]
+            if not properties:
+                return None
 
-            cursor.execute("SELECT * FROM Aliases WHERE ID = ?", (substance_id,))
-            aliases = cursor.fetchall()
+            placeholders = ",".join("?" * len(properties))
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    f"SELECT ID, property, value FROM Property_Values WHERE property IN ({placeholders})",
+                    properties,
+                )
+                records = cursor.fetchall()
+
+            ids = np.array(sorted({row[0] for row in records}), dtype=np.int64)
+            row_of = {int(substance_id): row for row, substance_id in enumerate(ids)}
+            column_of = {prop: column for column, prop in enumerate(properties)}
+            raw = np.full((len(ids), len(properties)), np.nan)
+            for substance_id, prop, value in records:
+                raw[row_of[substance_id], column_of[prop]] = value
+
+            # 跨越多個數量級的性質取 log10；非正值無法取對數，視為缺值
+            for prop, column in column_of.items():
+                if prop not in self.LINEAR_SIMILARITY_PROPERTIES:
+                    values = raw[:, column]
+                    with np.errstate(divide="ignore", invalid="ignore"):
+                        raw[:, column] = np.where(values > 0, np.log10(values), np.nan)
+
+            present = ~np.isnan(raw)
+            counts = present.sum(axis=0)
+            means = np.divide(np.nansum(raw, axis=0), counts, out=np.zeros(len(properties)), where=counts > 0)
+            centered = np.where(present, raw - means, 0.0)
+            stds = np.sqrt(np.divide((centered ** 2).sum(axis=0), counts, out=np.zeros(len(properties)), where=counts > 0))
+            stds[stds == 0] = 1.0
 
             return {
-                "identification": dict(identification) if identification else {},
-                "fate": dict(fate) if fate else {},
-                "aquatic_ecotox": dict(aquatic) if aquatic else {},
-                "terrestrial_ecotox": dict(terrestrial) if terrestrial else {},
-                "human": dict(human) if human else {},
-                "aliases": [dict(a) for a in aliases],
+                "ids": ids,
+                "row_of": row_of,
+                "properties": properties,
+                "values": centered / stds,
+                "mask": present.astype(np.float64),
             }
-        finally:
-            conn.close()
 
-    def get_all_substances(self, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
-        """取得所有物質列表"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+        return self._per_version("property_matrix", load)
 
-        try:
+    def find_similar_many(
+        self, substance_ids: List[int], k: int = 10, min_shared: int = 3
+    ) -> Dict[int, List[Dict[str, Any]]]:
+        """批次找出每個物質性質輪廓最接近的 k 個物質
+
+        距離為兩物質共同擁有的性質上 z-score 差的均方根；共同性質少於 min_shared 的物質不列入。
+        所有查詢以一次矩陣運算完成，結果附 distance 與 shared（共同性質數）。
+        """
+        self._ensure_current()
+        matrix = self.get_property_matrix()
+        results: Dict[int, List[Dict[str, Any]]] = {substance_id: [] for substance_id in substance_ids}
+        if matrix is None:
+            return results
+
+        query_ids = [substance_id for substance_id in results if substance_id in matrix["row_of"]]
+        if not query_ids:
+            return results
+
+        values, mask = matrix["values"], matrix["mask"]
+        query_rows = np.array([matrix["row_of"][substance_id] for substance_id in query_ids])
+        query_values, query_mask = values[query_rows], mask[query_rows]
+
+        # 只在雙方都有值的性質上計算平方差總和：Σ m·mq·(x − q)² 展開為三個矩陣乘法
+        shared = mask @ query_mask.T
+        squared = (
+            (mask * values ** 2) @ query_mask.T
+            - 2 * values @ (query_mask * query_values).T
+            + mask @ (query_mask * query_values ** 2).T
+        )
+        with np.errstate(divide="ignore", invalid="ignore"):
+            distances = np.sqrt(np.maximum(squared, 0) / shared)
+        distances[shared < min_shared] = np.inf
+        distances[query_rows, np.arange(len(query_ids))] = np.inf
+
+        neighbours: Dict[int, List[Tuple[int, float, int]]] = {}
+        for column, substance_id in enumerate(query_ids):
+            column_distances = distances[:, column]
+            candidates = np.argpartition(column_distances, min(k, len(column_distances) - 1))[:k]
+            candidates = candidates[np.argsort(column_distances[candidates])]
+            neighbours[substance_id] = [
+                (int(matrix["ids"][row]), float(column_distances[row]), int(shared[row, column]))
+                for row in candidates
+                if np.isfinite(column_distances[row])
+            ]
+
+        neighbour_ids = sorted({neighbour_id for found in neighbours.values() for neighbour_id, _, _ in found})
+        identification: Dict[int, Dict[str, Any]] = {}
+        if neighbour_ids:
+            placeholders = ",".join("?" * len(neighbour_ids))
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    f"""
+                    SELECT ID as id, Active as name, CAS_RN as cas_rn, Availability_status as status
+                    FROM Identification
+                    WHERE ID IN ({placeholders})
+                """,
+                    neighbour_ids,
+                )
+                identification = {row["id"]: dict(row) for row in cursor.fetchall()}
+
+        for substance_id, found in neighbours.items():
+            results[substance_id] = [
+                {**identification[neighbour_id], "distance": distance, "shared": shared_count}
+                for neighbour_id, distance, shared_count in found
+                if neighbour_id in identification
+            ]
+        return results
+
+    def find_similar(self, substance_id: int, k: int = 10) -> List[Dict[str, Any]]:
+        """找出性質輪廓最接近的 k 個物質"""
+        return self.find_similar_many([substance_id], k=k)[substance_id]
+
+    def get_fingerprint_matrix(self) -> Optional[Dict[str, Any]]:
+        """載入 Structure_Fingerprints 為 NumPy 位元矩陣（n × 每列 uint64 字組），每個資料庫版本只載入一次"""
+        def load() -> Optional[Dict[str, Any]]:
+            if not self.has_table("Structure_Fingerprints"):
+                return None
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT ID, fingerprint FROM Structure_Fingerprints ORDER BY ID")
+                records = cursor.fetchall()
+
+            ids = np.array([row[0] for row in records], dtype=np.int64)
+            words = np.frombuffer(b"".join(row[1] for row in records), dtype=np.uint8)
+            words = words.reshape(len(records), FINGERPRINT_BYTES).view(np.uint64)
+            return {"ids": ids, "words": words, "bit_counts": np.bitwise_count(words).sum(axis=1)}
+
+        return self._per_version("fingerprint_matrix", load)
+
+    def _rank_by_fingerprint(self, smiles: str, substructure: bool, min_similarity: float, limit: int) -> List[Dict[str, Any]]:
+        """以查詢 SMILES 的指紋對全資料庫做一次向量化 popcount，回傳依 Tanimoto 係數排序的物質"""
+        matrix = self.get_fingerprint_matrix()
+        query = np.frombuffer(fingerprint(smiles), dtype=np.uint8).view(np.uint64)
+        if matrix is None or not len(matrix["ids"]):
+            return []
+
+        words = matrix["words"]
+        common = np.bitwise_count(words & query).sum(axis=1)
+        query_count = int(np.bitwise_count(query).sum())
+        union = matrix["bit_counts"] + query_count - common
+        similarity = np.divide(common, union, out=np.zeros(len(union)), where=union > 0)
+
+        if substructure:
+            # 母結構的指紋必須涵蓋查詢指紋的所有位元
+            candidates = np.flatnonzero(common == query_count)
+        else:
+            candidates = np.flatnonzero(similarity >= min_similarity)
+        candidates = candidates[np.argsort(-similarity[candidates], kind="stable")][:limit]
+        if not len(candidates):
+            return []
+
+        scores = {int(matrix["ids"][row]): float(similarity[row]) for row in candidates}
+        placeholders = ",".join("?" * len(scores))
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
             cursor.execute(
-                """
+                f"""
                 SELECT
                     ID as id,
                     Active as name,
                     CAS_RN as cas_rn,
-                    Availability_status as status
+                    Availability_status as status,
+                    Canonical_SMILES as smiles
                 FROM Identification
-                WHERE Active IS NOT NULL AND Active != ''
-                ORDER BY Active
-                LIMIT ? OFFSET ?
+                WHERE ID IN ({placeholders})
             """,
-                (limit, offset),
+                list(scores),
             )
+            rows = {row["id"]: dict(row) for row in cursor.fetchall()}
+
+        return [{**rows[substance_id], "similarity": score} for substance_id, score in scores.items() if substance_id in rows]
+
+    def search_similar_structures(self, smiles: str, min_similarity: float = 0.3, limit: int = 100) -> List[Dict[str, Any]]:
+        """依結構指紋的 Tanimoto 係數找出結構相似的物質"""
+        return self._rank_by_fingerprint(smiles, substructure=False, min_similarity=min_similarity, limit=limit)
+
+    def search_substructure_candidates(self, smiles: str, limit: int = 100) -> List[Dict[str, Any]]:
+        """子結構預篩：回傳指紋涵蓋查詢結構所有位元的物質（可能包含少數不真正含有該子結構的候選）
+
+        芳香與 Kekulé 寫法的常見五、六員芳香環會先統一再比對；其他芳香系統若查詢與資料庫寫法不同，
+        可能漏掉真正含有該子結構的物質（見 smiles_fingerprint）。
+        """
+        return self._rank_by_fingerprint(smiles, substructure=True, min_similarity=0.0, limit=limit)
+
+    def _get_translation_map(self) -> Dict[str, str]:
+        """載入 Translation 表為記憶體字典（英文大寫名稱 -> 中文名稱），每個資料庫版本只載入一次"""
+        def load() -> Dict[str, str]:
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT english_name, chinese_name FROM Translation ORDER BY id")
+                translation_map = {}
+                for english_name, chinese_name in cursor.fetchall():
+                    # 同一英文名稱有多筆翻譯時，保留第一筆
+                    translation_map.setdefault(str(english_name).upper(), chinese_name)
+                return translation_map
+
+        return self._per_version("translation_map", load)
+
+    # 輸入提示索引的來源：(類型, 表格, SQL)，SQL 回傳 (物質 ID, 提示文字)
+    PREFIX_SOURCES = (
+        ("name", "Identification", "SELECT ID, Active FROM Identification"),
+        ("cas", "Identification", "SELECT ID, CAS_RN FROM Identification"),
+        (
+            "chinese",
+            "Translation",
+            """
+            SELECT i.ID, t.chinese_name
+            FROM Translation t
+            JOIN Identification i ON i.Active = t.english_name COLLATE NOCASE
+            """,
+        ),
+        ("alias", "Aliases", "SELECT ID, Alias FROM Aliases"),
+        ("alias", "Aliases", "SELECT ID, Abbreviation FROM Aliases"),
+    )
 
-            results = [dict(row) for row in cursor.fetchall()]
-            return results
-        finally:
-            conn.close()
+    def get_prefix_index(self) -> Tuple[List[str], List[Tuple[str, int, str, str]]]:
+        """輸入提示用的排序前綴索引，每個資料庫版本只建立一次
 
-    def get_total_count(self) -> int:
-        """取得總物質數量"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        Returns:
+            (排序後的小寫鍵, 對應的 (提示文字, 物質 ID, 物質名稱, 類型))，兩個列表一一對應，供 bisect 查詢
+        """
+        # 先檢查表格：has_table 需要自己的連線，不在持有連線或建立索引的鎖時呼叫
+        sources = [
+            (kind, sql) for kind, table_name, sql in self.PREFIX_SOURCES
+            if self.has_table(table_name)
+        ]
 
-        try:
-            cursor.execute(
-                """
-                SELECT COUNT(*) as count
-                FROM Identification
-                WHERE Active IS NOT NULL AND Active != ''
-            """
+        def load() -> Tuple[List[str], List[Tuple[str, int, str, str]]]:
+            names: Dict[int, str] = {}
+            entries = set()
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT ID, Active FROM Identification WHERE Active IS NOT NULL")
+                names = {row[0]: str(row[1]) for row in cursor.fetchall()}
+                for kind, sql in sources:
+                    for substance_id, text in cursor.execute(sql).fetchall():
+                        text = str(text or "").strip()
+                        if substance_id in names and text and text != "nan":
+                            entries.add((text.casefold(), text, substance_id, kind))
+            ordered = sorted(entries)
+            return (
+                [key for key, _, _, _ in ordered],
+                [(text, substance_id, names[substance_id], kind) for _, text, substance_id, kind in ordered],
             )
-            result = cursor.fetchone()
-            return result[0] if result else 0
-        finally:
-            conn.close()
+
+        return self._per_version("prefix_index", load)
+
+    def suggest(self, prefix: str, limit: int = 10, max_scan: int = 500) -> List[Dict[str, Any]]:
+        """依前綴（不分大小寫）回傳輸入提示，每個物質只出現一次
+
+        以 bisect 在記憶體中的排序索引定位，不查詢 SQLite；最多檢查 max_scan 筆相符的索引項目。
+        """
+        prefix = prefix.strip().casefold()
+        if not prefix:
+            return []
+        keys, entries = self.get_prefix_index()
+        suggestions = []
+        seen = set()
+        start = bisect.bisect_left(keys, prefix)
+        for i in range(start, min(start + max_scan, len(keys))):
+            if not keys[i].startswith(prefix):
+                break
+            text, substance_id, name, kind = entries[i]
+            if substance_id in seen:
+                continue
+            seen.add(substance_id)
+            suggestions.append({"label": text, "id": substance_id, "name": name, "kind": kind})
+            if len(suggestions) >= limit:
+                break
+        return suggestions
 
     def get_chinese_name(self, english_name: str) -> Optional[str]:
         """根據英文名稱取得中文名稱"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        if not english_name:
+            return None
+        return self._get_translation_map().get(str(english_name).upper())
+
+    def get_chinese_names(self, english_names: List[str]) -> Dict[str, str]:
+        """批次取得中文名稱，回傳 {英文名稱: 中文名稱}（找不到的名稱不會出現在結果中）"""
+        translation_map = self._get_translation_map()
+        result = {}
+        for english_name in english_names:
+            if english_name and english_name not in result:
+                chinese_name = translation_map.get(str(english_name).upper())
+                if chinese_name:
+                    result[english_name] = chinese_name
+        return result
+
+    # Identifier_Index 的識別碼類型（順序即比對優先順序）
+    IDENTIFIER_KINDS = ("cas", "inchikey", "inchi", "name", "chinese", "alias", "abbreviation")
+
+    # 各搜尋類型先嘗試完全比對的識別碼類型
+    EXACT_LOOKUP_KINDS = {
+        "name": ("name", "chinese"),
+        "cas": ("cas",),
+        "inchi": ("inchikey", "inchi"),
+        "alias": ("alias", "abbreviation"),
+    }
 
-        try:
-            cursor.execute(
-                "SELECT chinese_name FROM Translation WHERE UPPER(english_name) = UPPER(?)",
-                (english_name,)
+    # 沒有 Identifier_Index 時的批次查詢：識別碼類型與 SQL（temp.bulk_identifiers 為輸入，以既有索引逐筆定位）
+    BULK_MATCHES = (
+        ("cas", "JOIN Identification i ON i.CAS_RN = b.key"),
+        ("inchikey", "JOIN Identification i ON i.International_Chemical_Identifier_key_InChIKey = UPPER(b.key)"),
+        ("name", "JOIN Identification i ON i.Active = b.key COLLATE NOCASE"),
+        (
+            "chinese",
+            "JOIN Translation t ON t.chinese_name = b.key JOIN Identification i ON i.Active = t.english_name COLLATE NOCASE",
+        ),
+    )
+
+    def lookup_identifier(self, query: str, kinds: Optional[Tuple[str, ...]] = None) -> List[Dict[str, Any]]:
+        """以 Identifier_Index 完全比對識別碼（大小寫、空白與連字號不影響），kinds 限定識別碼類型
+
+        資料庫沒有 Identifier_Index（舊版建置）或沒有相符的識別碼時回傳空列表。
+        """
+        key = normalize_identifier(query)
+        if not key or not kinds or not self.has_table("Identifier_Index"):
+            return []
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(queries.identifier_lookup(len(kinds)), (key, *kinds))
+            return [dict(row) for row in cursor.fetchall()]
+
+    def resolve_identifiers(self, identifiers: List[str]) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """批次解析識別碼（CAS RN、英文名稱、中文名稱、InChIKey；有 Identifier_Index 時另含 InChI、別名與縮寫）
+
+        輸入先正規化並去除重複，寫入連線上的暫存表，再以一次查詢與 Identifier_Index 的主鍵 join
+        （舊版資料庫則以 UNION ALL 查詢 Identification / Translation 的索引），不必逐筆執行 LIKE 搜尋。
+        每個輸入只保留優先順序最高的比對類型（同類型比對到多個物質時全部保留）。
+
+        Returns:
+            (比對結果 [{"input", "matched_by", "id"}]，依輸入順序；找不到的輸入)
+        """
+        self._ensure_current()
+        indexed = self.has_table("Identifier_Index")
+        keys: Dict[str, str] = {}
+        for identifier in identifiers:
+            key = normalize_identifier(identifier) if indexed else " ".join(str(identifier or "").split())
+            if key and key not in keys:
+                keys[key] = str(identifier).strip()
+        if not keys:
+            return [], []
+
+        if indexed:
+            kinds = list(self.IDENTIFIER_KINDS)
+            sql = """
+                SELECT b.position, x.ID, x.kind
+                FROM temp.bulk_identifiers b
+                JOIN Identifier_Index x ON x.key = b.key
+            """
+        else:
+            matches = [
+                (matched_by, join) for matched_by, join in self.BULK_MATCHES
+                if matched_by != "chinese" or self.has_table("Translation")
+            ]
+            kinds = [matched_by for matched_by, _ in matches]
+            sql = " UNION ALL ".join(
+                f"SELECT b.position, i.ID, '{matched_by}' FROM temp.bulk_identifiers b {join}"
+                for matched_by, join in matches
             )
-            result = cursor.fetchone()
-            return result[0] if result else None
+
+        with self.pool.connection() as conn:
+            # 連線以 mode=ro 開啟，主資料庫仍不可寫入；暫存表只存在於本連線的記憶體中
+            conn.execute("PRAGMA query_only = OFF")
+            try:
+                conn.execute("CREATE TEMP TABLE bulk_identifiers (position INTEGER PRIMARY KEY, key TEXT NOT NULL)")
+                conn.executemany("INSERT INTO temp.bulk_identifiers VALUES (?, ?)", enumerate(keys))
+                rows = conn.execute(sql).fetchall()
+            finally:
+                conn.execute("DROP TABLE IF EXISTS temp.bulk_identifiers")
+                conn.execute("PRAGMA query_only = ON")
+
+        priority = {kind: i for i, kind in enumerate(kinds)}
+        rows = sorted((position, priority[kind], substance_id) for position, substance_id, kind in rows)
+        inputs = list(keys.values())
+        best: Dict[int, int] = {}
+        results: List[Dict[str, Any]] = []
+        seen = set()
+        for position, rank, substance_id in rows:
+            if best.setdefault(position, rank) != rank or (position, substance_id) in seen:
+                continue
+            seen.add((position, substance_id))
+            results.append({"input": inputs[position], "matched_by": kinds[rank], "id": substance_id})
+        unmatched = [identifier for position, identifier in enumerate(inputs) if position not in best]
+        return results, unmatched
+
+
+class AsyncPPDBDatabase:
+    """PPDBDatabase 的非同步介面
+
+    查詢在有上限的執行緒池中執行（大小與連線池相同），頁面處理函式以 await 等待結果，
+    單一耗時查詢不會卡住事件迴圈與其他使用者；超過時限則拋出 QueryTimeoutError。
+    每次呼叫都有自己的 QueryBudget：逾時、呼叫端的協程被取消或 NiceGUI 客戶端斷線時，
+    執行緒中的 SQLite 查詢也會被中止，不再占用 CPU。
+
+    准入控制：同時交給執行緒池的查詢不超過 max_workers 個，其餘在事件迴圈中排隊；
+    排隊數已達 max_queued 時直接拋出 DatabaseBusyError，突發流量只會讓部分請求快速失敗，
+    而不會在執行緒池中無限堆積。
+    """
+
+    def __init__(self, database: PPDBDatabase, max_workers: int = 8, timeout: float = 30.0, max_queued: int = 64):
+        self.db = database
+        self.timeout = timeout
+        self.max_queued = max_queued
+        self.queued = 0
+        self.rejected = 0
+        self._slots = asyncio.Semaphore(max_workers)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ppdb-query")
+        # 每個 NiceGUI 客戶端進行中的查詢（鍵為 client.id），客戶端斷線時一併取消
+        self._client_budgets: Dict[str, Set[QueryBudget]] = {}
+
+    def _budgets_for_current_client(self) -> Optional[Set[QueryBudget]]:
+        """目前 NiceGUI 客戶端進行中的查詢；不在頁面或事件處理中（例如 JSON API）時回傳 None"""
+        if not app.is_started:
+            return None
+        try:
+            client = ui.context.client
+        except RuntimeError:
+            return None
+        budgets = self._client_budgets.get(client.id)
+        if budgets is None:
+            budgets = self._client_budgets[client.id] = set()
+
+            def cancel_all():
+                for budget in list(budgets):
+                    budget.cancel()
+
+            client.on_disconnect(cancel_all)
+            client.on_delete(lambda: self._client_budgets.pop(client.id, None))
+        return budgets
+
+    @staticmethod
+    def _run_with_budget(budget: QueryBudget, func, *args, **kwargs) -> Any:
+        # 排隊等待執行緒期間已逾時或被取消時不再執行
+        budget.check()
+        with query_budget(budget):
+            return func(*args, **kwargs)
+
+    async def _admit(self, budget: QueryBudget):
+        """等待執行緒池的空位（最多等到 budget 的期限）；排隊已滿時拋出 DatabaseBusyError"""
+        if self._slots.locked() and self.queued >= self.max_queued:
+            self.rejected += 1
+            raise DatabaseBusyError("Too many pending database queries")
+        self.queued += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), budget.remaining())
         finally:
-            conn.close()
+            self.queued -= 1
+
+    async def run(self, func, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """在查詢執行緒池中執行 func(*args, **kwargs)"""
+        budget = QueryBudget(timeout if timeout is not None else self.timeout)
+        budgets = self._budgets_for_current_client()
+        if budgets is not None:
+            budgets.add(budget)
+        loop = asyncio.get_running_loop()
+        try:
+            await self._admit(budget)
+            job = self._executor.submit(self._run_with_budget, budget, func, *args, **kwargs)
+            # 執行緒真正結束（或尚未開始即取消）時才釋放名額，被中止中的查詢仍計入
+            job.add_done_callback(lambda _: loop.call_soon_threadsafe(self._slots.release))
+            return await asyncio.wait_for(asyncio.wrap_future(job), budget.remaining())
+        except QueryTimeoutError:
+            budget.cancel()
+            raise
+        except asyncio.TimeoutError as e:
+            budget.cancel()
+            raise QueryTimeoutError("Database query timed out") from e
+        except asyncio.CancelledError:
+            budget.cancel()
+            raise
+        except QueryCancelledError as e:
+            # 客戶端已斷線：視同呼叫端的協程被取消，不再更新頁面
+            raise asyncio.CancelledError() from e
+        finally:
+            if budgets is not None:
+                budgets.discard(budget)
+
+    async def current_version(self) -> str:
+        return await self.run(self.db.current_version)
+
+    async def search_substances(self, query: str, search_type: str = "name") -> List[Dict[str, Any]]:
+        return await self.run(self.db.search_substances, query, search_type)
+
+    async def filter_by_properties(self, filters: List[Tuple[str, str, float]], **kwargs) -> List[Dict[str, Any]]:
+        return await self.run(self.db.filter_by_properties, filters, **kwargs)
+
+    async def get_numeric_properties(self) -> Dict[str, str]:
+        return await self.run(self.db.get_numeric_properties)
+
+    async def get_field_registry(self) -> FieldRegistry:
+        return await self.run(self.db.get_field_registry)
+
+    async def get_field_values_many(self, substance_ids: List[int]) -> Dict[int, Dict[str, Tuple[Any, Any]]]:
+        return await self.run(self.db.get_field_values_many, substance_ids)
+
+    async def get_display_values_many(self, substance_ids: List[int]) -> Dict[int, Dict[str, str]]:
+        return await self.run(self.db.get_display_values_many, substance_ids)
+
+    async def get_substance_details(self, substance_id: int) -> Optional[Dict[str, Any]]:
+        return await self.run(self.db.get_substance_details, substance_id)
+
+    async def get_substance_details_many(self, substance_ids: List[int]) -> List[Dict[str, Any]]:
+        return await self.run(self.db.get_substance_details_many, substance_ids)
+
+    async def get_family(self, substance_id: int) -> List[Dict[str, Any]]:
+        return await self.run(self.db.get_family, substance_id)
+
+    async def get_substances_page(self, page: int, page_size: int = 50) -> List[Dict[str, Any]]:
+        return await self.run(self.db.get_substances_page, page, page_size)
+
+    async def find_page_for_prefix(self, prefix: str, page_size: int = 50) -> int:
+        return await self.run(self.db.find_page_for_prefix, prefix, page_size)
+
+    async def get_total_count(self) -> int:
+        return await self.run(self.db.get_total_count)
 
+    async def find_similar(self, substance_id: int, k: int = 10) -> List[Dict[str, Any]]:
+        return await self.run(self.db.find_similar, substance_id, k)
+
+    async def get_chinese_name(self, english_name: str) -> Optional[str]:
+        return await self.run(self.db.get_chinese_name, english_name)
+
+    async def get_chinese_names(self, english_names: List[str]) -> Dict[str, str]:
+        return await self.run(self.db.get_chinese_names, english_names)
+
+    async def suggest(self, prefix: str, limit: int = 10) -> List[Dict[str, Any]]:
+        return await self.run(self.db.suggest, prefix, limit)
+
+    async def resolve_identifiers(self, identifiers: List[str]) -> Tuple[List[Dict[str, Any]], List[str]]:
+        return await self.run(self.db.resolve_identifiers, identifiers)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ComparisonStore(ABC):
+    """比對清單儲存介面：每個使用者（session cookie 中的瀏覽器 ID）一份物質 ID 列表
+
+    只存 ID，顯示時再由 PPDBDatabase 取得名稱與詳細資料；久未更新的清單會過期，總數超過上限時淘汰最久未更新者。
+    """
+
+    @abstractmethod
+    def get(self, user_id: str) -> List[int]:
+        """取得使用者的物質 ID 列表（依加入順序；沒有清單時為空列表）"""
+
+    @abstractmethod
+    def add(self, user_id: str, substance_id: int, limit: int) -> str:
+        """加入物質，回傳 "added"、"exists" 或 "full"（已達上限）"""
+
+    @abstractmethod
+    def clear(self, user_id: str):
+        """清空使用者的清單"""
+
+
+class MemoryComparisonStore(ComparisonStore):
+    """存放在本行程記憶體中的比對清單（單一 worker 使用）"""
+
+    def __init__(self, max_sessions: int = 10000, ttl: float = 7 * 24 * 3600):
+        self._lists = LRUCache(max_size=max_sessions, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def get(self, user_id: str) -> List[int]:
+        return list(self._lists.get(user_id, ()))
+
+    def add(self, user_id: str, substance_id: int, limit: int) -> str:
+        with self._lock:
+            ids = self._lists.get(user_id, ())
+            if substance_id in ids:
+                return "exists"
+            if len(ids) >= limit:
+                return "full"
+            self._lists.put(user_id, (*ids, substance_id))
+            return "added"
+
+    def clear(self, user_id: str):
+        self._lists.put(user_id, ())
+
+
+class SQLiteComparisonStore(ComparisonStore):
+    """存放在 SQLite（WAL 模式）附屬檔案中的比對清單，同一台機器上的多個 uvicorn worker 可共用"""
+
+    def __init__(self, path: str = "comparison_lists.db", max_sessions: int = 10000, ttl: float = 7 * 24 * 3600):
+        self.path = path
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS Comparison_Lists (
+                    user_id TEXT PRIMARY KEY,
+                    substance_ids TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_comparison_lists_updated ON Comparison_Lists(updated_at)")
+
+    @contextmanager
+    def _connection(self, write: bool = True) -> Iterator[sqlite3.Connection]:
+        """每個執行緒一條連線；with 區塊即一個交易
+
+        寫入以 BEGIN IMMEDIATE 先取得寫入鎖，避免多個 worker 同時改寫同一份清單；
+        唯讀（write=False）以延遲交易開始，WAL 模式下不會與其他 worker 的讀寫互相阻擋。
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        conn.execute("BEGIN IMMEDIATE" if write else "BEGIN DEFERRED")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _read(self, conn: sqlite3.Connection, user_id: str) -> List[int]:
+        row = conn.execute(
+            "SELECT substance_ids FROM Comparison_Lists WHERE user_id = ? AND updated_at > ?",
+            (user_id, time.time() - self.ttl),
+        ).fetchone()
+        return json.loads(row[0]) if row else []
+
+    def _write(self, conn: sqlite3.Connection, user_id: str, ids: List[int]):
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO Comparison_Lists (user_id, substance_ids, updated_at) VALUES (?, ?, ?)",
+            (user_id, json.dumps(ids), now),
+        )
+        # 淘汰過期與超出上限（最久未更新）的清單
+        conn.execute("DELETE FROM Comparison_Lists WHERE updated_at <= ?", (now - self.ttl,))
+        conn.execute(
+            """
+            DELETE FROM Comparison_Lists WHERE updated_at < (
+                SELECT updated_at FROM Comparison_Lists ORDER BY updated_at DESC LIMIT 1 OFFSET ?
+            )
+        """,
+            (self.max_sessions - 1,),
+        )
+
+    def get(self, user_id: str) -> List[int]:
+        with self._connection(write=False) as conn:
+            return self._read(conn, user_id)
+
+    def add(self, user_id: str, substance_id: int, limit: int) -> str:
+        with self._connection() as conn:
+            ids = self._read(conn, user_id)
+            if substance_id in ids:
+                return "exists"
+            if len(ids) >= limit:
+                return "full"
+            self._write(conn, user_id, ids + [substance_id])
+            return "added"
+
+    def clear(self, user_id: str):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM Comparison_Lists WHERE user_id = ?", (user_id,))
+
+
+def create_comparison_store() -> ComparisonStore:
+    """依環境變數 COMPARISON_STORE（memory 或 sqlite）建立比對清單儲存；多個 worker 時請使用 sqlite"""
+    backend = os.environ.get("COMPARISON_STORE", "memory").lower()
+    ttl = float(os.environ.get("COMPARISON_TTL_SECONDS", 7 * 24 * 3600))
+    if backend == "sqlite":
+        return SQLiteComparisonStore(os.environ.get("COMPARISON_STORE_PATH", "comparison_lists.db"), ttl=ttl)
+    return MemoryComparisonStore(ttl=ttl)
+
+
+class AsyncComparisonStore:
+    """ComparisonStore 的非同步介面
+
+    SQLiteComparisonStore 以 BEGIN IMMEDIATE 取得寫入鎖，其他 worker 持有鎖時最多等待 10 秒；
+    在 run.io_bound 的執行緒中執行，鎖等待不會卡住事件迴圈與其他使用者。
+    """
+
+    def __init__(self, store: ComparisonStore):
+        self.store = store
+
+    async def get(self, user_id: str) -> List[int]:
+        return await run.io_bound(self.store.get, user_id)
+
+    async def add(self, user_id: str, substance_id: int, limit: int) -> str:
+        return await run.io_bound(self.store.add, user_id, substance_id, limit)
+
+    async def clear(self, user_id: str):
+        await run.io_bound(self.store.clear, user_id)
+
+
+# 每位使用者最多可比對的物質數
+MAX_COMPARISON = 8
+
+# 異構物與鹽基形式家族中的關係
+FAMILY_RELATION_LABELS = {
+    "parent": "Parent / 母體",
+    "isomer": "Isomer / 異構物",
+    "salt_ester": "Salt or Ester / 鹽類或酯類",
+}
 
 # 全域變數
 db = PPDBDatabase()
+# 頁面處理函式使用的非同步介面
+async_db = AsyncPPDBDatabase(
+    db, max_workers=db.pool.max_size, timeout=float(os.environ.get("QUERY_TIMEOUT_SECONDS", 30))
+)
 field_mapper = FieldMapper()
-# 每個客戶端的比對清單（使用字典，鍵為客戶端 ID）
-comparison_lists = {}
+# 每個瀏覽器的比對清單（鍵為 session cookie 中的瀏覽器 ID，只存物質 ID）
+comparison_store = create_comparison_store()
+# 頁面處理函式使用的非同步介面
+async_comparison_store = AsyncComparisonStore(comparison_store)
+
+
+# ---- JSON API ----
+# 供下游程式取用資料，不經過 NiceGUI 頁面（不建立 websocket 與元素樹）。
+# 同一資料庫版本的回應內容不變，ETag 由建置版本與請求網址決定：
+# 帶 If-None-Match 的請求在查詢資料庫之前即可回傳 304；gzip 由 ui.run 加上的 GZipMiddleware 處理。
+
+class ApiSessionMiddleware:
+    """沒有帶 session cookie 的 /api 請求，回應時不設定 NiceGUI 的 session cookie
+
+    NiceGUI 的 session middleware 會為每個請求產生 session id 並以 Set-Cookie 回傳，
+    帶 Set-Cookie 的回應無法被反向代理共用快取。此 middleware 位於 session middleware 內層，
+    在回應開始前清空本次請求新建立的 session（已有 cookie 的瀏覽器請求不受影響）。
+    """
+
+    def __init__(self, asgi_app):
+        self.app = asgi_app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith("/api/"):
+            await self.app(scope, receive, send)
+            return
+
+        cookies = b"; ".join(value for name, value in scope["headers"] if name == b"cookie")
+        has_session_cookie = b"session=" in cookies
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and not has_session_cookie and "session" in scope:
+                scope["session"].clear()
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+app.add_middleware(ApiSessionMiddleware)
+
+# 反向代理與客戶端可快取 API 回應的秒數
+API_MAX_AGE = int(os.environ.get("API_MAX_AGE", 300))
+API_MAX_PAGE_SIZE = 500
+
+
+def api_etag(request: Request, version: str) -> str:
+    """弱 ETag：資料庫版本 + 路徑 + 排序後的查詢參數
+
+    同一份 JSON 可能以 gzip 或未壓縮傳送，位元組不同，因此只能是弱驗證器（RFC 9110）。
+    """
+    query = "&".join(f"{key}={value}" for key, value in sorted(request.query_params.multi_items()))
+    digest = hashlib.sha256(f"{version}\n{request.url.path}?{query}".encode("utf-8")).hexdigest()[:32]
+    return f'W/"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match 是否符合（弱比較，依 RFC 9110）"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag.removeprefix("W/"):
+            return True
+    return False
+
+
+async def api_response(request: Request, produce) -> Response:
+    """以 ETag 與 Cache-Control 回傳 produce() 產生的 JSON；符合 If-None-Match 時直接回傳 304
+
+    ETag 使用先檢查過資料庫檔案的版本，替換後背景檢查之前的請求也不會沿用舊版本的 ETag。
+    produce 執行期間資料庫若被替換，內容可能來自任一版本，此時不附 ETag 且不允許快取。
+    """
+    try:
+        version = await async_db.current_version()
+        etag = api_etag(request, version)
+        headers = {"ETag": etag, "Cache-Control": f"public, max-age={API_MAX_AGE}"}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+
+        body = await produce()
+    except DatabaseBusyError:
+        raise HTTPException(status_code=503, detail="Server busy", headers={"Retry-After": "1"})
+    except QueryTimeoutError:
+        raise HTTPException(status_code=503, detail="Database query timed out")
+
+    if db.content_version() != version:
+        headers = {"Cache-Control": "no-store"}
+    return JSONResponse(body, headers=headers)
+
+
+@app.get("/api/substances")
+async def api_substances(
+    request: Request,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(50, ge=1, le=API_MAX_PAGE_SIZE),
+):
+    """物質列表（依名稱排序，keyset 分頁）"""
+    async def produce():
+        items = await async_db.get_substances_page(page, page_size)
+        total = await async_db.get_total_count()
+        return {
+            "page": page,
+            "page_size": page_size,
+            "total": total,
+            "pages": (total + page_size - 1) // page_size,
+            "items": items,
+        }
+
+    return await api_response(request, produce)
+
+
+@app.get("/api/substances/{substance_id}")
+async def api_substance(request: Request, substance_id: int):
+    """物質詳細資料：每個顯示欄位的原始值、比較運算符、單位與顯示字串"""
+    async def produce():
+        details = await async_db.get_substance_details(substance_id)
+        values = (await async_db.get_field_values_many([substance_id])).get(substance_id)
+        if details is None or values is None:
+            raise HTTPException(status_code=404, detail="Substance not found")
+        display = details["display"]
+        registry = await async_db.get_field_registry()
+        name = substance_name(display)
+        return {
+            "id": substance_id,
+            "name": name,
+            "chinese_name": await async_db.get_chinese_name(name) if name else None,
+            "aliases": details["aliases"],
+            "family": [
+                {"id": member["id"], "name": member["name"], "relation": member["relation"]}
+                for member in await async_db.get_family(substance_id)
+                if member["id"] != substance_id
+            ],
+            "fields": {
+                display_field.key: {
+                    "section": display_field.section.key,
+                    "label_en": display_field.info['en'],
+                    "label_zh": display_field.info['zh'],
+                    "value": values[display_field.key][0],
+                    "operator": values[display_field.key][1],
+                    "unit": display_field.unit,
+                    "display": display[display_field.key],
+                }
+                for display_field in registry.fields
+            },
+        }
+
+    return await api_response(request, produce)
+
+
+@app.get("/api/search")
+async def api_search(
+    request: Request,
+    q: str = Query(..., min_length=1),
+    type: str = Query("name"),
+):
+    """搜尋物質（搜尋類型與 /search 頁面相同；結構搜尋的結果附 similarity）"""
+    if type not in PPDBDatabase.SEARCH_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unknown search type: {type}")
+
+    async def produce():
+        try:
+            items = await async_db.search_substances(q, type)
+        except SmilesError:
+            raise HTTPException(status_code=400, detail="Invalid SMILES")
+        return {"query": q, "type": type, "count": len(items), "items": items}
+
+    return await api_response(request, produce)
+
+
+async def bulk_resolve(identifiers: List[str]) -> Dict[str, Any]:
+    """批次解析識別碼並取得比對到的物質資料（/search 批次查詢與 /api/resolve 共用）
+
+    Returns:
+        {"matched": [{"input", "matched_by", "id", "name", "chinese_name", "fields": {欄位: 顯示字串}}],
+         "unmatched": [找不到的輸入]}
+    """
+    matches, unmatched = await async_db.resolve_identifiers(identifiers)
+    display_by_id = await async_db.get_display_values_many([match["id"] for match in matches])
+    chinese_names = await async_db.get_chinese_names([substance_name(display) for display in display_by_id.values()])
+    matched = []
+    for match in matches:
+        display = display_by_id.get(match["id"])
+        if display is None:
+            continue
+        name = substance_name(display)
+        matched.append({**match, "name": name, "chinese_name": chinese_names.get(name), "fields": display})
+    return {"matched": matched, "unmatched": unmatched}
+
+
+@app.post("/api/resolve")
+async def api_resolve(
+    file: UploadFile = File(...),
+    column: Optional[str] = Form(None),
+    format: str = Query("json"),
+):
+    """批次解析上傳的 CSV / XLSX 中一欄識別碼（CAS RN、英文名稱、中文名稱或 InChIKey）
+
+    column 為欄位標題或從 1 開始的欄號，未指定時依標題猜測。format=xlsx 時回傳 Matched / Unmatched 兩個工作表的活頁簿。
+    """
+    if format not in ("json", "xlsx"):
+        raise HTTPException(status_code=400, detail=f"Unknown format: {format}")
+    try:
+        headers, rows = await run.io_bound(read_identifier_table, await file.read(), file.filename or "")
+        identifiers = identifier_values(headers, rows, identifier_column(headers, column))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        result = await bulk_resolve(identifiers)
+    except DatabaseBusyError:
+        raise HTTPException(status_code=503, detail="Server busy", headers={"Retry-After": "1"})
+    except QueryTimeoutError:
+        raise HTTPException(status_code=503, detail="Database query timed out")
+
+    no_store = {"Cache-Control": "no-store"}
+    if format == "xlsx":
+        registry = await async_db.get_field_registry()
+        content = await run.io_bound(write_resolve_workbook, registry.fields, result["matched"], result["unmatched"])
+        filename = f"PPDB_Resolve_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+        return Response(
+            content,
+            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            headers={**no_store, "Content-Disposition": f'attachment; filename="{filename}"'},
+        )
+    return JSONResponse({"total": len(result["matched"]) + len(result["unmatched"]), **result}, headers=no_store)
 
 
 @ui.page("/")
@@ -348,7 +2060,7 @@ def index():
 
 
 @ui.page("/search")
-def search_page():
+async def search_page():
     """搜尋頁面"""
     ui.dark_mode().enable()
 
@@ -379,220 +2091,476 @@ def search_page():
                         "smiles": "SMILES",
                         "inchi": "InChI",
                         "alias": "Alias",
+                        "similar_structure": "Similar Structure (SMILES)",
+                        "substructure": "Substructure (SMILES)",
                     },
                     value="name",
                 ).style("min-width: 200px").props("outlined")
 
+                async def run_search():
+                    # 遞增序號讓尚未完成的輸入提示作廢，避免搜尋開始後提示又重新出現
+                    typeahead["sequence"] += 1
+                    suggestions.set_visibility(False)
+                    await perform_search(search_input.value, search_type.value, results_container, view)
+
+                ui.button("Search", icon="search", on_click=run_search).props("color=primary")
+
+            # 輸入提示（名稱、中文名稱、別名、CAS RN 開頭相符的物質）
+            suggestions = ui.list().props("bordered separator dense").classes("w-full q-mt-sm")
+            suggestions.set_visibility(False)
+            typeahead = {"sequence": 0}
+            search_input.on_value_change(
+                lambda e: update_suggestions(e.value, search_type.value, suggestions, typeahead)
+            )
+
+        # 數值屬性範圍篩選與排序
+        numeric_properties: Dict[str, str] = {}
+        with notify_query_errors():
+            numeric_properties = await async_db.get_numeric_properties()
+        if numeric_properties:
+            property_options = {
+                prop: f"{field_mapper.format_label(prop)} ({unit})" if unit else field_mapper.format_label(prop)
+                for prop, unit in numeric_properties.items()
+            }
+            with ui.expansion("Property Filters / 屬性範圍篩選", icon="filter_alt").classes("w-full q-mb-md"):
+                filter_rows: List[Dict[str, Any]] = []
+                filters_column = ui.column().classes("w-full gap-2")
+
+                def add_filter_row():
+                    with filters_column:
+                        with ui.row().classes("w-full items-center gap-2") as row:
+                            entry = {
+                                "row": row,
+                                "property": ui.select(property_options, label="Property / 屬性", with_input=True)
+                                .classes("flex-grow")
+                                .props("outlined dense"),
+                                "operator": ui.select([">", ">=", "<", "<=", "="], value=">")
+                                .style("min-width: 80px")
+                                .props("outlined dense"),
+                                "value": ui.number(label="Value / 數值").props("outlined dense"),
+                            }
+                            ui.button(icon="close", on_click=lambda: remove_filter_row(entry)).props("flat dense round")
+                    filter_rows.append(entry)
+
+                def remove_filter_row(entry: Dict[str, Any]):
+                    filters_column.remove(entry["row"])
+                    filter_rows.remove(entry)
+
+                add_filter_row()
+
+                with ui.row().classes("w-full items-center gap-4 q-mt-sm"):
+                    ui.button("Add Condition / 新增條件", icon="add", on_click=add_filter_row).props("flat")
+                    sort_select = ui.select(
+                        property_options, label="Sort by / 排序依據", with_input=True, clearable=True
+                    ).style("min-width: 300px").props("outlined dense")
+                    sort_descending = ui.switch("Descending / 由大到小")
+                    ui.button(
+                        "Apply / 套用",
+                        icon="filter_alt",
+                        on_click=lambda: perform_property_filter(
+                            [
+                                (entry["property"].value, entry["operator"].value, entry["value"].value)
+                                for entry in filter_rows
+                                if entry["property"].value and entry["value"].value is not None
+                            ],
+                            sort_select.value,
+                            sort_descending.value,
+                            results_container,
+                            view,
+                        ),
+                    ).props("color=primary")
+
+        # 批次查詢：上傳一欄識別碼，一次解析
+        with ui.expansion("Bulk Resolve / 批次查詢", icon="playlist_add_check").classes("w-full q-mb-md"):
+            ui.label(
+                "Upload a CSV or XLSX file with CAS RNs, names, Chinese names or InChIKeys / "
+                "上傳含 CAS RN、英文名稱、中文名稱或 InChIKey 的 CSV 或 XLSX 檔案"
+            ).classes("text-caption text-grey-6")
+            bulk: Dict[str, Any] = {}
+            with ui.row().classes("w-full items-center gap-4"):
+                ui.upload(
+                    label="CSV / XLSX",
+                    auto_upload=True,
+                    max_file_size=10 * 1024 * 1024,
+                    on_upload=lambda e: load_bulk_file(e.file, bulk, column_select),
+                ).props("accept=.csv,.xlsx flat bordered")
+                column_select = ui.select([], label="Identifier column / 識別碼欄位").style("min-width: 250px").props("outlined dense")
                 ui.button(
-                    "Search",
-                    icon="search",
-                    on_click=lambda: perform_search(search_input.value, search_type.value, results_container, pagination_container),
+                    "Resolve / 查詢",
+                    icon="playlist_add_check",
+                    on_click=lambda: perform_bulk_resolve(bulk, column_select.value, bulk_summary, results_container, view),
                 ).props("color=primary")
+            bulk_summary = ui.column().classes("w-full")
 
         # 搜尋結果區域
         results_container = ui.column().classes("w-full")
 
-        # 分頁區域
-        pagination_container = ui.column().classes("w-full")
+        # 目前顯示中的表格（所有物質或搜尋結果），切換模式時才重建
+        view: Dict[str, Any] = {}
 
         # 預設顯示第 1 頁
-        display_all_substances(results_container, pagination_container, page=1)
+        await display_all_substances(results_container, view, page=1)
 
 
-def perform_search(query: str, search_type: str, container: ui.column, pagination_container: ui.column):
-    """執行搜尋"""
-    if not query or query.strip() == "":
-        ui.notify("Please enter a search query", type="warning")
-        return
+# 輸入提示：停止輸入多久後才查詢（秒）、適用的搜尋類型與類型標籤
+TYPEAHEAD_DEBOUNCE = 0.2
+TYPEAHEAD_SEARCH_TYPES = ("name", "cas", "alias")
+TYPEAHEAD_KIND_LABELS = {"name": "Name", "chinese": "中文名稱", "alias": "Alias", "cas": "CAS RN"}
 
-    results = db.search_substances(query, search_type)
-    display_search_results(results, container, pagination_container)
-    # 清除分頁（搜尋結果不分頁，因為已經限制在 100 筆內）
-    pagination_container.clear()
 
+async def update_suggestions(text: Optional[str], search_type: str, container: ui.list, state: Dict[str, int]):
+    """更新輸入提示
 
-def create_pagination(pagination_container: ui.column, current_page: int, total_pages: int, results_container: ui.column):
-    """建立分頁元件"""
-    pagination_container.clear()
+    每次輸入遞增 state["sequence"]；等待 TYPEAHEAD_DEBOUNCE 秒後若已有新的輸入就放棄，
+    取得提示後若期間又有新的輸入也丟棄結果，避免較慢的舊回應覆蓋新的提示。
+    """
+    state["sequence"] += 1
+    sequence = state["sequence"]
+    await asyncio.sleep(TYPEAHEAD_DEBOUNCE)
+    if sequence != state["sequence"]:
+        return
 
-    if total_pages <= 1:
+    items = []
+    if text and text.strip() and search_type in TYPEAHEAD_SEARCH_TYPES:
+        items = await async_db.suggest(text)
+    if sequence != state["sequence"]:
         return
 
-    with pagination_container:
-        with ui.card().classes("w-full q-pa-md q-mt-md"):
-            with ui.row().classes("w-full items-center justify-center gap-2 flex-wrap"):
-                # 上一頁按鈕
-                prev_disabled = current_page == 1
-                ui.button(
-                    "上一頁 / Previous",
-                    icon="navigate_before",
-                    on_click=lambda: display_all_substances(results_container, pagination_container, page=current_page - 1)
-                ).props(f"{'disable' if prev_disabled else ''} outline")
+    container.clear()
+    with container:
+        for item in items:
+            with ui.item(on_click=lambda item=item: ui.navigate.to(f"/substance/{item['id']}")):
+                with ui.item_section():
+                    ui.item_label(item["label"])
+                    caption = TYPEAHEAD_KIND_LABELS.get(item["kind"], item["kind"])
+                    if item["label"] != item["name"]:
+                        caption = f"{caption} · {item['name']}"
+                    ui.item_label(caption).props("caption")
+    container.set_visibility(bool(items))
 
-                # 第一頁
-                if current_page > 3:
-                    ui.button(
-                        "1",
-                        on_click=lambda: display_all_substances(results_container, pagination_container, page=1)
-                    ).props(f"{'unelevated color=primary' if current_page == 1 else 'outline'}")
 
-                    if current_page > 4:
-                        ui.label("...").classes("q-px-sm")
+BUSY_MESSAGE = "Server busy, please try again / 系統忙碌中，請稍後再試"
 
-                # 當前頁面附近的頁碼
-                start_page = max(1, current_page - 2)
-                end_page = min(total_pages, current_page + 2)
 
-                for page_num in range(start_page, end_page + 1):
-                    ui.button(
-                        str(page_num),
-                        on_click=lambda p=page_num: display_all_substances(results_container, pagination_container, page=p)
-                    ).props(f"{'unelevated color=primary' if page_num == current_page else 'outline'}")
+@contextmanager
+def notify_query_errors(timeout_message: str = "Query timed out, please try again / 查詢逾時，請稍後再試"):
+    """頁面或事件處理中的查詢逾時或系統忙碌時顯示通知，而不是讓例外變成 500 錯誤頁"""
+    try:
+        yield
+    except DatabaseBusyError:
+        ui.notify(BUSY_MESSAGE, type="warning")
+    except QueryTimeoutError:
+        ui.notify(timeout_message, type="negative")
 
-                # 最後一頁
-                if current_page < total_pages - 2:
-                    if current_page < total_pages - 3:
-                        ui.label("...").classes("q-px-sm")
 
-                    ui.button(
-                        str(total_pages),
-                        on_click=lambda: display_all_substances(results_container, pagination_container, page=total_pages)
-                    ).props(f"{'unelevated color=primary' if current_page == total_pages else 'outline'}")
+def supersede_query(view: Dict[str, Any]):
+    """取消同一頁面上一個尚未完成的查詢（使用者已送出新的查詢），由目前的任務接手"""
+    previous = view.get("query_task")
+    current = asyncio.current_task()
+    if previous is not None and previous is not current and not previous.done():
+        previous.cancel()
+    view["query_task"] = current
 
-                # 下一頁按鈕
-                next_disabled = current_page == total_pages
-                ui.button(
-                    "下一頁 / Next",
-                    icon="navigate_next",
-                    on_click=lambda: display_all_substances(results_container, pagination_container, page=current_page + 1)
-                ).props(f"{'disable' if next_disabled else ''} outline")
 
-            # 顯示頁碼資訊
-            ui.label(f"第 {current_page} 頁 / 共 {total_pages} 頁 | Page {current_page} of {total_pages}").classes("text-center text-grey-6 q-mt-sm")
+async def perform_search(query: str, search_type: str, container: ui.column, view: Dict[str, Any]):
+    """執行搜尋"""
+    if not query or query.strip() == "":
+        ui.notify("Please enter a search query", type="warning")
+        return
 
+    supersede_query(view)
 
-def display_all_substances(container: ui.column, pagination_container: ui.column, page: int = 1, page_size: int = 50):
-    """顯示所有物質（分頁）"""
-    container.clear()
+    if search_type == "cas" and is_cas_number(query) and not is_valid_cas(query):
+        ui.notify("CAS RN 檢查碼不符，請確認號碼 / CAS RN check digit does not match", type="warning")
 
-    # 計算 offset
-    offset = (page - 1) * page_size
+    try:
+        results = await async_db.search_substances(query, search_type)
+    except SmilesError:
+        ui.notify("Invalid SMILES / 無法解析的 SMILES", type="negative")
+        return
+    except DatabaseBusyError:
+        ui.notify(BUSY_MESSAGE, type="warning")
+        return
+    except QueryTimeoutError:
+        ui.notify("Search timed out / 搜尋逾時，請縮小查詢範圍", type="negative")
+        return
 
-    # 取得總數和當前頁資料
-    total_count = db.get_total_count()
-    total_pages = (total_count + page_size - 1) // page_size
-    substances = db.get_all_substances(limit=page_size, offset=offset)
+    if search_type in ("similar_structure", "substructure"):
+        for result in results:
+            result["sort_display"] = f"{result['similarity']:.2f}"
+        await display_search_results(results, container, view, sort_label="Tanimoto Similarity / 結構相似度")
+    else:
+        await display_search_results(results, container, view)
+
+
+async def perform_property_filter(
+    filters: List[Tuple[str, str, float]],
+    sort_by: Optional[str],
+    descending: bool,
+    container: ui.column,
+    view: Dict[str, Any],
+):
+    """執行數值屬性範圍篩選"""
+    if not filters and not sort_by:
+        ui.notify("Please add a condition or choose a property to sort by / 請設定篩選條件或排序屬性", type="warning")
+        return
 
-    with container:
-        ui.label(f"All Substances | 所有物質 (共 {total_count} 筆，第 {page}/{total_pages} 頁)").classes("text-h6 q-mb-md")
+    supersede_query(view)
+    try:
+        results = await async_db.filter_by_properties(filters, sort_by=sort_by, descending=descending)
+    except DatabaseBusyError:
+        ui.notify(BUSY_MESSAGE, type="warning")
+        return
+    except QueryTimeoutError:
+        ui.notify("Search timed out / 搜尋逾時，請縮小查詢範圍", type="negative")
+        return
+    for result in results:
+        if result["sort_value"] is None:
+            result["sort_display"] = "N/A"
+        else:
+            operator = "" if result["sort_operator"] == "=" else f"{result['sort_operator']} "
+            result["sort_display"] = f"{operator}{result['sort_value']:g} {result['sort_unit']}".strip()
 
-        if not substances:
-            ui.label("No substances found").classes("text-grey")
-            return
+    sort_label = field_mapper.format_label(sort_by) if sort_by else None
+    await display_search_results(results, container, view, sort_label=sort_label)
 
-        columns = [
-            {"name": "name", "label": "Substance Name", "field": "name", "align": "left", "sortable": True},
-            {"name": "cas_rn", "label": "CAS RN", "field": "cas_rn", "align": "left"},
-            {"name": "status", "label": "Status", "field": "status", "align": "left"},
-            {"name": "actions", "label": "Actions", "field": "actions", "align": "center"},
-        ]
 
-        table = ui.table(columns=columns, rows=substances, row_key="id").classes("w-full")
-        table.add_slot(
-            "body-cell-actions",
-            """
-            <q-td :props="props">
-                <q-btn flat dense color="primary" label="View" @click="$parent.$emit('view', props.row)" />
-                <q-btn flat dense color="secondary" label="Add to Compare" @click="$parent.$emit('compare', props.row)" />
-            </q-td>
-        """,
-        )
+async def load_bulk_file(file, bulk: Dict[str, Any], column_select: ui.select):
+    """讀取上傳的識別碼檔案，並猜測識別碼欄位"""
+    try:
+        headers, rows = await run.io_bound(read_identifier_table, await file.read(), file.name)
+    except ValueError as e:
+        ui.notify(str(e), type="negative")
+        return
+    bulk.update({"filename": file.name, "headers": headers, "rows": rows})
+    column_select.set_options(headers, value=headers[identifier_column(headers)])
+    ui.notify(f"已讀取 {len(rows)} 列 / Loaded {len(rows)} rows from {file.name}", type="positive")
 
-        table.on("view", lambda e: ui.navigate.to(f"/substance/{e.args['id']}"))
-        table.on("compare", lambda e: add_to_comparison(e.args))
 
-    # 建立分頁元件
-    create_pagination(pagination_container, page, total_pages, container)
+async def perform_bulk_resolve(
+    bulk: Dict[str, Any], column: Optional[str], summary: ui.column, container: ui.column, view: Dict[str, Any]
+):
+    """執行批次查詢：比對到的物質顯示在結果表格，找不到的識別碼另外列出，並可下載完整結果"""
+    if not bulk.get("headers"):
+        ui.notify("Please upload a CSV or XLSX file first / 請先上傳檔案", type="warning")
+        return
+
+    try:
+        identifiers = identifier_values(bulk["headers"], bulk["rows"], identifier_column(bulk["headers"], column))
+    except ValueError as e:
+        ui.notify(str(e), type="negative")
+        return
+
+    supersede_query(view)
+    try:
+        result = await bulk_resolve(identifiers)
+    except DatabaseBusyError:
+        ui.notify(BUSY_MESSAGE, type="warning")
+        return
+    except QueryTimeoutError:
+        ui.notify("Search timed out / 搜尋逾時，請減少識別碼數量", type="negative")
+        return
+    matched, unmatched = result["matched"], result["unmatched"]
+
+    # 同一物質被多個輸入比對到時合併為一列
+    rows: Dict[int, Dict[str, Any]] = {}
+    for match in matched:
+        row = rows.setdefault(match["id"], {
+            "id": match["id"],
+            "name": match["name"],
+            "cas_rn": match["fields"]["CAS_RN"],
+            "status": match["fields"]["Availability_status"],
+            "inputs": [],
+        })
+        row["inputs"].append(match["input"])
+    for row in rows.values():
+        row["sort_display"] = ", ".join(row.pop("inputs"))
+
+    async def download():
+        registry = await async_db.get_field_registry()
+        content = await run.io_bound(write_resolve_workbook, registry.fields, matched, unmatched)
+        ui.download(content, f"PPDB_Resolve_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx")
+
+    total = len({match["input"] for match in matched}) + len(unmatched)
+    summary.clear()
+    with summary:
+        with ui.row().classes("w-full items-center gap-4 q-mt-sm"):
+            ui.label(
+                f"Matched {total - len(unmatched)} / {total} identifiers, {len(rows)} substances / "
+                f"比對到 {total - len(unmatched)} / {total} 個識別碼，共 {len(rows)} 個物質"
+            ).classes("text-subtitle1")
+            ui.button("Download / 下載結果", icon="download", on_click=download).props("outline")
+        if unmatched:
+            ui.label(f"Unmatched / 找不到 ({len(unmatched)})").classes("text-subtitle2 text-negative")
+            ui.textarea(value="\n".join(unmatched)).props("readonly outlined dense").classes("w-full")
+
+    await display_search_results(list(rows.values()), container, view, sort_label="Input / 輸入")
+
+
+def create_substance_table(
+    rows: List[Dict],
+    name_field: str = "name",
+    pagination: Optional[Dict[str, Any]] = None,
+    value_label: Optional[str] = None,
+) -> ui.table:
+    """建立物質表格（含 View / Add to Compare 按鈕）
+
+    指定 value_label 時多一欄顯示排序屬性的值（sort_display 欄位）。
+    """
+    columns = [
+        {"name": "name", "label": "Substance Name", "field": name_field, "align": "left", "sortable": pagination is None},
+        {"name": "cas_rn", "label": "CAS RN", "field": "cas_rn", "align": "left"},
+        {"name": "status", "label": "Status", "field": "status", "align": "left"},
+        {"name": "actions", "label": "Actions", "field": "actions", "align": "center"},
+    ]
+    if value_label:
+        columns.insert(3, {"name": "sort_display", "label": value_label, "field": "sort_display", "align": "right"})
+
+    table = ui.table(columns=columns, rows=rows, row_key="id", pagination=pagination).classes("w-full")
+    table.add_slot(
+        "body-cell-actions",
+        """
+        <q-td :props="props">
+            <q-btn flat dense color="primary" label="View" @click="$parent.$emit('view', props.row)" />
+            <q-btn flat dense color="secondary" label="Add to Compare" @click="$parent.$emit('compare', props.row)" />
+        </q-td>
+    """,
+    )
 
+    table.on("view", lambda e: ui.navigate.to(f"/substance/{e.args['id']}"))
+    table.on("compare", lambda e: add_to_comparison(e.args))
+    return table
+
+
+async def display_all_substances(container: ui.column, view: Dict[str, Any], page: int = 1, page_size: int = 50):
+    """顯示所有物質（伺服器端分頁）
+
+    表格只建立一次；換頁時由 Quasar 發出 request 事件，伺服器只取回該頁的資料列並更新表格的 rows，
+    不重建元件也不重送其他頁的資料。
+    """
+    if view.get("mode") == "all":
+        await view["load_page"](page, view["page_size"])
+        return
 
-def display_search_results(results: List[Dict], container: ui.column, pagination_container: ui.column):
-    """顯示搜尋結果"""
     container.clear()
+    view.clear()
+
+    # 取得總數（每個資料庫版本只計算一次）
+    total_count = None
+    with notify_query_errors():
+        total_count = await async_db.get_total_count()
+    if total_count is None:
+        return
+
     with container:
-        ui.label(f"Search Results ({len(results)} found)").classes("text-h6 q-mb-md")
+        title = ui.label().classes("text-h6 q-mb-md")
 
-        if not results:
-            ui.label("No results found").classes("text-grey")
-            ui.button("Show All", on_click=lambda: display_all_substances(container, pagination_container, page=1)).classes("q-mt-md")
+        if not total_count:
+            title.text = "All Substances | 所有物質 (共 0 筆)"
+            ui.label("No substances found").classes("text-grey")
             return
 
-        # 為每個結果添加中文名稱
-        for result in results:
-            chinese_name = db.get_chinese_name(result.get("name", ""))
-            if chinese_name:
-                result["name_with_chinese"] = f"{result['name']} ({chinese_name})"
-            else:
-                result["name_with_chinese"] = result["name"]
-
-        columns = [
-            {"name": "name", "label": "Substance Name", "field": "name_with_chinese", "align": "left", "sortable": True},
-            {"name": "cas_rn", "label": "CAS RN", "field": "cas_rn", "align": "left"},
-            {"name": "status", "label": "Status", "field": "status", "align": "left"},
-            {"name": "actions", "label": "Actions", "field": "actions", "align": "center"},
-        ]
+        # 依字母或名稱開頭跳頁
+        with ui.row().classes("w-full items-center gap-1 q-mb-md flex-wrap"):
+            for letter in "ABCDEFGHIJKLMNOPQRSTUVWXYZ":
+                ui.button(letter, on_click=lambda l=letter: jump_to(l)).props("flat dense size=sm")
+            jump_input = ui.input(placeholder="Jump to name / 跳至名稱").props("dense outlined").classes("q-ml-md")
+            jump_input.on("keydown.enter", lambda: jump_to(jump_input.value))
 
-        table = ui.table(columns=columns, rows=results, row_key="id").classes("w-full")
-        table.add_slot(
-            "body-cell-actions",
-            """
-            <q-td :props="props">
-                <q-btn flat dense color="primary" label="View" @click="$parent.$emit('view', props.row)" />
-                <q-btn flat dense color="secondary" label="Add to Compare" @click="$parent.$emit('compare', props.row)" />
-            </q-td>
-        """,
+        table = create_substance_table(
+            [],
+            pagination={"page": 1, "rowsPerPage": page_size, "rowsNumber": total_count},
+        )
+        table.props(":rows-per-page-options=\"[25, 50, 100]\"")
+
+    async def load_page(new_page: int, rows_per_page: int):
+        """以 keyset 分頁取得指定頁，只更新表格資料列與分頁狀態"""
+        total_pages = (total_count + rows_per_page - 1) // rows_per_page
+        new_page = min(max(new_page, 1), max(total_pages, 1))
+        with notify_query_errors():
+            table.rows = await async_db.get_substances_page(new_page, rows_per_page)
+            table.pagination = {"page": new_page, "rowsPerPage": rows_per_page, "rowsNumber": total_count}
+            title.text = f"All Substances | 所有物質 (共 {total_count} 筆，第 {new_page}/{total_pages} 頁)"
+            view["page_size"] = rows_per_page
+
+    async def jump_to(prefix: str):
+        if prefix and prefix.strip():
+            rows_per_page = view["page_size"]
+            with notify_query_errors():
+                await load_page(await async_db.find_page_for_prefix(prefix, rows_per_page), rows_per_page)
+
+    async def on_request(e):
+        pagination = e.args["pagination"]
+        await load_page(pagination["page"], pagination["rowsPerPage"] or page_size)
+
+    table.on("request", on_request)
+    view.update({"mode": "all", "load_page": load_page, "page_size": page_size})
+    await load_page(page, page_size)
+
+
+async def display_search_results(
+    results: List[Dict], container: ui.column, view: Dict[str, Any], sort_label: Optional[str] = None
+):
+    """顯示搜尋結果
+
+    同一頁面再次搜尋時沿用既有表格，只替換資料列；sort_label 不同（屬性篩選的排序欄）時才重建表格。
+    """
+    # 為每個結果添加中文名稱（一次批次查詢）；查詢逾時或系統忙碌時只顯示英文名稱
+    chinese_names: Dict[str, str] = {}
+    with notify_query_errors():
+        chinese_names = await async_db.get_chinese_names([result.get("name", "") for result in results])
+    for result in results:
+        chinese_name = chinese_names.get(result.get("name", ""))
+        if chinese_name:
+            result["name_with_chinese"] = f"{result['name']} ({chinese_name})"
+        else:
+            result["name_with_chinese"] = result["name"]
+
+    if view.get("mode") != "search" or view.get("sort_label") != sort_label:
+        container.clear()
+        view.clear()
+        with container:
+            title = ui.label().classes("text-h6 q-mb-md")
+            with ui.column() as empty_notice:
+                ui.label("No results found").classes("text-grey")
+                ui.button("Show All", on_click=lambda: display_all_substances(container, view, page=1)).classes("q-mt-md")
+            table = create_substance_table([], name_field="name_with_chinese", value_label=sort_label)
+        view.update(
+            {"mode": "search", "sort_label": sort_label, "title": title, "empty_notice": empty_notice, "table": table}
         )
 
-        table.on("view", lambda e: ui.navigate.to(f"/substance/{e.args['id']}"))
-        table.on("compare", lambda e: add_to_comparison(e.args))
+    view["title"].text = f"Search Results ({len(results)} found)"
+    view["empty_notice"].set_visibility(not results)
+    view["table"].set_visibility(bool(results))
+    view["table"].rows = results
 
 
-def add_to_comparison(substance: Dict[str, Any]):
-    """加入比對清單"""
-    from nicegui import app
-    global comparison_lists
+def comparison_user_id() -> str:
+    """比對清單的鍵：簽章 session cookie 中的瀏覽器 ID
 
-    # 獲取當前用戶 ID（使用 app.storage.user，基於 cookies，在頁面間持久）
-    if 'user_id' not in app.storage.user:
-        app.storage.user['user_id'] = str(uuid.uuid4())
-
-    user_id = app.storage.user['user_id']
-    print(f"DEBUG add_to_comparison: user_id = {user_id}")
+    app.storage.user 是每個 worker 各自的檔案字典，不同 worker 可能為同一個瀏覽器產生不同的 ID；
+    app.storage.browser['id'] 由 cookie 解出，所有 worker 都相同，共用的 SQLite 比對清單才找得到。
+    """
+    return app.storage.browser['id']
 
-    # 從字典中取得該用戶的比對清單
-    if user_id not in comparison_lists:
-        comparison_lists[user_id] = []
-        print(f"DEBUG add_to_comparison: Created new list for user_id = {user_id}")
 
-    selected_for_comparison = comparison_lists[user_id]
-    print(f"DEBUG add_to_comparison: Current list length = {len(selected_for_comparison)}")
+async def add_to_comparison(substance: Dict[str, Any]):
+    """加入比對清單"""
 
-    if len(selected_for_comparison) >= 8:
-        ui.notify("Maximum 8 substances can be compared", type="warning")
-        return
+    user_id = comparison_user_id()
+    status = await async_comparison_store.add(user_id, int(substance["id"]), MAX_COMPARISON)
 
-    if any(s["id"] == substance["id"] for s in selected_for_comparison):
+    if status == "full":
+        ui.notify(f"Maximum {MAX_COMPARISON} substances can be compared", type="warning")
+    elif status == "exists":
         ui.notify("Substance already added to comparison", type="warning")
-        return
-
-    selected_for_comparison.append(substance)
-    print(f"DEBUG add_to_comparison: Added {substance['name']}, new length = {len(selected_for_comparison)}")
-    print(f"DEBUG add_to_comparison: All comparison_lists keys = {list(comparison_lists.keys())}")
-    print(f"DEBUG add_to_comparison: comparison_lists[{user_id}] = {[s['name'] for s in comparison_lists[user_id]]}")
-    ui.notify(f"Added {substance['name']} to comparison ({len(selected_for_comparison)}/8)", type="positive")
+    else:
+        count = len(await async_comparison_store.get(user_id))
+        ui.notify(f"Added {substance['name']} to comparison ({count}/{MAX_COMPARISON})", type="positive")
 
 
 @ui.page("/substance/{substance_id}")
-def substance_details(substance_id: int):
+async def substance_details(substance_id: int):
     """物質詳細頁面"""
     ui.dark_mode().enable()
 
@@ -604,142 +2572,106 @@ def substance_details(substance_id: int):
                 ui.button("Search", on_click=lambda: ui.navigate.to("/search")).props("flat").classes("text-white")
                 ui.button("Compare", on_click=lambda: ui.navigate.to("/compare")).props("flat").classes("text-white")
 
-    details = db.get_substance_details(substance_id)
-
-    if not details:
-        with ui.column().classes("w-full items-center q-pa-xl"):
-            ui.label("Substance not found").classes("text-h4 text-negative")
-            ui.button("Back to Search", on_click=lambda: ui.navigate.to("/search")).classes("q-mt-md")
-        return
-
-    info = details["identification"]
-
-    with ui.column().classes("w-full q-pa-md"):
-        # 標題
-        with ui.row().classes("w-full items-center q-mb-md"):
-            ui.button(icon="arrow_back", on_click=lambda: ui.navigate.to("/search")).props("flat round")
-            with ui.column().classes("q-ml-md"):
-                ui.label(info.get("Active", "N/A")).classes("text-h4")
-                # 顯示中文名稱（如果有的話）
-                chinese_name = db.get_chinese_name(info.get("Active", ""))
-                if chinese_name:
-                    ui.label(f"中文名稱: {chinese_name}").classes("text-h6 text-grey-7")
+    # 查詢逾時或系統忙碌時只顯示通知
+    with notify_query_errors():
+        registry = await async_db.get_field_registry()
+        details = await async_db.get_substance_details(substance_id)
 
-        # 基本資訊
-        with ui.card().classes("w-full q-pa-md q-mb-md"):
-            ui.label("General Information / 一般資料").classes("text-h6 q-mb-md")
-            with ui.grid(columns=2).classes("w-full gap-4"):
-                display_field("CAS_RN", info.get("CAS_RN"))
-                display_field("Availability_status", info.get("Availability_status"))
-                display_field("Isomerism", info.get("Isomerism"))  # BH
-                display_field("Chemical_formula", info.get("Chemical_formula"))  # BK
-                display_field("Canonical_SMILES", info.get("Canonical_SMILES"))
-                display_field("Isomeric_SMILES", info.get("Isomeric_SMILES"))  # BJ
-                display_field("International_Chemical_Identifier_InChI", info.get("International_Chemical_Identifier_InChI"))
-                display_field("International_Chemical_Identifier_key_InChIKey", info.get("International_Chemical_Identifier_key_InChIKey"))  # BL
-                display_field("Molecular_mass", info.get("Molecular_mass"))
-                display_field("Pesticide_type", info.get("Pesticide_type"))  # AT
-                display_field("Substance_group", info.get("Substance_group"))  # AW
-                display_field("Mode_of_action", info.get("Mode_of_action"))  # BB
-
-        # 別名
-        if details["aliases"]:
-            with ui.card().classes("w-full q-pa-md q-mb-md"):
-                ui.label("Aliases").classes("text-h6 q-mb-md")
-                for alias in details["aliases"]:
-                    if alias.get("Alias"):
-                        ui.label(f"• {alias['Alias']}")
+        if not details:
+            with ui.column().classes("w-full items-center q-pa-xl"):
+                ui.label("Substance not found").classes("text-h4 text-negative")
+                ui.button("Back to Search", on_click=lambda: ui.navigate.to("/search")).classes("q-mt-md")
+            return
 
-        # Environmental Fate
-        if details["fate"]:
-            with ui.card().classes("w-full q-pa-md q-mb-md"):
-                ui.label("Environmental Fate / 環境命運").classes("text-h6 q-mb-md")
-                fate = details["fate"]
-                with ui.grid(columns=2).classes("w-full gap-4"):
-                    display_field("Solubility__In_water_at_20_degC_mgl", fate.get("Solubility__In_water_at_20_degC_mgl"))
-                    display_field("Melting_point_degC", fate.get("Melting_point_degC"))  # N
-                    display_field("Boiling_point_deg_C_1atm", fate.get("Boiling_point_deg_C_1atm"))  # P
-                    display_field("LogP", fate.get("LogP"))
-                    display_field("Dissociation_constant_pKa_at_25_degC", fate.get("Dissociation_constant_pKa_at_25_degC"))  # Z
-                    display_field("Vapour_pressure_at_20_degC_mPa", fate.get("Vapour_pressure_at_20_degC_mPa"))
-                    display_field("Henrys_law_constant_at_25_degC_Pam3mol", fate.get("Henrys_law_constant_at_25_degC_Pam3mol"))  # AE
-                    display_field("Soil_DT50__Typical_days", fate.get("Soil_DT50__Typical_days"))  # AQ
-                    display_field("Soil_DT50__Lab_days", fate.get("Soil_DT50__Lab_days"))  # AS
-                    display_field("Soil_DT50__Field_days", fate.get("Soil_DT50__Field_days"))  # AU
-                    display_field("Watersediment_DT50_days", fate.get("Watersediment_DT50_days"))  # BP
-                    display_field("Koc_mlg", fate.get("Koc_mlg"))  # BW
-                    display_field("Kfoc_mlg", fate.get("Kfoc_mlg"))  # CA
-                    display_field("Bioconcentration_factor", fate.get("Bioconcentration_factor"))  # AN
-
-        # Terrestrial Ecotoxicology
-        if details["terrestrial_ecotox"]:
-            with ui.card().classes("w-full q-pa-md q-mb-md"):
-                ui.label("Terrestrial Ecotoxicology / 陸生生態毒理").classes("text-h6 q-mb-md")
-                terr_eco = details["terrestrial_ecotox"]
-                with ui.grid(columns=2).classes("w-full gap-4"):
-                    display_field("Mammals__Acute_oral_LD50_mgkg_BWday", terr_eco.get("Mammals__Acute_oral_LD50_mgkg_BWday"), details_dict=details)  # D
-                    display_field("Birds__Acute_LD50_mgkg", terr_eco.get("Birds__Acute_LD50_mgkg"), details_dict=details)  # N
-                    display_field("Earthworms__Acute_14d_LC50_mgkg", terr_eco.get("Earthworms__Acute_14d_LC50_mgkg"), details_dict=details)  # BH
-                    display_field("Honeybees__Contact_acute_48hr_LD50_ug_per_bee", terr_eco.get("Honeybees__Contact_acute_48hr_LD50_ug_per_bee"), details_dict=details)  # X
-
-        # Aquatic Ecotoxicology
-        if details["aquatic_ecotox"]:
-            with ui.card().classes("w-full q-pa-md q-mb-md"):
-                ui.label("Aquatic Ecotoxicology / 水生生態毒理").classes("text-h6 q-mb-md")
-                eco = details["aquatic_ecotox"]
-                with ui.grid(columns=2).classes("w-full gap-4"):
-                    display_field("Fish__Acute_96hr_LC50_mgl__TEMPERATE", eco.get("Fish__Acute_96hr_LC50_mgl__TEMPERATE"), details_dict=details)
-                    display_field("Algae__Acute_72hr_EC50_growth_mgl", eco.get("Algae__Acute_72hr_EC50_growth_mgl"), details_dict=details)
-
-        # Human Health
-        if details["human"]:
-            with ui.card().classes("w-full q-pa-md q-mb-md"):
-                ui.label("Human Health / 人體健康").classes("text-h6 q-mb-md")
-                human = details["human"]
-                with ui.grid(columns=2).classes("w-full gap-4"):
-                    display_field("Mammals__Dermal_LD50_mgkg", human.get("Mammals__Dermal_LD50_mgkg"))
-                    display_field("Mammals__Inhalation_LC50_mgl", human.get("Mammals__Inhalation_LC50_mgl"))
-                    display_field("Acceptable_Daily_Intake_ADI_mgkg_bw", human.get("Acceptable_Daily_Intake_ADI_mgkg_bw"))
-                    display_field("Acute_Reference_Dose_ARfD_mgkg_BWday", human.get("Acute_Reference_Dose_ARfD_mgkg_BWday"))
-                    display_field("Acceptable_Operator_Exposure_Level_AOEL_systemic", human.get("Acceptable_Operator_Exposure_Level_AOEL_systemic"))  # Y
-                    display_field("Percutaneous_penetration_studies_", human.get("Percutaneous_penetration_studies_"))  # AA
-                    display_field("Carcinogen", human.get("Carcinogen"))  # AJ
-                    display_field("Genotoxic", human.get("Genotoxic"))  # AK
-                    display_field("Endocrine_distrupter", human.get("Endocrine_distrupter"))  # AL
-                    display_field("Reproductiondevelopment_effects", human.get("Reproductiondevelopment_effects"))  # AM
-                    display_field("Acetyl_cholinesterase_inhibitor", human.get("Acetyl_cholinesterase_inhibitor"))  # AN
-                    display_field("Neurotoxicant", human.get("Neurotoxicant"))  # AO
-                    display_field("Respiratory_tract_irritant", human.get("Respiratory_tract_irritant"))  # AP
-                    display_field("Skin_irritant", human.get("Skin_irritant"))  # AQ
-                    display_field("Skin_sensitiser", human.get("Skin_sensitiser"))  # AR
-                    display_field("Eye_irritant", human.get("Eye_irritant"))  # AS
-                    display_field("Phototoxicant", human.get("Phototoxicant"))  # AT
-                    display_field("General_human_health_issues", human.get("General_human_health_issues"))  # AU
-                    display_field("Handling_issues", human.get("Handling_issues"))  # AV
-
-
-def display_field(db_field: str, value: Any, show_metadata: bool = True, details_dict: Optional[Dict[str, Any]] = None):
+        display = details["display"]
+        active = display["Active"]
+        aliases = details["aliases"]
+        family = [member for member in await async_db.get_family(substance_id) if member["id"] != int(substance_id)]
+
+        with ui.column().classes("w-full q-pa-md"):
+            # 標題
+            with ui.row().classes("w-full items-center q-mb-md"):
+                ui.button(icon="arrow_back", on_click=lambda: ui.navigate.to("/search")).props("flat round")
+                with ui.column().classes("q-ml-md"):
+                    ui.label(active).classes("text-h4")
+                    # 顯示中文名稱（如果有的話）
+                    chinese_name = await async_db.get_chinese_name(active)
+                    if chinese_name:
+                        ui.label(f"中文名稱: {chinese_name}").classes("text-h6 text-grey-7")
+
+            for section in registry.sections:
+                # 名稱已顯示在標題
+                fields = [f for f in registry.section_fields(section.key) if f.key != "Active"]
+                # 一般資料以外的區塊，所有欄位都沒有值時不顯示
+                if section.key != "identification" and all(display[f.key] == "N/A" for f in fields):
+                    continue
+
+                with ui.card().classes("w-full q-pa-md q-mb-md"):
+                    ui.label(section.title).classes("text-h6 q-mb-md")
+                    with ui.grid(columns=2).classes("w-full gap-4"):
+                        for display_field in fields:
+                            display_field_value(display_field, display[display_field.key])
+
+                # 別名
+                if section.key == "identification" and aliases:
+                    with ui.card().classes("w-full q-pa-md q-mb-md"):
+                        ui.label("Aliases").classes("text-h6 q-mb-md")
+                        for alias in aliases:
+                            ui.label(f"• {alias}")
+
+                # 同一家族的光學異構物與鹽基形式
+                if section.key == "identification" and family:
+                    chinese_names = await async_db.get_chinese_names([member["name"] for member in family])
+                    for member in family:
+                        chinese_name = chinese_names.get(member["name"])
+                        member["name_with_chinese"] = f"{member['name']} ({chinese_name})" if chinese_name else member["name"]
+                        member["sort_display"] = FAMILY_RELATION_LABELS.get(member["relation"], member["relation"])
+                    with ui.card().classes("w-full q-pa-md q-mb-md"):
+                        ui.label("Isomers and Salt Forms / 異構物與鹽基形式").classes("text-h6 q-mb-md")
+                        create_substance_table(family, name_field="name_with_chinese", value_label="Relation / 關係")
+
+            # 性質輪廓相似的物質（用於尋找替代品）
+            similar = await async_db.find_similar(substance_id, k=10)
+            if similar:
+                chinese_names = await async_db.get_chinese_names([row["name"] for row in similar])
+                for row in similar:
+                    chinese_name = chinese_names.get(row["name"])
+                    row["name_with_chinese"] = f"{row['name']} ({chinese_name})" if chinese_name else row["name"]
+                    row["distance_display"] = f"{row['distance']:.2f}"
+
+                with ui.card().classes("w-full q-pa-md q-mb-md"):
+                    ui.label("Similar Substances / 相似物質").classes("text-h6")
+                    ui.label(
+                        "Nearest by normalized physico-chemical and ecotox profile / 依標準化物化性質與生態毒理輪廓排序"
+                    ).classes("text-caption text-grey-6 q-mb-md")
+                    table = create_substance_table(similar, name_field="name_with_chinese")
+                    table.columns = table.columns[:3] + [
+                        {"name": "distance", "label": "Distance / 距離", "field": "distance_display", "align": "right"},
+                        {"name": "shared", "label": "Shared Properties / 共同性質數", "field": "shared", "align": "right"},
+                    ] + table.columns[3:]
+
+
+def substance_name(display: Dict[str, str]) -> str:
+    """由顯示字串取得物質名稱（Active）；沒有名稱時為空字串"""
+    name = display["Active"]
+    return "" if name == "N/A" else name
+
+
+def display_field_value(display_field: DisplayField, display: str, show_metadata: bool = True):
     """顯示欄位（包含中文和資料來源資訊）
 
     Args:
-        db_field: 資料庫欄位名稱
-        value: 欄位值
+        display_field: 欄位登錄表中的欄位
+        display: 格式化完成的顯示字串（Ecotox 欄位含比較運算符與單位）
         show_metadata: 是否顯示資料來源資訊
-        details_dict: 包含完整資料的字典，用於取得比較運算符和單位（針對 Ecotox 欄位）
     """
-    global field_mapper
-    info = field_mapper.get_field_info(db_field)
+    info = display_field.info
 
     with ui.column().classes("q-mb-md"):
         # 顯示欄位標籤（中英文）
-        if info['zh']:
-            ui.label(f"{info['en']} / {info['zh']}").classes("text-body1 font-bold")
-        else:
-            ui.label(info['en']).classes("text-body1 font-bold")
+        ui.label(display_field.label).classes("text-body1 font-bold")
 
-        # 格式化值（特別處理 Ecotox 欄位）
-        display_value = format_ecotox_value(db_field, value, details_dict) if details_dict else str(value) if value not in [None, "", "nan"] else "N/A"
-        ui.label(display_value).classes("text-h6 q-ml-md")
+        ui.label(display).classes("text-h6 q-ml-md")
 
         # 顯示資料來源資訊（Sheet, Column）
         if show_metadata and info['sheet'] and info['column']:
@@ -748,87 +2680,9 @@ def display_field(db_field: str, value: Any, show_metadata: bool = True, details
                 ui.label(f"來源: {info['sheet']} 表，欄位 {info['column']}").classes("text-caption text-grey-6")
 
 
-def format_ecotox_value(db_field: str, value: Any, details_dict: Dict[str, Any]) -> str:
-    """格式化 Ecotox 值，包含比較運算符
-
-    針對 Terrestrial Ecotox 和 Aquatic Ecotox 欄位，格式化為：{比較運算符} {數值} {單位}
-    例如：> 150 mg/kg BW/day
-
-    根據 Excel 結構，比較運算符欄位的命名模式為：
-    - Terrestrial: Mammals__Acute_oral_LD50_mgkg_BWday -> __Mammals__Acute_oral_LD50
-    - Aquatic: Fish__Acute_96hr_LC50_mgl__TEMPERATE -> __Fish__Acute_96hr_LC50__TEMPERATE
-    """
-    if value in [None, "", "nan"]:
-        return "N/A"
-
-    # 從欄位名稱中提取單位（通常在最後的底線後面）
-    import re
-
-    # 提取單位資訊 - 通常在欄位名稱的最後部分
-    # 例如：mgkg_BWday, mgl, ug_per_bee
-    parts = db_field.split('_')
-    # 根據常見的單位模式來判斷
-    unit_patterns = {
-        'mgkg_BWday': 'mg/kg BW/day',
-        'mgkg': 'mg/kg',
-        'mgl': 'mg/l',
-        'ug_per_bee': 'μg/bee',
-        'days': 'days',
-        'mlg': 'mL/g',
-        'degC': '°C',
-        'Pam3mol': 'Pa m³/mol',
-        'mPa': 'mPa',
-    }
-
-    unit = ""
-    for pattern, unit_str in unit_patterns.items():
-        if pattern in db_field:
-            unit = unit_str
-            break
-
-    # 找到對應的比較運算符欄位
-    comparison_op = None
-
-    # 對於 Terrestrial_Ecotox
-    if "terrestrial_ecotox" in details_dict:
-        data = details_dict["terrestrial_ecotox"]
-        # 移除單位後綴來構造比較運算符欄位名稱
-        # 例如：Mammals__Acute_oral_LD50_mgkg_BWday -> __Mammals__Acute_oral_LD50
-        base_field = re.sub(r'_(mgkg_BWday|mgkg|mgl|ug_per_bee|days|mlg|degC)$', '', db_field)
-        comparison_field = f"__{base_field}"
-
-        if comparison_field in data:
-            comparison_op = data.get(comparison_field)
-
-    # 對於 Aquatic_Ecotox
-    if "aquatic_ecotox" in details_dict and not comparison_op:
-        data = details_dict["aquatic_ecotox"]
-        # Aquatic 欄位可能有 __TEMPERATE 或 __TROPICAL 後綴
-        base_field = re.sub(r'_(mgkg_BWday|mgkg|mgl|ug_per_bee|days|mlg|degC)(_[A-Z]+)?$', r'\2', db_field)
-        comparison_field = f"__{base_field}"
-
-        if comparison_field in data:
-            comparison_op = data.get(comparison_field)
-
-    # 組合顯示
-    if comparison_op and comparison_op not in [None, "", "nan"]:
-        if unit:
-            return f"{comparison_op} {value} {unit}".strip()
-        else:
-            return f"{comparison_op} {value}".strip()
-
-    # 如果沒有比較運算符，只顯示值
-    if unit:
-        return f"{value} {unit}".strip()
-    else:
-        return str(value)
-
-
 @ui.page("/compare")
-def compare_page():
+async def compare_page():
     """比對頁面"""
-    from nicegui import app
-    global comparison_lists
     ui.dark_mode().enable()
 
     with ui.header().classes("bg-primary text-white"):
@@ -839,351 +2693,369 @@ def compare_page():
                 ui.button("Search", on_click=lambda: ui.navigate.to("/search")).props("flat").classes("text-white")
                 ui.button("Compare", on_click=lambda: ui.navigate.to("/compare")).props("flat").classes("text-white")
 
-    with ui.column().classes("w-full q-pa-md"):
-        ui.label("Compare Substances").classes("text-h4 q-mb-md")
-
-        # 獲取當前用戶 ID（使用 app.storage.user，基於 cookies）
-        if 'user_id' not in app.storage.user:
-            app.storage.user['user_id'] = str(uuid.uuid4())
-
-        user_id = app.storage.user['user_id']
-        print(f"DEBUG compare_page: user_id = {user_id}")
-        print(f"DEBUG compare_page: All comparison_lists keys = {list(comparison_lists.keys())}")
-
-        # 從字典中取得該用戶的比對清單
-        selected_for_comparison = comparison_lists.get(user_id, [])
-        print(f"DEBUG compare_page: Found {len(selected_for_comparison)} items for user_id = {user_id}")
-        if selected_for_comparison:
-            print(f"DEBUG compare_page: Items = {[s['name'] for s in selected_for_comparison]}")
-
-        if not selected_for_comparison:
-            with ui.card().classes("w-full q-pa-lg text-center"):
-                ui.label("No substances selected for comparison").classes("text-h6 text-grey")
-                ui.label("Search for substances and click 'Add to Compare' to add them here").classes("text-grey q-mt-md")
-                ui.button("Go to Search", on_click=lambda: ui.navigate.to("/search"), icon="search").classes("q-mt-lg").props("color=primary size=lg")
-            return
+    # 查詢逾時或系統忙碌時只顯示通知
+    with notify_query_errors():
+        with ui.column().classes("w-full q-pa-md"):
+            ui.label("Compare Substances").classes("text-h4 q-mb-md")
 
-        # 顯示已選擇的物質
-        with ui.card().classes("w-full q-pa-md q-mb-md"):
-            ui.label(f"Selected Substances ({len(selected_for_comparison)}/8)").classes("text-h6 q-mb-md")
-            with ui.row().classes("w-full gap-2 flex-wrap"):
-                for i, substance in enumerate(selected_for_comparison):
-                    # 取得中文名稱
-                    chinese_name = db.get_chinese_name(substance["name"])
-                    if chinese_name:
-                        display_name = f"{substance['name']} ({chinese_name})"
-                    else:
-                        display_name = substance["name"]
+            user_id = comparison_user_id()
 
-                    # 不使用 removable=True，這樣就不會有刪除按鈕
-                    ui.chip(text=display_name).props("color=primary")
+            # 取得該用戶的比對清單（只存 ID，名稱由資料庫取得）
+            selected_ids = await async_comparison_store.get(user_id)
+            display_by_id = await async_db.get_display_values_many(selected_ids)
+            selected_for_comparison = [
+                {"id": i, "name": substance_name(display_by_id[i])} for i in selected_ids if i in display_by_id
+            ]
 
-            with ui.row().classes("gap-2 q-mt-md"):
-                ui.button("Export to Excel / 匯出 Excel", on_click=lambda: export_comparison_to_excel(), icon="download").props("color=positive")
-                ui.button("Clear All / 清除全部", on_click=lambda: clear_comparison(), icon="clear").props("flat color=negative")
+            if not selected_for_comparison:
+                with ui.card().classes("w-full q-pa-lg text-center"):
+                    ui.label("No substances selected for comparison").classes("text-h6 text-grey")
+                    ui.label("Search for substances and click 'Add to Compare' to add them here").classes("text-grey q-mt-md")
+                    ui.button("Go to Search", on_click=lambda: ui.navigate.to("/search"), icon="search").classes("q-mt-lg").props("color=primary size=lg")
+                return
 
-        # 比對表格
-        if len(selected_for_comparison) >= 2:
-            display_comparison_table()
-        else:
-            ui.label("Select at least 2 substances to compare").classes("text-grey q-mt-md")
+            # 顯示已選擇的物質
+            with ui.card().classes("w-full q-pa-md q-mb-md"):
+                ui.label(f"Selected Substances ({len(selected_for_comparison)}/{MAX_COMPARISON})").classes("text-h6 q-mb-md")
+                with ui.row().classes("w-full gap-2 flex-wrap"):
+                    chinese_names = await async_db.get_chinese_names([s["name"] for s in selected_for_comparison])
+                    for i, substance in enumerate(selected_for_comparison):
+                        # 取得中文名稱
+                        chinese_name = chinese_names.get(substance["name"])
+                        if chinese_name:
+                            display_name = f"{substance['name']} ({chinese_name})"
+                        else:
+                            display_name = substance["name"]
+
+                        # 不使用 removable=True，這樣就不會有刪除按鈕
+                        ui.chip(text=display_name).props("color=primary")
+
+                with ui.row().classes("gap-2 q-mt-md"):
+                    ui.button("Export to Excel / 匯出 Excel", on_click=export_comparison_to_excel, icon="download").props("color=positive")
+                    ui.button("Clear All / 清除全部", on_click=lambda: clear_comparison(), icon="clear").props("flat color=negative")
+
+            # 比對表格
+            if len(selected_for_comparison) >= 2:
+                await display_comparison_table()
+            else:
+                ui.label("Select at least 2 substances to compare").classes("text-grey q-mt-md")
 
 
-def clear_comparison():
+async def clear_comparison():
     """清除比對清單"""
-    from nicegui import app
-    global comparison_lists
 
-    # 獲取當前用戶 ID
-    if 'user_id' in app.storage.user:
-        user_id = app.storage.user['user_id']
-        if user_id in comparison_lists:
-            comparison_lists[user_id] = []
+    await async_comparison_store.clear(comparison_user_id())
 
     ui.navigate.to("/compare")
 
 
-def export_comparison_to_excel():
+async def export_comparison_to_excel():
     """匯出比對結果到 Excel"""
-    from nicegui import app
-    global field_mapper, comparison_lists
-
-    # 獲取當前用戶 ID
-    if 'user_id' not in app.storage.user:
-        ui.notify("錯誤：無法識別用戶 / Error: Cannot identify user", type="negative")
-        return
 
-    user_id = app.storage.user['user_id']
+    user_id = comparison_user_id()
 
-    # 從字典中取得該用戶的比對清單
-    selected_for_comparison = comparison_lists.get(user_id, [])
+    # 取得該用戶的比對清單
+    selected_ids = await async_comparison_store.get(user_id)
 
-    if len(selected_for_comparison) < 2:
+    if len(selected_ids) < 2:
         ui.notify("請至少選擇 2 個物質進行比對 / Please select at least 2 substances to compare", type="warning")
         return
 
-    # 取得詳細資料
-    details_list = []
-    for substance in selected_for_comparison:
-        details = db.get_substance_details(substance["id"])
-        if details:
-            details_list.append(details)
+    # 查詢逾時或系統忙碌時只顯示通知，不開始匯出
+    loaded = False
+    with notify_query_errors():
+        # 取得要比對的欄位值（一次批次查詢，只選取顯示欄位）
+        registry = await async_db.get_field_registry()
+        display_by_id = await async_db.get_display_values_many(selected_ids)
+        substances = [display_by_id[i] for i in selected_ids if i in display_by_id]
 
-    if not details_list:
-        ui.notify("無法載入物質資料 / Error loading substance details", type="negative")
+        if not substances:
+            ui.notify("無法載入物質資料 / Error loading substance details", type="negative")
+            return
+
+        # 一次取得所有物質的中文名稱
+        chinese_names = await async_db.get_chinese_names([substance_name(display) for display in substances])
+        loaded = True
+    if not loaded:
         return
 
-    # 定義要比對的欄位（與顯示相同）
-    comparison_fields = [
-        # 基本資訊
-        ("Active", lambda d: d["identification"].get("Active"), "一般資料", False),
-        ("CAS_RN", lambda d: d["identification"].get("CAS_RN"), "一般資料", False),
-        ("Availability_status", lambda d: d["identification"].get("Availability_status"), "一般資料", False),
-        ("Isomerism", lambda d: d["identification"].get("Isomerism"), "一般資料", False),
-        ("Chemical_formula", lambda d: d["identification"].get("Chemical_formula"), "一般資料", False),
-        ("Canonical_SMILES", lambda d: d["identification"].get("Canonical_SMILES"), "一般資料", False),
-        ("Isomeric_SMILES", lambda d: d["identification"].get("Isomeric_SMILES"), "一般資料", False),
-        ("International_Chemical_Identifier_InChI", lambda d: d["identification"].get("International_Chemical_Identifier_InChI"), "一般資料", False),
-        ("International_Chemical_Identifier_key_InChIKey", lambda d: d["identification"].get("International_Chemical_Identifier_key_InChIKey"), "一般資料", False),
-        ("Molecular_mass", lambda d: d["identification"].get("Molecular_mass"), "一般資料", False),
-        ("Pesticide_type", lambda d: d["identification"].get("Pesticide_type"), "一般資料", False),
-        ("Substance_group", lambda d: d["identification"].get("Substance_group"), "一般資料", False),
-        ("Mode_of_action", lambda d: d["identification"].get("Mode_of_action"), "一般資料", False),
-
-        # 環境命運
-        ("Solubility__In_water_at_20_degC_mgl", lambda d: d["fate"].get("Solubility__In_water_at_20_degC_mgl"), "環境命運", False),
-        ("Melting_point_degC", lambda d: d["fate"].get("Melting_point_degC"), "環境命運", False),
-        ("Boiling_point_deg_C_1atm", lambda d: d["fate"].get("Boiling_point_deg_C_1atm"), "環境命運", False),
-        ("LogP", lambda d: d["fate"].get("LogP"), "環境命運", False),
-        ("Dissociation_constant_pKa_at_25_degC", lambda d: d["fate"].get("Dissociation_constant_pKa_at_25_degC"), "環境命運", False),
-        ("Vapour_pressure_at_20_degC_mPa", lambda d: d["fate"].get("Vapour_pressure_at_20_degC_mPa"), "環境命運", False),
-        ("Henrys_law_constant_at_25_degC_Pam3mol", lambda d: d["fate"].get("Henrys_law_constant_at_25_degC_Pam3mol"), "環境命運", False),
-        ("Soil_DT50__Typical_days", lambda d: d["fate"].get("Soil_DT50__Typical_days"), "環境命運", False),
-        ("Soil_DT50__Lab_days", lambda d: d["fate"].get("Soil_DT50__Lab_days"), "環境命運", False),
-        ("Soil_DT50__Field_days", lambda d: d["fate"].get("Soil_DT50__Field_days"), "環境命運", False),
-        ("Watersediment_DT50_days", lambda d: d["fate"].get("Watersediment_DT50_days"), "環境命運", False),
-        ("Koc_mlg", lambda d: d["fate"].get("Koc_mlg"), "環境命運", False),
-        ("Kfoc_mlg", lambda d: d["fate"].get("Kfoc_mlg"), "環境命運", False),
-        ("Bioconcentration_factor", lambda d: d["fate"].get("Bioconcentration_factor"), "環境命運", False),
-
-        # 陸生生態毒理
-        ("Mammals__Acute_oral_LD50_mgkg_BWday", lambda d: d["terrestrial_ecotox"].get("Mammals__Acute_oral_LD50_mgkg_BWday"), "陸生生態毒理", True),
-        ("Birds__Acute_LD50_mgkg", lambda d: d["terrestrial_ecotox"].get("Birds__Acute_LD50_mgkg"), "陸生生態毒理", True),
-        ("Earthworms__Acute_14d_LC50_mgkg", lambda d: d["terrestrial_ecotox"].get("Earthworms__Acute_14d_LC50_mgkg"), "陸生生態毒理", True),
-        ("Honeybees__Contact_acute_48hr_LD50_ug_per_bee", lambda d: d["terrestrial_ecotox"].get("Honeybees__Contact_acute_48hr_LD50_ug_per_bee"), "陸生生態毒理", True),
-
-        # 水生生態毒理
-        ("Fish__Acute_96hr_LC50_mgl__TEMPERATE", lambda d: d["aquatic_ecotox"].get("Fish__Acute_96hr_LC50_mgl__TEMPERATE"), "水生生態毒理", True),
-        ("Algae__Acute_72hr_EC50_growth_mgl", lambda d: d["aquatic_ecotox"].get("Algae__Acute_72hr_EC50_growth_mgl"), "水生生態毒理", True),
-
-        # 人體健康
-        ("Mammals__Dermal_LD50_mgkg", lambda d: d["human"].get("Mammals__Dermal_LD50_mgkg"), "人體健康", False),
-        ("Mammals__Inhalation_LC50_mgl", lambda d: d["human"].get("Mammals__Inhalation_LC50_mgl"), "人體健康", False),
-        ("Acceptable_Daily_Intake_ADI_mgkg_bw", lambda d: d["human"].get("Acceptable_Daily_Intake_ADI_mgkg_bw"), "人體健康", False),
-        ("Acute_Reference_Dose_ARfD_mgkg_BWday", lambda d: d["human"].get("Acute_Reference_Dose_ARfD_mgkg_BWday"), "人體健康", False),
-        ("Acceptable_Operator_Exposure_Level_AOEL_systemic", lambda d: d["human"].get("Acceptable_Operator_Exposure_Level_AOEL_systemic"), "人體健康", False),
-        ("Percutaneous_penetration_studies_", lambda d: d["human"].get("Percutaneous_penetration_studies_"), "人體健康", False),
-        ("Carcinogen", lambda d: d["human"].get("Carcinogen"), "人體健康", False),
-        ("Genotoxic", lambda d: d["human"].get("Genotoxic"), "人體健康", False),
-        ("Endocrine_distrupter", lambda d: d["human"].get("Endocrine_distrupter"), "人體健康", False),
-        ("Reproductiondevelopment_effects", lambda d: d["human"].get("Reproductiondevelopment_effects"), "人體健康", False),
-        ("Acetyl_cholinesterase_inhibitor", lambda d: d["human"].get("Acetyl_cholinesterase_inhibitor"), "人體健康", False),
-        ("Neurotoxicant", lambda d: d["human"].get("Neurotoxicant"), "人體健康", False),
-        ("Respiratory_tract_irritant", lambda d: d["human"].get("Respiratory_tract_irritant"), "人體健康", False),
-        ("Skin_irritant", lambda d: d["human"].get("Skin_irritant"), "人體健康", False),
-        ("Skin_sensitiser", lambda d: d["human"].get("Skin_sensitiser"), "人體健康", False),
-        ("Eye_irritant", lambda d: d["human"].get("Eye_irritant"), "人體健康", False),
-        ("Phototoxicant", lambda d: d["human"].get("Phototoxicant"), "人體健康", False),
-        ("General_human_health_issues", lambda d: d["human"].get("General_human_health_issues"), "人體健康", False),
-        ("Handling_issues", lambda d: d["human"].get("Handling_issues"), "人體健康", False),
-    ]
+    # 產生檔案名稱
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = f"PPDB_Comparison_{timestamp}.xlsx"
 
-    # 建立資料結構
-    data = []
+    # 在背景執行緒寫出 Excel，期間以進度條與目前階段顯示進度，事件迴圈與其他使用者不受影響
+    progress = {"done": 0, "total": 0, "stage": ""}
+    with ui.dialog().props("persistent") as dialog, ui.card().classes("q-pa-md").style("min-width: 320px"):
+        ui.label("匯出中 / Exporting...").classes("text-subtitle1")
+        progress_bar = ui.linear_progress(value=0, show_value=False).classes("q-mt-sm")
+        stage_label = ui.label().classes("text-caption text-grey-6")
+    dialog.open()
 
-    for db_field, value_getter, category, is_ecotox in comparison_fields:
-        field_info = field_mapper.get_field_info(db_field)
+    def update_progress():
+        progress_bar.set_value(progress["done"] / max(progress["total"], 1))
+        stage_label.set_text(EXPORT_STAGE_LABELS.get(progress["stage"], ""))
 
-        row = {
-            "Category / 類別": category,
-            "Field (EN) / 欄位(英文)": field_info['en'],
-            "Field (ZH) / 欄位(中文)": field_info['zh'],
-        }
+    timer = ui.timer(0.2, update_progress)
 
-        # 為每個物質添加值
-        for i, details in enumerate(details_list):
-            substance_name = details["identification"].get("Active", f"#{i+1}")
-            chinese_name = db.get_chinese_name(substance_name)
-            if chinese_name:
-                col_name = f"{substance_name} ({chinese_name})"
-            else:
-                col_name = substance_name
+    try:
+        content = await run.io_bound(
+            write_comparison_workbook, registry.fields, substances, chinese_names, progress
+        )
+    except Exception as e:
+        ui.notify(f"匯出失敗 / Export failed: {e}", type="negative")
+        return
+    finally:
+        timer.cancel()
+        dialog.close()
 
-            value = value_getter(details)
+    # 提供下載
+    ui.download(content, filename)
+    ui.notify(f"已匯出比對結果 / Comparison exported: {filename}", type="positive")
 
-            # 如果是 Ecotox 欄位，使用特殊格式化
-            if is_ecotox and value not in [None, "", "nan"]:
-                display_value = format_ecotox_value(db_field, value, details)
-            else:
-                display_value = str(value) if value not in [None, "", "nan"] else "N/A"
 
-            row[col_name] = display_value
+# 匯出進度的階段標籤
+EXPORT_STAGE_LABELS = {
+    "prepare": "整理資料 / Preparing rows",
+    "write": "寫入工作表 / Writing sheet",
+    "save": "儲存檔案 / Saving workbook",
+}
 
-        data.append(row)
 
-    # 建立 DataFrame，並清理可能造成問題的字元
-    df = pd.DataFrame(data)
+def write_comparison_workbook(
+    fields: List[DisplayField],
+    substances: List[Dict[str, str]],
+    chinese_names: Dict[str, str],
+    progress: Optional[Dict[str, Any]] = None,
+) -> bytes:
+    """以 openpyxl write-only 模式寫出比對結果，回傳 .xlsx 內容
 
-    # 將所有資料轉換為字串，避免公式注入問題
-    for col in df.columns:
-        df[col] = df[col].apply(lambda x: str(x) if pd.notna(x) else "")
-        # 如果儲存格以 =, +, -, @ 開頭，在前面加上單引號以避免被解釋為公式
-        df[col] = df[col].apply(lambda x: f"'{x}" if x and str(x)[0] in ['=', '+', '-', '@'] else x)
+    substances 為各物質的 {欄位: 顯示字串}（PPDBDatabase.get_display_values_many 的結果）。
+    在背景執行緒執行：每個欄位一列，由 write_worksheet 整理後逐列寫出。
+    progress 的 total 為「整理 + 寫入每一列各一步，加上儲存一步」，done 與 stage 隨實際寫出的進度更新。
+    """
+    from openpyxl import Workbook
+
+    # 欄位標題：固定的三欄加上每個物質一欄（名稱重複時與 pandas 相同，後者覆蓋前者）
+    substance_columns = {}
+    for i, display in enumerate(substances):
+        name = substance_name(display) or f"#{i+1}"
+        chinese_name = chinese_names.get(name)
+        col_name = f"{name} ({chinese_name})" if chinese_name else name
+        substance_columns[col_name] = i
+    headers = ["Category / 類別", "Field (EN) / 欄位(英文)", "Field (ZH) / 欄位(中文)", *substance_columns]
+
+    # 每個物質一欄的值（Ecotox 欄位含比較運算符與單位）
+    rows = (
+        [
+            display_field.section.category, display_field.info['en'], display_field.info['zh'],
+            *(substances[i][display_field.key] for i in substance_columns.values()),
+        ]
+        for display_field in fields
+    )
 
-    # 建立 Excel 檔案
+    if progress is not None:
+        progress["total"] = 2 * len(fields) + 1
+    workbook = Workbook(write_only=True)
+    write_worksheet(workbook, "Comparison", headers, rows, progress)
+    if progress is not None:
+        progress["stage"] = "save"
     output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Comparison')
-
-        # 自動調整欄寬
-        worksheet = writer.sheets['Comparison']
-        for column in worksheet.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    cell_value = str(cell.value) if cell.value is not None else ""
-                    if len(cell_value) > max_length:
-                        max_length = len(cell_value)
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            worksheet.column_dimensions[column_letter].width = adjusted_width
-
-        # 設定所有儲存格為文字格式
-        from openpyxl.styles import Alignment
-        for row in worksheet.iter_rows(min_row=2, max_row=worksheet.max_row, min_col=1, max_col=worksheet.max_column):
-            for cell in row:
-                cell.alignment = Alignment(wrap_text=False, vertical='top')
-
-    output.seek(0)
+    workbook.save(output)
+    if progress is not None:
+        progress["done"] += 1
+    return output.getvalue()
 
-    # 產生檔案名稱
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"PPDB_Comparison_{timestamp}.xlsx"
 
-    # 提供下載
-    ui.download(output.getvalue(), filename)
-    ui.notify(f"已匯出比對結果 / Comparison exported: {filename}", type="positive")
+def write_worksheet(
+    workbook, title: str, headers: List[str], rows: Iterable[List[Any]], progress: Optional[Dict[str, Any]] = None
+):
+    """在 write-only 活頁簿中新增工作表並寫入標題列與資料列
 
+    值全部轉為字串；以 =, +, -, @ 開頭的值加上單引號，避免被解釋為公式。
+    write-only 模式下欄寬須在寫入任何列之前設定，因此先以一次走訪同時轉換每個值並計算欄寬，再逐列寫出；
+    有 progress 時整理與寫出每一列各使 progress["done"] 加一，並更新 progress["stage"]。
+    """
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Alignment, Font
+    from openpyxl.utils import get_column_letter
+
+    if progress is not None:
+        progress["stage"] = "prepare"
+    widths = [len(header) for header in headers]
+    prepared = []
+    for row in rows:
+        values = []
+        for column, value in enumerate(row):
+            text = "" if value is None else str(value)
+            if text and text[0] in "=+-@":
+                text = f"'{text}"
+            widths[column] = max(widths[column], len(text))
+            values.append(text)
+        prepared.append(values)
+        if progress is not None:
+            progress["done"] += 1
+
+    worksheet = workbook.create_sheet(title)
+    for column, width in enumerate(widths, start=1):
+        worksheet.column_dimensions[get_column_letter(column)].width = min(width + 2, 50)
+
+    header_font = Font(bold=True)
+    header_cells = []
+    for header in headers:
+        cell = WriteOnlyCell(worksheet, value=header)
+        cell.font = header_font
+        header_cells.append(cell)
+    worksheet.append(header_cells)
+
+    if progress is not None:
+        progress["stage"] = "write"
+    alignment = Alignment(wrap_text=False, vertical='top')
+    for values in prepared:
+        cells = []
+        for value in values:
+            cell = WriteOnlyCell(worksheet, value=value)
+            cell.alignment = alignment
+            cells.append(cell)
+        worksheet.append(cells)
+        if progress is not None:
+            progress["done"] += 1
+
+
+# 批次查詢一次最多處理的識別碼數
+MAX_BULK_IDENTIFIERS = 20000
+
+# 猜測識別碼欄位時依序比對的標題關鍵字
+IDENTIFIER_HEADER_KEYWORDS = ("cas", "inchikey", "英文名稱", "name", "active", "中文名稱", "名稱")
+
+
+def read_identifier_table(content: bytes, filename: str) -> Tuple[List[str], List[List[str]]]:
+    """讀取上傳的 CSV / XLSX 第一個工作表，回傳 (欄位標題, 資料列)；第一列非空白列視為標題"""
+    if filename.lower().endswith((".xlsx", ".xlsm")):
+        from openpyxl import load_workbook
 
-def display_comparison_table():
-    """顯示比對表格"""
-    from nicegui import app
-    global field_mapper, comparison_lists
+        try:
+            workbook = load_workbook(BytesIO(content), read_only=True, data_only=True)
+        except Exception as e:
+            raise ValueError(f"無法讀取 Excel 檔案 / Cannot read workbook: {e}") from e
+        try:
+            table = [
+                ["" if value is None else str(value) for value in row]
+                for row in workbook.worksheets[0].iter_rows(values_only=True)
+            ]
+        finally:
+            workbook.close()
+    elif filename.lower().endswith((".csv", ".txt")):
+        import csv
+
+        for encoding in ("utf-8-sig", "cp950"):
+            try:
+                text = content.decode(encoding)
+                break
+            except UnicodeDecodeError:
+                continue
+        else:
+            raise ValueError("無法辨識 CSV 編碼 / Unsupported CSV encoding (use UTF-8 or Big5)")
+        table = list(csv.reader(text.splitlines()))
+    else:
+        raise ValueError("只支援 CSV 或 XLSX 檔案 / Only CSV or XLSX files are supported")
+
+    table = [row for row in table if any(value.strip() for value in row)]
+    if not table:
+        raise ValueError("檔案沒有資料 / The file is empty")
+    headers = [value.strip() or f"Column {i + 1}" for i, value in enumerate(table[0])]
+    return headers, table[1:]
+
+
+def identifier_column(headers: List[str], column: Optional[str] = None) -> int:
+    """識別碼欄位的索引：column 為標題或從 1 開始的欄號；未指定時依 IDENTIFIER_HEADER_KEYWORDS 猜測，否則用第一欄"""
+    if column:
+        column = column.strip()
+        if column in headers:
+            return headers.index(column)
+        if column.isdigit() and 1 <= int(column) <= len(headers):
+            return int(column) - 1
+        raise ValueError(f"找不到欄位 / Column not found: {column}")
+    for keyword in IDENTIFIER_HEADER_KEYWORDS:
+        for i, header in enumerate(headers):
+            if keyword in header.lower():
+                return i
+    return 0
+
+
+def identifier_values(headers: List[str], rows: List[List[str]], column: int) -> List[str]:
+    """取出指定欄位的非空白值；超過 MAX_BULK_IDENTIFIERS 筆時拋出 ValueError"""
+    values = [row[column] for row in rows if column < len(row) and row[column].strip()]
+    if len(values) > MAX_BULK_IDENTIFIERS:
+        raise ValueError(f"一次最多 {MAX_BULK_IDENTIFIERS} 筆 / At most {MAX_BULK_IDENTIFIERS} identifiers per request")
+    return values
+
+
+def write_resolve_workbook(fields: List[DisplayField], matched: List[Dict[str, Any]], unmatched: List[str]) -> bytes:
+    """寫出批次查詢結果：Matched 工作表每列一個比對到的物質（含所有顯示欄位），Unmatched 工作表列出找不到的輸入"""
+    from openpyxl import Workbook
+
+    fields = [display_field for display_field in fields if display_field.key != "Active"]
+    headers = [
+        "Input / 輸入", "Matched By / 比對方式", "ID", "Substance / 物質", "Chinese Name / 中文名稱",
+        *(display_field.label for display_field in fields),
+    ]
+    rows = (
+        [
+            match["input"], match["matched_by"], match["id"], match["name"], match["chinese_name"],
+            *(match["fields"][display_field.key] for display_field in fields),
+        ]
+        for match in matched
+    )
 
-    # 獲取當前用戶 ID
-    if 'user_id' not in app.storage.user:
-        ui.label("錯誤：無法識別用戶 / Error: Cannot identify user").classes("text-negative")
-        return
+    workbook = Workbook(write_only=True)
+    write_worksheet(workbook, "Matched", headers, rows)
+    write_worksheet(workbook, "Unmatched", ["Input / 輸入"], ([identifier] for identifier in unmatched))
+    output = BytesIO()
+    workbook.save(output)
+    return output.getvalue()
 
-    user_id = app.storage.user['user_id']
 
-    # 從字典中取得該用戶的比對清單
-    selected_for_comparison = comparison_lists.get(user_id, [])
+async def display_comparison_table():
+    """顯示比對表格"""
+
+    user_id = comparison_user_id()
+
+    # 取得該用戶的比對清單
+    selected_ids = await async_comparison_store.get(user_id)
 
     with ui.card().classes("w-full q-pa-md"):
         ui.label("Comparison Table / 比對表格").classes("text-h6 q-mb-md")
 
-        # 取得詳細資料
-        details_list = []
-        for substance in selected_for_comparison:
-            details = db.get_substance_details(substance["id"])
-            if details:
-                details_list.append(details)
+        # 取得要比對的欄位值（一次批次查詢，只選取顯示欄位）
+        registry = await async_db.get_field_registry()
+        display_by_id = await async_db.get_display_values_many(selected_ids)
+        substances = [display_by_id[i] for i in selected_ids if i in display_by_id]
 
-        if not details_list:
+        if not substances:
             ui.label("Error loading substance details").classes("text-negative")
             return
 
-        # 定義要比對的欄位（使用資料庫欄位名稱）
-        # 格式：(資料庫欄位名, 取值函數, 分類, 是否為Ecotox欄位)
-        comparison_fields = [
-            # 基本資訊
-            ("Active", lambda d: d["identification"].get("Active"), "一般資料", False),
-            ("CAS_RN", lambda d: d["identification"].get("CAS_RN"), "一般資料", False),
-            ("Availability_status", lambda d: d["identification"].get("Availability_status"), "一般資料", False),
-            ("Isomerism", lambda d: d["identification"].get("Isomerism"), "一般資料", False),
-            ("Chemical_formula", lambda d: d["identification"].get("Chemical_formula"), "一般資料", False),
-            ("Canonical_SMILES", lambda d: d["identification"].get("Canonical_SMILES"), "一般資料", False),
-            ("Isomeric_SMILES", lambda d: d["identification"].get("Isomeric_SMILES"), "一般資料", False),
-            ("International_Chemical_Identifier_InChI", lambda d: d["identification"].get("International_Chemical_Identifier_InChI"), "一般資料", False),
-            ("International_Chemical_Identifier_key_InChIKey", lambda d: d["identification"].get("International_Chemical_Identifier_key_InChIKey"), "一般資料", False),
-            ("Molecular_mass", lambda d: d["identification"].get("Molecular_mass"), "一般資料", False),
-            ("Pesticide_type", lambda d: d["identification"].get("Pesticide_type"), "一般資料", False),
-            ("Substance_group", lambda d: d["identification"].get("Substance_group"), "一般資料", False),
-            ("Mode_of_action", lambda d: d["identification"].get("Mode_of_action"), "一般資料", False),
-
-            # 環境命運
-            ("Solubility__In_water_at_20_degC_mgl", lambda d: d["fate"].get("Solubility__In_water_at_20_degC_mgl"), "環境命運", False),
-            ("Melting_point_degC", lambda d: d["fate"].get("Melting_point_degC"), "環境命運", False),
-            ("Boiling_point_deg_C_1atm", lambda d: d["fate"].get("Boiling_point_deg_C_1atm"), "環境命運", False),
-            ("LogP", lambda d: d["fate"].get("LogP"), "環境命運", False),
-            ("Dissociation_constant_pKa_at_25_degC", lambda d: d["fate"].get("Dissociation_constant_pKa_at_25_degC"), "環境命運", False),
-            ("Vapour_pressure_at_20_degC_mPa", lambda d: d["fate"].get("Vapour_pressure_at_20_degC_mPa"), "環境命運", False),
-            ("Henrys_law_constant_at_25_degC_Pam3mol", lambda d: d["fate"].get("Henrys_law_constant_at_25_degC_Pam3mol"), "環境命運", False),
-            ("Soil_DT50__Typical_days", lambda d: d["fate"].get("Soil_DT50__Typical_days"), "環境命運", False),
-            ("Soil_DT50__Lab_days", lambda d: d["fate"].get("Soil_DT50__Lab_days"), "環境命運", False),
-            ("Soil_DT50__Field_days", lambda d: d["fate"].get("Soil_DT50__Field_days"), "環境命運", False),
-            ("Watersediment_DT50_days", lambda d: d["fate"].get("Watersediment_DT50_days"), "環境命運", False),
-            ("Koc_mlg", lambda d: d["fate"].get("Koc_mlg"), "環境命運", False),
-            ("Kfoc_mlg", lambda d: d["fate"].get("Kfoc_mlg"), "環境命運", False),
-            ("Bioconcentration_factor", lambda d: d["fate"].get("Bioconcentration_factor"), "環境命運", False),
-
-            # 陸生生態毒理
-            ("Mammals__Acute_oral_LD50_mgkg_BWday", lambda d: d["terrestrial_ecotox"].get("Mammals__Acute_oral_LD50_mgkg_BWday"), "陸生生態毒理", True),
-            ("Birds__Acute_LD50_mgkg", lambda d: d["terrestrial_ecotox"].get("Birds__Acute_LD50_mgkg"), "陸生生態毒理", True),
-            ("Earthworms__Acute_14d_LC50_mgkg", lambda d: d["terrestrial_ecotox"].get("Earthworms__Acute_14d_LC50_mgkg"), "陸生生態毒理", True),
-            ("Honeybees__Contact_acute_48hr_LD50_ug_per_bee", lambda d: d["terrestrial_ecotox"].get("Honeybees__Contact_acute_48hr_LD50_ug_per_bee"), "陸生生態毒理", True),
-
-            # 水生生態毒理
-            ("Fish__Acute_96hr_LC50_mgl__TEMPERATE", lambda d: d["aquatic_ecotox"].get("Fish__Acute_96hr_LC50_mgl__TEMPERATE"), "水生生態毒理", True),
-            ("Algae__Acute_72hr_EC50_growth_mgl", lambda d: d["aquatic_ecotox"].get("Algae__Acute_72hr_EC50_growth_mgl"), "水生生態毒理", True),
-
-            # 人體健康
-            ("Mammals__Dermal_LD50_mgkg", lambda d: d["human"].get("Mammals__Dermal_LD50_mgkg"), "人體健康", False),
-            ("Mammals__Inhalation_LC50_mgl", lambda d: d["human"].get("Mammals__Inhalation_LC50_mgl"), "人體健康", False),
-            ("Acceptable_Daily_Intake_ADI_mgkg_bw", lambda d: d["human"].get("Acceptable_Daily_Intake_ADI_mgkg_bw"), "人體健康", False),
-            ("Acute_Reference_Dose_ARfD_mgkg_BWday", lambda d: d["human"].get("Acute_Reference_Dose_ARfD_mgkg_BWday"), "人體健康", False),
-            ("Acceptable_Operator_Exposure_Level_AOEL_systemic", lambda d: d["human"].get("Acceptable_Operator_Exposure_Level_AOEL_systemic"), "人體健康", False),
-            ("Percutaneous_penetration_studies_", lambda d: d["human"].get("Percutaneous_penetration_studies_"), "人體健康", False),
-            ("Carcinogen", lambda d: d["human"].get("Carcinogen"), "人體健康", False),
-            ("Genotoxic", lambda d: d["human"].get("Genotoxic"), "人體健康", False),
-            ("Endocrine_distrupter", lambda d: d["human"].get("Endocrine_distrupter"), "人體健康", False),
-            ("Reproductiondevelopment_effects", lambda d: d["human"].get("Reproductiondevelopment_effects"), "人體健康", False),
-            ("Acetyl_cholinesterase_inhibitor", lambda d: d["human"].get("Acetyl_cholinesterase_inhibitor"), "人體健康", False),
-            ("Neurotoxicant", lambda d: d["human"].get("Neurotoxicant"), "人體健康", False),
-            ("Respiratory_tract_irritant", lambda d: d["human"].get("Respiratory_tract_irritant"), "人體健康", False),
-            ("Skin_irritant", lambda d: d["human"].get("Skin_irritant"), "人體健康", False),
-            ("Skin_sensitiser", lambda d: d["human"].get("Skin_sensitiser"), "人體健康", False),
-            ("Eye_irritant", lambda d: d["human"].get("Eye_irritant"), "人體健康", False),
-            ("Phototoxicant", lambda d: d["human"].get("Phototoxicant"), "人體健康", False),
-            ("General_human_health_issues", lambda d: d["human"].get("General_human_health_issues"), "人體健康", False),
-            ("Handling_issues", lambda d: d["human"].get("Handling_issues"), "人體健康", False),
-        ]
+        # 一次取得所有物質的中文名稱
+        chinese_names = await async_db.get_chinese_names([substance_name(display) for display in substances])
+
+        # 取得物質名稱（英文和中文）
+        substance_names = []
+        for i, display in enumerate(substances):
+            name = substance_name(display) or f"#{i+1}"
+            chinese_name = chinese_names.get(name)
+            substance_names.append(f"{name} ({chinese_name})" if chinese_name else name)
 
         # 按類別分組顯示
         current_category = None
 
-        for db_field, value_getter, category, is_ecotox in comparison_fields:
+        for display_field in registry.fields:
             # 如果是新類別，顯示類別標題
-            if category != current_category:
-                current_category = category
+            if display_field.section.category != current_category:
+                current_category = display_field.section.category
                 ui.separator().classes("q-my-md")
-                ui.label(category).classes("text-h6 text-primary q-mb-sm")
+                ui.label(current_category).classes("text-h6 text-primary q-mb-sm")
 
-            # 取得欄位資訊
-            field_info = field_mapper.get_field_info(db_field)
+            field_info = display_field.info
 
             # 建立該欄位的比對行
             with ui.row().classes("w-full q-mb-md items-start"):
@@ -1202,37 +3074,23 @@ def display_comparison_table():
                             ui.icon("info", size="xs").classes("text-grey-6")
                             ui.label(f"{field_info['sheet']}:{field_info['column']}").classes("text-caption text-grey-6")
 
-                # 右側：各物質的值（橫向排列）
+                # 右側：各物質的值（橫向排列；Ecotox 欄位含比較運算符與單位）
                 with ui.row().classes("flex-grow gap-4 flex-wrap"):
-                    for i, details in enumerate(details_list):
-                        value = value_getter(details)
-
-                        # 如果是 Ecotox 欄位，使用特殊格式化
-                        if is_ecotox and value not in [None, "", "nan"]:
-                            display_value = format_ecotox_value(db_field, value, details)
-                        else:
-                            display_value = str(value) if value not in [None, "", "nan"] else "N/A"
-
-                        # 取得物質名稱（英文和中文）
-                        substance_name = details["identification"].get("Active", f"#{i+1}")
-                        chinese_name = db.get_chinese_name(substance_name)
-                        if chinese_name:
-                            substance_display = f"{substance_name} ({chinese_name})"
-                        else:
-                            substance_display = substance_name
-
+                    for substance_display, display in zip(substance_names, substances):
                         with ui.card().classes("q-pa-sm").style("min-width: 150px"):
                             ui.label(substance_display).classes("text-caption text-grey-7")
-                            ui.label(display_value).classes("text-body1")
+                            ui.label(display[display_field.key]).classes("text-body1")
 
 
 def main():
     """主程式進入點"""
     import os
     port = int(os.environ.get("PORT", 8080))
-    # storage_secret 用於加密 app.storage.user 的 cookies
+    # storage_secret 用於簽章 session cookie（比對清單以其中的瀏覽器 ID 為鍵）
     # 在生產環境中，應該使用環境變量設置一個安全的隨機字符串
     storage_secret = os.environ.get("STORAGE_SECRET", "ppdb-default-secret-change-in-production")
+    # 定期檢查 database.db 是否被重新建置，不需重啟即可切換到新資料
+    db.start_watcher()
     ui.run(
         title="PPDB - Pesticide Properties Database",
         host='0.0.0.0',
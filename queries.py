@@ -0,0 +1,224 @@
+"""main.py 每個請求執行的 SQL 查詢
+
+convert_to_db.py 建置完成後以同一組查詢產生查詢計畫報告（print_query_plan_report），
+main.py 改寫查詢時報告也跟著更新，查詢退化成全表掃描或另外排序時會在建置時被報告出來。
+"""
+
+from typing import List
+
+# 列表、搜尋結果共用的物質欄位（Identification 的別名為 i）
+SUBSTANCE_COLUMNS = """
+    i.ID as id,
+    i.Active as name,
+    i.CAS_RN as cas_rn,
+    i.Availability_status as status,
+    i.Canonical_SMILES as smiles
+"""
+
+# 所有物質列表：從 (名稱, ID) 鍵（含）開始取 LIMIT 筆，在 idx_identification_active 上定位
+KEYSET_PAGE = """
+    SELECT
+        ID as id,
+        Active as name,
+        CAS_RN as cas_rn,
+        Availability_status as status
+    FROM Identification
+    WHERE Active IS NOT NULL AND Active != ''
+        AND Active COLLATE NOCASE >= ?
+        AND (Active COLLATE NOCASE > ? OR ID >= ?)
+    ORDER BY Active COLLATE NOCASE, ID
+    LIMIT ?
+"""
+
+# 每一頁第一筆的排序鍵；每個資料庫版本只執行一次（依索引順序讀完整個索引）
+PAGE_ANCHORS = """
+    SELECT Active, ID
+    FROM Identification
+    WHERE Active IS NOT NULL AND Active != ''
+    ORDER BY Active COLLATE NOCASE, ID
+"""
+
+# 第一個名稱不小於前綴（不分大小寫）的物質
+PREFIX_LOOKUP = """
+    SELECT Active, ID
+    FROM Identification
+    WHERE Active IS NOT NULL AND Active != ''
+        AND Active COLLATE NOCASE >= ?
+    ORDER BY Active COLLATE NOCASE, ID
+    LIMIT 1
+"""
+
+# 排在 (名稱, ID) 之前的物質數（只讀取覆蓋索引的一段範圍）
+PREFIX_COUNT = """
+    SELECT COUNT(*)
+    FROM Identification
+    WHERE Active IS NOT NULL AND Active != ''
+        AND Active COLLATE NOCASE <= ?
+        AND (Active COLLATE NOCASE < ? OR ID < ?)
+"""
+
+# 屬性篩選的比較運算符 -> 條件（資料值本身也帶有運算符，例如 "> 1000"，只回傳確定符合條件的物質）
+PROPERTY_FILTER_CONDITIONS = {
+    ">": "value >= ? AND (value > ? OR operator = '>') AND operator IN ('=', '~', '>', '>=')",
+    ">=": "value >= ? AND value >= ? AND operator IN ('=', '~', '>', '>=')",
+    "<": "value <= ? AND (value < ? OR operator = '<') AND operator IN ('=', '~', '<', '<=')",
+    "<=": "value <= ? AND value <= ? AND operator IN ('=', '~', '<', '<=')",
+    "=": "value = ? AND value = ? AND operator IN ('=', '~')",
+}
+
+
+def placeholders(count: int) -> str:
+    """IN 條件的 ? 佔位符"""
+    return ",".join("?" * count)
+
+
+def existing_ids(count: int) -> str:
+    """count 個 ID 中存在於 Identification 的 ID"""
+    return f"SELECT ID FROM Identification WHERE ID IN ({placeholders(count)})"
+
+
+def display_values(count: int) -> str:
+    """count 個物質預先格式化的顯示字串（Display_Values 主鍵 (ID, field) 上的範圍讀取）"""
+    return f"SELECT ID, field, display FROM Display_Values WHERE ID IN ({placeholders(count)})"
+
+
+def field_values(table: str, columns: List[str], count: int) -> str:
+    """count 個物質在一個工作表中要顯示的欄位（只選取登錄表投影出的欄位）"""
+    selected = ", ".join(f'"{column}"' for column in columns)
+    return f'SELECT ID, {selected} FROM "{table}" WHERE ID IN ({placeholders(count)})'
+
+
+def aliases(count: int) -> str:
+    """count 個物質的別名"""
+    return f"SELECT ID, Alias FROM Aliases WHERE ID IN ({placeholders(count)})"
+
+
+def families(count: int) -> str:
+    """count 個物質所屬家族的所有成員，母體排在最前面"""
+    return f"""
+        SELECT
+            f1.ID as member_of,
+            {SUBSTANCE_COLUMNS},
+            f2.relation as relation
+        FROM Substance_Families f1
+        JOIN Substance_Families f2 ON f2.family_id = f1.family_id
+        JOIN Identification i ON i.ID = f2.ID
+        WHERE f1.ID IN ({placeholders(count)})
+        ORDER BY f1.ID, f2.relation != 'parent', i.Active COLLATE NOCASE
+    """
+
+
+def identifier_lookup(kind_count: int) -> str:
+    """以 Identifier_Index 的主鍵 (key, kind) 完全比對識別碼"""
+    return f"""
+        SELECT DISTINCT
+            {SUBSTANCE_COLUMNS}
+        FROM Identifier_Index x
+        JOIN Identification i ON i.ID = x.ID
+        WHERE x.key = ? AND x.kind IN ({placeholders(kind_count)})
+        ORDER BY i.Active
+    """
+
+
+def search_index(field_count: int, trigram: bool) -> str:
+    """透過 Search_Index 搜尋並依物質合併結果
+
+    參數依序為：查詢字串（完全相符）、查詢字串 + "%"（開頭相符）、MATCH 或 LIKE 參數、field_count 個欄位類型。
+    trigram 無法處理少於 3 個字元的查詢，此時改以 LIKE 只掃描索引表。
+    """
+    match_clause = "Search_Index MATCH ?" if trigram else "content LIKE ?"
+    score = "MIN(rank)" if trigram else "0"
+    return f"""
+        SELECT
+            {SUBSTANCE_COLUMNS}
+        FROM (
+            SELECT
+                substance_id,
+                MIN(CASE
+                    WHEN content = ? COLLATE NOCASE THEN 0
+                    WHEN content LIKE ? THEN 1
+                    ELSE 2
+                END) AS match_class,
+                {score} AS score
+            FROM Search_Index
+            WHERE {match_clause} AND field IN ({placeholders(field_count)})
+            GROUP BY substance_id
+        ) m
+        JOIN Identification i ON i.ID = m.substance_id
+        ORDER BY m.match_class, m.score, i.Active
+        LIMIT 100
+    """
+
+
+def property_range(operator: str) -> str:
+    """符合一個屬性範圍條件的物質 ID（(property, value) 索引上的範圍掃描）；參數為 屬性、數值、數值"""
+    return f"SELECT ID FROM Property_Values WHERE property = ? AND {PROPERTY_FILTER_CONDITIONS[operator]}"
+
+
+def _property_matches(operators: List[str]) -> str:
+    """多個屬性範圍條件取交集的子查詢（沒有條件時為空字串）"""
+    return " INTERSECT ".join(property_range(operator) for operator in operators)
+
+
+def property_filter(operators: List[str]) -> str:
+    """依屬性範圍篩選（多個條件取交集），依名稱排序
+
+    參數依序為：每個條件的 (屬性, 數值, 數值)、LIMIT。
+    """
+    return f"""
+        SELECT
+            {SUBSTANCE_COLUMNS},
+            NULL as sort_operator,
+            NULL as sort_value,
+            NULL as sort_unit
+        FROM Identification i
+        JOIN ({_property_matches(operators)}) m ON m.ID = i.ID
+        WHERE i.Active IS NOT NULL AND i.Active != ''
+        ORDER BY i.Active COLLATE NOCASE
+        LIMIT ?
+    """
+
+
+def property_sort(operators: List[str], descending: bool = False) -> str:
+    """有排序屬性值的物質，依 (值, ID) 排序，可再加上屬性範圍條件
+
+    直接依 idx_property_values_value (property, value, ID) 的順序讀取，再以主鍵 join Identification，
+    不需讀取整個 Identification 也不需暫存 B-tree 排序。
+    參數依序為：排序屬性、每個條件的 (屬性, 數值, 數值)、LIMIT。
+    """
+    matched = f"AND sv.ID IN ({_property_matches(operators)})" if operators else ""
+    direction = "DESC" if descending else "ASC"
+    return f"""
+        SELECT
+            {SUBSTANCE_COLUMNS},
+            sv.operator as sort_operator,
+            sv.value as sort_value,
+            sv.unit as sort_unit
+        FROM Property_Values sv
+        JOIN Identification i ON i.ID = sv.ID
+        WHERE sv.property = ? {matched}
+            AND i.Active IS NOT NULL AND i.Active != ''
+        ORDER BY sv.value {direction}, sv.ID {direction}
+        LIMIT ?
+    """
+
+
+def property_sort_missing(operators: List[str]) -> str:
+    """沒有排序屬性值的物質（排在有值的物質之後），依名稱排序，可再加上屬性範圍條件
+
+    參數依序為：每個條件的 (屬性, 數值, 數值)、排序屬性、LIMIT。
+    """
+    matched = f"JOIN ({_property_matches(operators)}) m ON m.ID = i.ID" if operators else ""
+    return f"""
+        SELECT
+            {SUBSTANCE_COLUMNS},
+            NULL as sort_operator,
+            NULL as sort_value,
+            NULL as sort_unit
+        FROM Identification i
+        {matched}
+        WHERE i.Active IS NOT NULL AND i.Active != ''
+            AND NOT EXISTS (SELECT 1 FROM Property_Values sv WHERE sv.property = ? AND sv.ID = i.ID)
+        ORDER BY i.Active COLLATE NOCASE
+        LIMIT ?
+    """
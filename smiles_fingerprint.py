@@ -0,0 +1,208 @@
+"""SMILES 結構指紋（不需外部化學套件）
+
+將 SMILES 解析為原子與鍵構成的分子圖，列舉所有長度不超過 MAX_PATH_BONDS 的簡單路徑
+（例如 "c:c:c-Cl"），雜湊後折疊成 FINGERPRINT_BITS 位元的指紋。
+
+- 相似度：兩指紋的 Tanimoto 係數（共同位元數 / 聯集位元數）
+- 子結構預篩：子結構的每條路徑也必定出現在母結構中，因此母結構指紋必須涵蓋查詢指紋的所有位元；
+  反之不一定成立，通過預篩的只是候選物質
+
+同一結構可寫成芳香形式（c1ccccc1）或 Kekulé 形式（C1=CC=CC=C1），路徑的原子與鍵符號不同。
+列舉路徑前先以 normalize_aromaticity 將五、六員環統一為芳香形式，兩種寫法得到相同的指紋。
+此判斷只涵蓋常見的五、六員芳香環（苯、吡啶、萘、呋喃、噻吩、吡咯、吲哚等）；
+七員環、帶電荷或其他較少見的芳香系統若兩邊寫法不同，子結構預篩仍可能漏掉真正含有該結構的物質。
+"""
+
+import re
+import zlib
+from typing import Dict, List, Optional, Set, Tuple
+
+FINGERPRINT_BITS = 1024
+FINGERPRINT_BYTES = FINGERPRINT_BITS // 8
+MAX_PATH_BONDS = 5
+
+_TOKEN_PATTERN = re.compile(
+    r"(\[[^\]]+\]|Br|Cl|B|C|N|O|P|S|F|I|b|c|n|o|p|s|\*|%\d{2}|\d|[-=#$:/\\.()])"
+)
+_BRACKET_ATOM_PATTERN = re.compile(r"\[\d*([A-Z][a-z]?|[a-z][a-z]?|\*)")
+_BOND_SYMBOLS = {"-": "-", "=": "=", "#": "#", "$": "$", ":": ":", "/": "-", "\\": "-"}
+# 可構成芳香環的元素（大寫為 Kekulé 寫法，小寫為芳香寫法）
+_AROMATIC_ELEMENTS = {"C", "N", "O", "S", "P", "c", "n", "o", "s", "p"}
+# 五員芳香環中提供孤對電子、本身沒有雙鍵的原子（呋喃的 O、噻吩的 S、吡咯的 NH）
+_LONE_PAIR_ELEMENTS = {"N", "O", "S", "n", "o", "s"}
+
+
+class SmilesError(ValueError):
+    """SMILES 無法解析"""
+
+
+def parse_smiles(smiles: str) -> Tuple[List[str], Dict[int, List[Tuple[int, str]]]]:
+    """解析 SMILES，回傳 (原子標籤列表, 鄰接表 {原子: [(相鄰原子, 鍵符號)]})
+
+    原子標籤保留大小寫以區分芳香原子（c、n ...），忽略同位素、氫數、電荷與立體化學。
+    """
+    text = (smiles or "").strip()
+    tokens = _TOKEN_PATTERN.findall(text)
+    if not tokens or "".join(tokens) != text:
+        raise SmilesError(f"Invalid SMILES: {smiles}")
+
+    atoms: List[str] = []
+    bonds: Dict[int, List[Tuple[int, str]]] = {}
+    branch_stack: List[Optional[int]] = []
+    ring_openings: Dict[str, Tuple[int, Optional[str]]] = {}
+    previous: Optional[int] = None
+    pending_bond: Optional[str] = None
+
+    def connect(a: int, b: int, bond: Optional[str]):
+        if bond is None:
+            bond = ":" if atoms[a].islower() and atoms[b].islower() else "-"
+        bonds[a].append((b, bond))
+        bonds[b].append((a, bond))
+
+    for token in tokens:
+        if token == "(":
+            if previous is None:
+                raise SmilesError(f"Invalid SMILES: {smiles}")
+            branch_stack.append(previous)
+        elif token == ")":
+            if not branch_stack:
+                raise SmilesError(f"Invalid SMILES: {smiles}")
+            previous = branch_stack.pop()
+        elif token == ".":
+            previous, pending_bond = None, None
+        elif token in _BOND_SYMBOLS:
+            pending_bond = _BOND_SYMBOLS[token]
+        elif token[0].isdigit() or token[0] == "%":
+            if previous is None:
+                raise SmilesError(f"Invalid SMILES: {smiles}")
+            if token in ring_openings:
+                partner, opening_bond = ring_openings.pop(token)
+                connect(previous, partner, pending_bond or opening_bond)
+            else:
+                ring_openings[token] = (previous, pending_bond)
+            pending_bond = None
+        else:
+            if token.startswith("["):
+                match = _BRACKET_ATOM_PATTERN.match(token)
+                if not match:
+                    raise SmilesError(f"Invalid SMILES: {smiles}")
+                label = match.group(1)
+            else:
+                label = token
+            atoms.append(label)
+            index = len(atoms) - 1
+            bonds[index] = []
+            if previous is not None:
+                connect(previous, index, pending_bond)
+            previous, pending_bond = index, None
+
+    if branch_stack or ring_openings:
+        raise SmilesError(f"Invalid SMILES: {smiles}")
+    return atoms, bonds
+
+
+def _small_rings(bonds: Dict[int, List[Tuple[int, str]]]) -> List[Tuple[int, ...]]:
+    """列舉所有五、六員簡單環（以原子索引表示，每個環只列一次）"""
+    rings: Set[Tuple[int, ...]] = set()
+
+    def walk(path: List[int]):
+        for neighbour, _ in bonds[path[-1]]:
+            if neighbour == path[0] and len(path) in (5, 6):
+                # 以最小索引開頭、較小的方向為準，避免同一個環重複列出
+                start = path.index(min(path))
+                ring = path[start:] + path[:start]
+                rings.add(min(tuple(ring), (ring[0],) + tuple(reversed(ring[1:]))))
+            elif neighbour > path[0] and neighbour not in path and len(path) < 6:
+                path.append(neighbour)
+                walk(path)
+                path.pop()
+
+    for start in bonds:
+        walk([start])
+    return sorted(rings)
+
+
+def normalize_aromaticity(atoms: List[str], bonds: Dict[int, List[Tuple[int, str]]]):
+    """將 Kekulé 寫法的五、六員芳香環改為芳香寫法（就地修改 atoms 與 bonds）
+
+    - 六員環：每個原子都有一個雙鍵，且雙鍵連到環上的原子（包含稠環中相鄰環的原子）
+    - 五員環：恰有一個沒有雙鍵的 N、O、S 以單鍵連接，其餘四個原子同上
+    - 原本即以小寫寫成的五、六員環視為芳香環
+
+    芳香環內的鍵改為 ":"，原子改為小寫；兩個芳香環之間的連結（如聯苯）改為單鍵 "-"，
+    與 Kekulé 寫法一致。
+    """
+    rings = _small_rings(bonds)
+    ring_atoms = {atom for ring in rings for atom in ring}
+
+    def ring_double_bonds(atom: int) -> int:
+        return sum(1 for neighbour, bond in bonds[atom] if bond == "=" and neighbour in ring_atoms)
+
+    def is_aromatic(ring: Tuple[int, ...]) -> bool:
+        labels = [atoms[atom] for atom in ring]
+        if any(label not in _AROMATIC_ELEMENTS for label in labels):
+            return False
+        if all(label.islower() for label in labels):
+            return True
+        without_double = [
+            atom for atom in ring
+            if not atoms[atom].islower() and ring_double_bonds(atom) == 0
+        ]
+        if len(ring) == 6:
+            return not without_double
+        if len(without_double) != 1 or atoms[without_double[0]] not in _LONE_PAIR_ELEMENTS:
+            return False
+        donor = without_double[0]
+        return all(bond == "-" for _, bond in bonds[donor])
+
+    aromatic_rings = [ring for ring in rings if is_aromatic(ring)]
+    aromatic_bonds = set()
+    for ring in aromatic_rings:
+        for position, atom in enumerate(ring):
+            neighbour = ring[(position + 1) % len(ring)]
+            aromatic_bonds.add(frozenset((atom, neighbour)))
+            atoms[atom] = atoms[atom].lower()
+
+    aromatic_atoms = {atom for ring in aromatic_rings for atom in ring}
+    for atom, neighbours in bonds.items():
+        for position, (neighbour, bond) in enumerate(neighbours):
+            if frozenset((atom, neighbour)) in aromatic_bonds:
+                neighbours[position] = (neighbour, ":")
+            elif bond == ":" and atom in aromatic_atoms and neighbour in aromatic_atoms:
+                neighbours[position] = (neighbour, "-")
+
+
+def path_features(smiles: str, max_bonds: int = MAX_PATH_BONDS) -> Set[str]:
+    """列舉分子圖中所有長度 0..max_bonds 的簡單路徑，正反方向取字典序較小者作為特徵
+
+    列舉前先統一芳香環的寫法（normalize_aromaticity）。
+    """
+    atoms, bonds = parse_smiles(smiles)
+    normalize_aromaticity(atoms, bonds)
+    features: Set[str] = set()
+
+    def walk(path: List[int], labels: List[str]):
+        forward = "".join(labels)
+        features.add(min(forward, "".join(reversed(labels))))
+        if len(path) > max_bonds:
+            return
+        for neighbour, bond in bonds[path[-1]]:
+            if neighbour not in path:
+                path.append(neighbour)
+                labels.extend((bond, atoms[neighbour]))
+                walk(path, labels)
+                del labels[-2:]
+                path.pop()
+
+    for start, label in enumerate(atoms):
+        walk([start], [label])
+    return features
+
+
+def fingerprint(smiles: str) -> bytes:
+    """計算 SMILES 的折疊路徑指紋，回傳 FINGERPRINT_BYTES 位元組（位元順序與 numpy.unpackbits 相容）"""
+    bits = bytearray(FINGERPRINT_BYTES)
+    for feature in path_features(smiles):
+        bit = zlib.crc32(feature.encode("utf-8")) % FINGERPRINT_BITS
+        bits[bit // 8] |= 0x80 >> (bit % 8)
+    return bytes(bits)
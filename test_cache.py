@@ -0,0 +1,173 @@
+"""測試查詢結果快取（LRUCache）與相同計算的合併（SingleFlight）"""
+import threading
+import time
+
+import pytest
+
+import main
+from main import LRUCache, QueryBudget, QueryCancelledError, SingleFlight, query_budget
+
+
+def test_lru_cache_evicts_least_recently_used():
+    """超過容量時淘汰最久未使用的項目；讀取會更新使用順序"""
+    cache = LRUCache(max_size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats() == {"hits": 3, "misses": 1, "size": 2}
+
+
+def test_lru_cache_put_existing_key_refreshes_order():
+    """覆寫既有鍵時更新值與使用順序，不佔用額外容量"""
+    cache = LRUCache(max_size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.put("a", 10)
+    cache.put("c", 3)
+    assert cache.get("a") == 10
+    assert cache.get("b", "missing") == "missing"
+
+
+def test_lru_cache_ttl(monkeypatch):
+    """超過 TTL 的項目視為不存在並被移除"""
+    now = [1000.0]
+    monkeypatch.setattr(main.time, "monotonic", lambda: now[0])
+    cache = LRUCache(max_size=10, ttl=60)
+    cache.put("a", 1)
+    now[0] += 59
+    assert cache.get("a") == 1
+    now[0] += 2
+    assert cache.get("a") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_lru_cache_without_ttl_never_expires(monkeypatch):
+    """未設定 TTL 時項目不會過期"""
+    now = [1000.0]
+    monkeypatch.setattr(main.time, "monotonic", lambda: now[0])
+    cache = LRUCache(max_size=10)
+    cache.put("a", 1)
+    now[0] += 10 ** 9
+    assert cache.get("a") == 1
+
+
+def test_lru_cache_clear_keeps_stats():
+    """清空快取時保留命中統計"""
+    cache = LRUCache()
+    cache.put("a", 1)
+    cache.get("a")
+    cache.clear()
+    assert cache.get("a") is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "size": 0}
+
+
+def run_concurrently(count: int, target) -> list:
+    """同時在 count 個執行緒中執行 target()，回傳各自的結果或例外"""
+    results = [None] * count
+    barrier = threading.Barrier(count)
+
+    def worker(index: int):
+        barrier.wait()
+        try:
+            results[index] = target()
+        except Exception as e:
+            results[index] = e
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    return results
+
+
+def test_single_flight_shares_result():
+    """同一個鍵同時只執行一次，其他呼叫者共用結果"""
+    flight = SingleFlight()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return "value"
+
+    results = run_concurrently(8, lambda: flight.do("key", compute))
+    assert results == ["value"] * 8
+    assert len(calls) == 1
+    assert flight.shared == 7
+
+
+def test_single_flight_shares_error():
+    """執行者的例外也傳給所有等待者"""
+    flight = SingleFlight()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        raise ValueError("boom")
+
+    results = run_concurrently(4, lambda: flight.do("key", compute))
+    assert all(isinstance(result, ValueError) for result in results)
+    assert len(calls) == 1
+
+
+def test_single_flight_runs_again_after_completion():
+    """計算完成後不保留結果，下一次呼叫重新執行"""
+    flight = SingleFlight()
+    assert flight.do("key", lambda: 1) == 1
+    assert flight.do("key", lambda: 2) == 2
+    assert flight.do("other", lambda: 3) == 3
+    assert flight.shared == 0
+
+
+def test_single_flight_retries_after_cancellation():
+    """執行者被取消時，等待者不沿用取消而是自己重新執行"""
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def cancelled():
+        started.set()
+        release.wait(5)
+        raise QueryCancelledError("client disconnected")
+
+    leader = threading.Thread(target=lambda: pytest.raises(QueryCancelledError, flight.do, "key", cancelled))
+    leader.start()
+    started.wait(5)
+
+    results = []
+    follower = threading.Thread(target=lambda: results.append(flight.do("key", lambda: "fresh")))
+    follower.start()
+    time.sleep(0.1)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+    assert results == ["fresh"]
+
+
+def test_single_flight_waiter_respects_budget():
+    """等待者以自己的 QueryBudget 限制等待時間"""
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+        return "late"
+
+    leader = threading.Thread(target=flight.do, args=("key", slow))
+    leader.start()
+    started.wait(5)
+    try:
+        with query_budget(QueryBudget(0.1)):
+            with pytest.raises(main.QueryTimeoutError):
+                flight.do("key", lambda: "unused")
+    finally:
+        release.set()
+        leader.join(5)
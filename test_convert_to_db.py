@@ -0,0 +1,82 @@
+"""測試建置資料庫時的數值解析與異構物母體判斷"""
+import pytest
+
+from convert_to_db import parse_numeric, variant_parent
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("> 1000", (">", 1000.0)),
+        ("<0.1", ("<", 0.1)),
+        (">= 5", (">=", 5.0)),
+        ("≤ 2", ("<=", 2.0)),
+        ("=> 3", (">=", 3.0)),
+        ("ca. 12", ("~", 12.0)),
+        ("≈ 7", ("~", 7.0)),
+        ("1.2E-03", ("=", 0.0012)),
+        ("2.1 x 10-3", ("=", 0.0021)),
+        ("−4.5", ("=", -4.5)),
+        (".5", ("=", 0.5)),
+        (42, ("=", 42.0)),
+        (0.25, ("=", 0.25)),
+    ],
+)
+def test_parse_numeric(value, expected):
+    """比較運算符、科學記號與數值型別"""
+    operator, number = parse_numeric(value)
+    assert operator == expected[0]
+    assert number == pytest.approx(expected[1])
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("1,500", 1500.0),
+        ("> 1,000", 1000.0),
+        ("12,345.6", 12345.6),
+        ("1,234,567", 1234567.0),
+        ("1,5", 1.5),
+        ("1,50", 1.5),
+        ("0,500", 0.5),
+        ("-1,5", -1.5),
+    ],
+)
+def test_parse_numeric_comma(value, expected):
+    """三位數一組的逗號為千分位，其他為小數逗號（"1,5" 是 1.5 而不是 15）"""
+    assert parse_numeric(value)[1] == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("value", [None, True, float("nan"), "", "Stable", "N/A", "1,5,6", "1-5", "> "])
+def test_parse_numeric_rejects(value):
+    """無法解析或無法判斷的值回傳 None"""
+    assert parse_numeric(value) is None
+
+
+ROOTS = {
+    name.lower(): name
+    for name in ["Dichlorprop", "Benalaxyl", "Hexaconazole", "Metolachlor", "MCPA", "Glyphosate"]
+}
+
+
+@pytest.mark.parametrize(
+    "name, expected",
+    [
+        ("Dichlorprop-P", ("Dichlorprop", "isomer")),
+        ("Benalaxyl-M", ("Benalaxyl", "isomer")),
+        ("(R)-hexaconazole", ("Hexaconazole", "isomer")),
+        ("S-metolachlor", ("Metolachlor", "isomer")),
+        ("Dichlorprop-P-potassium", ("Dichlorprop", "salt_ester")),
+        ("MCPA-sodium", ("MCPA", "salt_ester")),
+        ("MCPA 2-ethylhexyl ester", ("MCPA", "salt_ester")),
+    ],
+)
+def test_variant_parent(name, expected):
+    """去除立體化學字首後取最短的已知名稱作為母體"""
+    assert variant_parent(name, ROOTS) == expected
+
+
+@pytest.mark.parametrize("name", ["Glyphosate", "Metolachlor", "Unknown-salt", "Glyphosates"])
+def test_variant_parent_without_parent(name):
+    """母體本身或找不到母體時回傳 None"""
+    assert variant_parent(name, ROOTS) is None
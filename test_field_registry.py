@@ -0,0 +1,120 @@
+"""測試顯示欄位登錄表以實際資料表結構解析欄位"""
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from field_registry import FieldRegistry, operator_column
+from main import PPDBDatabase
+
+MAPPING_FILE = str(Path(__file__).parent / "field_mapping.csv")
+
+
+@pytest.fixture
+def fixture_db(tmp_path):
+    """只有部分工作表與欄位的小型資料庫；Fate 的欄位名稱大小寫與底線數量和登錄表不同"""
+    db_path = tmp_path / "database.db"
+    conn = sqlite3.connect(db_path)
+    conn.executescript("""
+        CREATE TABLE Identification (ID INTEGER PRIMARY KEY, Active TEXT, CAS_RN TEXT, Chemical_formula TEXT);
+        CREATE TABLE Fate (ID INTEGER, solubility_in_water_at_20_degc_mgl TEXT, LogP TEXT);
+        CREATE TABLE Terrestrial_Ecotox (
+            ID INTEGER,
+            Mammals__Acute_oral_LD50_mgkg_BWday TEXT,
+            __Mammals__Acute_oral_LD50 TEXT,
+            Birds__Acute_LD50_mgkg TEXT
+        );
+        CREATE TABLE Aquatic_Ecotox (
+            ID INTEGER,
+            Fish__Acute_96hr_LC50_mgl__TEMPERATE TEXT,
+            __Fish__Acute_96hr_LC50__TEMPERATE TEXT
+        );
+    """)
+    conn.close()
+    return str(db_path)
+
+
+@pytest.fixture
+def registry(fixture_db):
+    database = PPDBDatabase(fixture_db, pool_size=1)
+    yield database.get_field_registry()
+    database.pool.retire()
+
+
+def test_exact_and_loose_column_names(registry):
+    """欄位名稱先找完全相同者，再以寬鬆名稱（不分大小寫、合併底線）比對"""
+    assert registry.by_key["Active"].column == "Active"
+    assert registry.by_key["LogP"].column == "LogP"
+    assert registry.by_key["Solubility__In_water_at_20_degC_mgl"].column == "solubility_in_water_at_20_degc_mgl"
+
+
+def test_missing_columns_and_tables(registry):
+    """資料庫中不存在的欄位（含整張不存在的 Human 表）column 為 None，並列在 missing"""
+    assert registry.by_key["Isomerism"].column is None
+    assert registry.by_key["Carcinogen"].column is None
+    assert "Identification.Isomerism" in registry.missing
+    assert "Human.Carcinogen" in registry.missing
+    assert "Identification.Active" not in registry.missing
+    assert registry.by_key["Isomerism"].format(None) == "N/A"
+
+
+def test_ecotox_operator_columns_and_units(registry):
+    """Ecotox 欄位解析出比較運算符欄位與單位，顯示時組合成 "{運算符} {數值} {單位}" """
+    mammals = registry.by_key["Mammals__Acute_oral_LD50_mgkg_BWday"]
+    assert mammals.operator_column == "__Mammals__Acute_oral_LD50"
+    assert mammals.unit == "mg/kg BW/day"
+    assert mammals.format("150", ">") == "> 150 mg/kg BW/day"
+
+    fish = registry.by_key["Fish__Acute_96hr_LC50_mgl__TEMPERATE"]
+    assert fish.operator_column == "__Fish__Acute_96hr_LC50__TEMPERATE"
+    assert fish.unit == "mg/l"
+
+    birds = registry.by_key["Birds__Acute_LD50_mgkg"]
+    assert birds.operator_column is None
+    assert birds.unit == "mg/kg"
+
+
+@pytest.mark.parametrize(
+    "column, columns, expected",
+    [
+        ("Fish__Acute_96hr_LC50_mgl__TEMPERATE", ["__Fish__Acute_96hr_LC50__TEMPERATE"], "__Fish__Acute_96hr_LC50__TEMPERATE"),
+        ("Fish__Acute_96hr_LC50_mgl__TEMPERATE", ["__Fish__Acute_96hr_LC50_mgl__TEMPERATE"], "__Fish__Acute_96hr_LC50_mgl__TEMPERATE"),
+        ("Algae__Acute_72hr_EC50_growth_mgl", ["__Algae__Acute_72hr_EC50_growth"], "__Algae__Acute_72hr_EC50_growth"),
+        ("Birds__Acute_LD50_mgkg", ["__Mammals__Acute_oral_LD50"], None),
+    ],
+)
+def test_operator_column_layouts(column, columns, expected):
+    """比較運算符欄位可省略單位（保留 __TEMPERATE 後綴），也可為完整欄位名稱加上 __ 前綴"""
+    assert operator_column(column, [column, *columns]) == expected
+
+
+def test_projection_selects_only_existing_columns(registry):
+    """每個資料表只選取存在的顯示欄位與比較運算符欄位"""
+    projection = registry.projection()
+    assert projection["Identification"] == ["Active", "CAS_RN", "Chemical_formula"]
+    assert projection["Fate"] == ["solubility_in_water_at_20_degc_mgl", "LogP"]
+    assert projection["Terrestrial_Ecotox"] == [
+        "Mammals__Acute_oral_LD50_mgkg_BWday",
+        "__Mammals__Acute_oral_LD50",
+        "Birds__Acute_LD50_mgkg",
+    ]
+    assert "Human" not in projection
+
+
+def test_labels_from_field_mapping(fixture_db):
+    """標籤取自 field_mapping.csv；沒有對照的欄位以欄位名稱代替"""
+    conn = sqlite3.connect(fixture_db)
+    table_columns = {
+        table: [row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')]
+        for table in ("Identification", "Fate", "Terrestrial_Ecotox", "Aquatic_Ecotox", "Human")
+    }
+    conn.close()
+    registry = FieldRegistry(table_columns, mapping_file=MAPPING_FILE)
+
+    formula = registry.by_key["Chemical_formula"]
+    assert formula.info["zh"] == "化學式"
+    assert formula.label == "Chemical formula / 化學式"
+    assert registry.by_key["Mammals__Acute_oral_LD50_mgkg_BWday"].info["zh"].startswith("哺乳類急性口服")
+
+    unlabeled = FieldRegistry(table_columns, mapping_file=str(Path(fixture_db).parent / "missing.csv"))
+    assert unlabeled.by_key["Chemical_formula"].label == "Chemical formula"
@@ -0,0 +1,41 @@
+"""測試識別碼正規化與 CAS RN 檢查碼"""
+import pytest
+
+from identifiers import is_valid_cas, normalize_identifier
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("33089-61-1", "33089611"),
+        ("33089611", "33089611"),
+        (" ３３０８９－６１－１ ", "33089611"),
+        ("33089−61−1", "33089611"),
+        ("benalaxyl m", "BENALAXYLM"),
+        ("Benalaxyl-M", "BENALAXYLM"),
+        ("三亞蟎", "三亞蟎"),
+        (None, ""),
+        ("", ""),
+    ],
+)
+def test_normalize_identifier(value, expected):
+    """全形轉半形、轉大寫、移除空白與各種連字號"""
+    assert normalize_identifier(value) == expected
+
+
+@pytest.mark.parametrize("value", ["33089-61-1", "50-00-0", "7732-18-5", "1071-83-6", "1071836", " ５０－００－０ "])
+def test_is_valid_cas(value):
+    """格式正確且檢查碼相符（連字號可省略，全形數字視同半形）"""
+    assert is_valid_cas(value)
+
+
+@pytest.mark.parametrize("value", ["33089-61-2", "50-00-1", "7732-18-4", "1071-83-7"])
+def test_is_valid_cas_rejects_bad_check_digit(value):
+    """檢查碼不符"""
+    assert not is_valid_cas(value)
+
+
+@pytest.mark.parametrize("value", [None, "", "Stable", "1-00-0", "12345678-00-0", "50-0-0", "50-00-00"])
+def test_is_valid_cas_rejects_bad_format(value):
+    """不是 CAS RN 格式"""
+    assert not is_valid_cas(value)
@@ -0,0 +1,59 @@
+"""測試 SMILES 結構指紋與芳香性正規化"""
+import pytest
+
+from smiles_fingerprint import FINGERPRINT_BYTES, SmilesError, fingerprint, normalize_aromaticity, parse_smiles
+
+
+def tanimoto(a: bytes, b: bytes) -> float:
+    """兩指紋的 Tanimoto 係數"""
+    x, y = int.from_bytes(a, "big"), int.from_bytes(b, "big")
+    union = bin(x | y).count("1")
+    return bin(x & y).count("1") / union if union else 1.0
+
+
+@pytest.mark.parametrize(
+    "aromatic, kekule",
+    [
+        ("c1ccccc1", "C1=CC=CC=C1"),
+        ("Clc1ccccc1", "ClC1=CC=CC=C1"),
+        ("c1ccncc1", "C1=CC=NC=C1"),
+        ("Cc1ccc2ccccc2c1", "CC1=CC2=CC=CC=C2C=C1"),
+        ("c1ccoc1", "C1=COC=C1"),
+        ("c1ccsc1", "C1=CSC=C1"),
+        ("c1cc[nH]c1", "C1=CNC=C1"),
+    ],
+)
+def test_kekule_and_aromatic_forms_match(aromatic, kekule):
+    """同一結構的芳香與 Kekulé 寫法得到相同的指紋（Tanimoto 1.0）"""
+    assert tanimoto(fingerprint(aromatic), fingerprint(kekule)) == 1.0
+
+
+def test_normalize_aromaticity():
+    """Kekulé 寫法的六員環原子與鍵改為芳香寫法"""
+    atoms, bonds = parse_smiles("C1=CC=CC=C1")
+    normalize_aromaticity(atoms, bonds)
+    assert atoms == ["c"] * 6
+    assert {bond for neighbours in bonds.values() for _, bond in neighbours} == {":"}
+
+
+def test_non_aromatic_ring_unchanged():
+    """環己烷不是芳香環，維持原本的寫法"""
+    atoms, bonds = parse_smiles("C1CCCCC1")
+    normalize_aromaticity(atoms, bonds)
+    assert atoms == ["C"] * 6
+    assert tanimoto(fingerprint("C1CCCCC1"), fingerprint("c1ccccc1")) < 1.0
+
+
+def test_fingerprint_size_and_substructure():
+    """指紋長度固定；子結構的位元都出現在母結構的指紋中"""
+    benzene = fingerprint("c1ccccc1")
+    toluene = fingerprint("Cc1ccccc1")
+    assert len(benzene) == FINGERPRINT_BYTES
+    assert int.from_bytes(benzene, "big") & ~int.from_bytes(toluene, "big") == 0
+    assert 0 < tanimoto(benzene, toluene) < 1.0
+
+
+def test_invalid_smiles():
+    """無法解析的 SMILES 拋出 SmilesError"""
+    with pytest.raises(SmilesError):
+        fingerprint("C1CC(")